@@ -17,8 +17,13 @@ import tempfile
 # Add current directory to Python path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from flask import current_app
 from project import create_app, db
-from project.models import Species, CharacterClass
+from project.models import Species, CharacterClass, Item, Proficiency, Spell
+from project.catalog import rebuild_item_facets
+from project.search import rebuild_search_index
+from project.summaries import rebuild_character_summaries
+from project.payloads import warm_reference_payloads
 from json_data_loader import FiveEDataLoader
 
 # Configure logging
@@ -401,6 +406,189 @@ class DatabaseInitializer:
             logger.error(f"❌ Failed to commit class data: {e}")
             return False
     
+    def populate_skills(self):
+        """Load skills as proficiencies with their associated ability."""
+        logger.info("🎯 Loading skill data...")
+        
+        skill_data = self.data_loader.get_skills()
+        if not skill_data:
+            logger.error("❌ No skill data available")
+            return False
+        
+        existing = {
+            prof.name: prof
+            for prof in Proficiency.query.filter_by(proficiency_type='skill').all()
+        }
+        
+        loaded_count = 0
+        for skill_info in skill_data:
+            try:
+                name = skill_info.get('name', '')
+                skill = existing.get(name)
+                if skill is None:
+                    skill = Proficiency(name=name, proficiency_type='skill')
+                    db.session.add(skill)
+                skill.associated_ability = skill_info.get('ability_score', {}).get('index')
+                skill.description = ' '.join(skill_info.get('desc', [])) or None
+                
+                loaded_count += 1
+                logger.debug(f"Loaded skill: {name}")
+                
+            except Exception as e:
+                logger.warning(f"Failed to load skill {skill_info.get('name', 'unknown')}: {e}")
+        
+        try:
+            db.session.commit()
+            logger.info(f"✅ Successfully loaded {loaded_count} skills")
+            return True
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"❌ Failed to commit skill data: {e}")
+            return False
+    
+    def populate_spells(self):
+        """Load spells; class_lists populates the spell_class index."""
+        logger.info("✨ Loading spell data...")
+        
+        spell_data = self.data_loader.get_spells()
+        if not spell_data:
+            logger.error("❌ No spell data available")
+            return False
+        
+        existing = {spell.name: spell for spell in Spell.query.all()}
+        
+        loaded_count = 0
+        for spell_info in spell_data:
+            try:
+                name = spell_info.get('name', '')
+                spell = existing.get(name)
+                if spell is None:
+                    spell = Spell(name=name)
+                    db.session.add(spell)
+                
+                components = ', '.join(spell_info.get('components', []))
+                if spell_info.get('material'):
+                    components = f"{components} ({spell_info['material']})"
+                
+                spell.level = spell_info.get('level', 0)
+                spell.school = spell_info.get('school', {}).get('name', '')
+                spell.casting_time = spell_info.get('casting_time')
+                spell.spell_range = spell_info.get('range')
+                spell.components = components[:100] or None
+                spell.duration = spell_info.get('duration')
+                spell.description = '\n\n'.join(spell_info.get('desc', []))
+                spell.higher_level = '\n\n'.join(spell_info.get('higher_level', [])) or None
+                spell.class_lists = ','.join(
+                    cls.get('name', '').lower() for cls in spell_info.get('classes', [])
+                )
+                spell.source = '5e-SRD'
+                spell.is_ritual = bool(spell_info.get('ritual', False))
+                spell.requires_concentration = bool(spell_info.get('concentration', False))
+                
+                loaded_count += 1
+                logger.debug(f"Loaded spell: {name}")
+                
+            except Exception as e:
+                logger.warning(f"Failed to load spell {spell_info.get('name', 'unknown')}: {e}")
+        
+        try:
+            db.session.commit()
+            logger.info(f"✅ Successfully loaded {loaded_count} spells")
+            return True
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"❌ Failed to commit spell data: {e}")
+            return False
+    
+    # Conversion of SRD cost units to gold pieces
+    COST_UNITS_IN_GP = {'cp': 0.01, 'sp': 0.1, 'ep': 0.5, 'gp': 1, 'pp': 10}
+    
+    def populate_items(self):
+        """Load equipment data, parsing weapon properties into Item.weapon_flags."""
+        logger.info("🗡️  Loading equipment data...")
+        
+        equipment_data = self.data_loader.get_equipment()
+        if not equipment_data:
+            logger.error("❌ No equipment data available")
+            return False
+        
+        # Update items in place by name so inventory rows keep their item ids
+        existing = {item.name: item for item in Item.query.all()}
+        
+        loaded_count = 0
+        for item_info in equipment_data:
+            try:
+                category = item_info.get('equipment_category', {}).get('index', 'gear')
+                armor_category = item_info.get('armor_category')
+                if armor_category == 'Shield':
+                    item_type = 'shield'
+                elif category in ('weapon', 'armor'):
+                    item_type = category
+                else:
+                    item_type = category.replace('-', ' ')
+                
+                cost = item_info.get('cost', {})
+                cost_gp = int(
+                    cost.get('quantity', 0) * self.COST_UNITS_IN_GP.get(cost.get('unit', 'gp'), 1)
+                )
+                
+                fields = {
+                    'item_type': item_type,
+                    'cost_gp': cost_gp,
+                    'weight_lbs': float(item_info.get('weight', 0) or 0),
+                    'description': ' '.join(item_info.get('desc', [])) or None,
+                }
+                
+                # Weapon details; the category is stored alongside the properties
+                # so that weapon_flags carries simple/martial as well
+                if category == 'weapon':
+                    damage = item_info.get('damage', {})
+                    properties = [item_info.get('weapon_category', '')]
+                    properties.extend(prop.get('name', '') for prop in item_info.get('properties', []))
+                    fields.update({
+                        'damage_dice': damage.get('damage_dice'),
+                        'damage_type': damage.get('damage_type', {}).get('name', '').lower() or None,
+                        'weapon_range': item_info.get('weapon_range', '').lower() or None,
+                        'weapon_properties': ', '.join(p for p in properties if p).lower(),
+                        'versatile_damage': item_info.get('two_handed_damage', {}).get('damage_dice'),
+                    })
+                
+                # Armor details
+                if category == 'armor':
+                    armor_class = item_info.get('armor_class', {})
+                    max_dex_bonus = armor_class.get('max_bonus')
+                    if not armor_class.get('dex_bonus', False):
+                        max_dex_bonus = 0
+                    fields.update({
+                        'armor_class': armor_class.get('base'),
+                        'max_dex_bonus': max_dex_bonus,
+                        'min_strength': item_info.get('str_minimum') or None,
+                        'stealth_disadvantage': bool(item_info.get('stealth_disadvantage', False)),
+                    })
+                
+                name = item_info.get('name', '')
+                item = existing.get(name)
+                if item is None:
+                    item = Item(name=name)
+                    db.session.add(item)
+                for field, value in fields.items():
+                    setattr(item, field, value)
+                
+                loaded_count += 1
+                logger.debug(f"Loaded item: {name}")
+                
+            except Exception as e:
+                logger.warning(f"Failed to load item {item_info.get('name', 'unknown')}: {e}")
+        
+        try:
+            db.session.commit()
+            logger.info(f"✅ Successfully loaded {loaded_count} items")
+            return True
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"❌ Failed to commit item data: {e}")
+            return False
+    
     def initialize_database(self, force_rebuild=False):
         """Complete database initialization process."""
         logger.info("🎲 Starting database initialization...")
@@ -438,6 +626,35 @@ class DatabaseInitializer:
         if not self.populate_classes():
             success = False
         
+        if not self.populate_skills():
+            success = False
+        
+        if not self.populate_items():
+            success = False
+        
+        if not self.populate_spells():
+            success = False
+        
+        # Reindex rules text, recount item facets and resummarize characters
+        # so rows that predate the incremental hooks are included
+        try:
+            rebuild_search_index()
+            rebuild_item_facets()
+            rebuild_character_summaries()
+            logger.info("✅ Search index, item facets and character summaries rebuilt")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"❌ Failed to rebuild derived tables: {e}")
+            success = False
+        
+        # Pregenerate compressed reference API payloads for the new data
+        try:
+            payload_count = warm_reference_payloads(current_app._get_current_object())
+            logger.info(f"✅ Generated {payload_count} reference API payloads")
+        except Exception as e:
+            logger.error(f"❌ Failed to generate reference API payloads: {e}")
+            success = False
+        
         if success:
             logger.info("🎉 Database initialization completed successfully!")
         else:
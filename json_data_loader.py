@@ -51,6 +51,18 @@ class FiveEDataLoader:
     def get_classes(self):
         """Get character classes data."""
         return self.load_json_file("5e-SRD-Classes.json")
+    
+    def get_skills(self):
+        """Get skills data with their associated ability scores."""
+        return self.load_json_file("5e-SRD-Skills.json")
+    
+    def get_spells(self):
+        """Get spells data including class spell lists."""
+        return self.load_json_file("5e-SRD-Spells.json")
+    
+    def get_equipment(self):
+        """Get equipment (weapons, armor, gear) data."""
+        return self.load_json_file("5e-SRD-Equipment.json")
 
 # Global instance for easy access
 data_loader = FiveEDataLoader()
@@ -49,11 +49,23 @@ def create_app(test_config=None):
         return User.query.get(int(user_id))
 
     # Register blueprints
-    from project import auth, main, characters
+    from project import auth, main, characters, character_api, batch, exports, imports
 
     app.register_blueprint(auth.bp)
     app.register_blueprint(main.bp)
     app.register_blueprint(characters.bp)
+    app.register_blueprint(character_api.bp)
+    app.register_blueprint(batch.bp)
+    app.register_blueprint(exports.bp)
+    app.register_blueprint(imports.bp)
     app.add_url_rule("/", endpoint="index")
 
+    # Enable {% cache %} fragment caching in templates
+    from project.fragments import FragmentCacheExtension
+
+    app.jinja_env.add_extension(FragmentCacheExtension)
+
+    # Keep character_summary in step with character writes
+    from project import summaries  # noqa: F401
+
     return app
@@ -0,0 +1,90 @@
+"""Multiplexed requests against the characters and reference APIs.
+
+POST /characters/api/batch takes {"requests": [{"method", "path",
+"body"}, ...]} and runs each sub-request through the normal views in
+order. They share this request's app context, so the logged in user is
+loaded once and every sub-request uses the same database session and
+identity map. Responses come back in request order as
+{"responses": [{"status", "headers", "body"}, ...]}.
+"""
+
+from urllib.parse import urlsplit
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import login_required
+from project import db
+
+bp = Blueprint("batch", __name__)
+
+# Sub-requests allowed in one batch unless BATCH_MAX_REQUESTS is set
+DEFAULT_BATCH_MAX_REQUESTS = 50
+
+BATCH_METHODS = ("GET", "POST", "PATCH", "DELETE")
+
+# Only the JSON APIs can be batched
+BATCH_PATH_PREFIX = "/characters/api/"
+
+# Response headers passed back for each sub-request
+BATCH_RESPONSE_HEADERS = ("ETag", "Location")
+
+
+def _result(status, body, headers=None):
+    return {"status": status, "headers": headers or {}, "body": body}
+
+
+def run_subrequest(subrequest, base_url):
+    """Dispatch one sub-request through the app and return its result."""
+    if not isinstance(subrequest, dict):
+        return _result(400, {"error": "Expected a request object."})
+    method = str(subrequest.get("method", "GET")).upper()
+    path = subrequest.get("path")
+    if method not in BATCH_METHODS:
+        return _result(405, {"error": f"Method {method} cannot be batched."})
+    if (
+        not isinstance(path, str)
+        or not path.startswith(BATCH_PATH_PREFIX)
+        or urlsplit(path).path == request.path
+    ):
+        return _result(400, {"error": f"Path {path!r} cannot be batched."})
+
+    options = {"json": subrequest["body"]} if "body" in subrequest else {}
+    # The app context is already pushed, so it is reused along with the
+    # logged in user in g and the scoped database session
+    with current_app.test_request_context(
+        path, base_url=base_url, method=method, **options
+    ):
+        try:
+            response = current_app.full_dispatch_request()
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Batched %s %s failed", method, path)
+            return _result(500, {"error": "Internal server error."})
+
+    headers = {
+        name: response.headers[name]
+        for name in BATCH_RESPONSE_HEADERS
+        if name in response.headers
+    }
+    body = response.get_json(silent=True) if response.is_json else None
+    response.close()
+    return _result(response.status_code, body, headers)
+
+
+@bp.route("/characters/api/batch", methods=["POST"])
+@login_required
+def batch():
+    """Run several API requests in one round trip."""
+    data = request.get_json(silent=True)
+    subrequests = data.get("requests") if isinstance(data, dict) else None
+    if not isinstance(subrequests, list):
+        return jsonify({"errors": {"requests": "Expected a list of requests."}}), 400
+    limit = current_app.config.get("BATCH_MAX_REQUESTS", DEFAULT_BATCH_MAX_REQUESTS)
+    if len(subrequests) > limit:
+        return (
+            jsonify({"errors": {"requests": f"At most {limit} requests per batch."}}),
+            400,
+        )
+
+    base_url = request.host_url
+    return jsonify(
+        {"responses": [run_subrequest(sub, base_url) for sub in subrequests]}
+    )
@@ -0,0 +1,540 @@
+"""Precomputed indexes and counts for browsing the reference catalog."""
+
+from collections import namedtuple
+from sqlalchemy import case, event, false, func, insert, inspect, or_, update
+from project import db
+from project.models import (
+    CharacterClass,
+    Feature,
+    Item,
+    ItemFacetCount,
+    Language,
+    Proficiency,
+    Species,
+    Spell,
+    SpellClass,
+    SubSpecies,
+)
+from project.reference import reference_cached
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+# Characters of rules text shown in list payloads
+SUMMARY_LENGTH = 100
+
+
+def text_summary(column, length=SUMMARY_LENGTH):
+    """SQL expression truncating a text column to length characters plus "..."
+
+    List endpoints select this instead of the full column, so long rules
+    text never leaves the database.
+    """
+    return case(
+        (func.length(column) > length, func.substr(column, 1, length) + "..."),
+        else_=column,
+    )
+
+
+def popcount(bits):
+    """Count the set bits in an integer bitset."""
+    return bin(bits).count("1")
+
+
+def iter_bits(bits):
+    """Yield the positions of the set bits in ascending order."""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+def _flag(value):
+    return "true" if value else "false"
+
+
+class SpellBitmapIndex:
+    """One bitset per spell attribute value, combined with AND and OR.
+
+    Bit positions follow the spells' (level, name) order, so any filter
+    combination resolves to an ordered id list without touching SQL.
+    Values within one attribute are ORed; attributes are ANDed.
+    """
+
+    ATTRIBUTES = ("level", "school", "ritual", "concentration", "class")
+
+    def __init__(self, spells, memberships):
+        self.ids = [spell.id for spell in spells]
+        self.all = (1 << len(self.ids)) - 1
+        self.bitsets = {attribute: {} for attribute in self.ATTRIBUTES}
+
+        positions = {}
+        for position, spell in enumerate(spells):
+            positions[spell.id] = position
+            self._add("level", str(spell.level), position)
+            self._add("school", spell.school.lower(), position)
+            self._add("ritual", _flag(spell.is_ritual), position)
+            self._add("concentration", _flag(spell.requires_concentration), position)
+
+        for spell_id, class_name in memberships:
+            if spell_id in positions:
+                self._add("class", class_name, positions[spell_id])
+
+    def _add(self, attribute, value, position):
+        values = self.bitsets[attribute]
+        values[value] = values.get(value, 0) | (1 << position)
+
+    @staticmethod
+    def normalize(attribute, value):
+        """Normalize a query value to the key used for its bitset."""
+        value = str(value).strip().lower()
+        if attribute in ("ritual", "concentration"):
+            return _flag(value in TRUE_VALUES)
+        return value
+
+    def filter(self, criteria):
+        """Return the bitset matching {attribute: [values]} criteria."""
+        result = self.all
+        for attribute, values in criteria.items():
+            if attribute not in self.bitsets or not values:
+                continue
+            matched = 0
+            for value in values:
+                key = self.normalize(attribute, value)
+                matched |= self.bitsets[attribute].get(key, 0)
+            result &= matched
+        return result
+
+    def ids_for(self, bits):
+        """Return spell ids for a bitset in (level, name) order."""
+        return [self.ids[position] for position in iter_bits(bits)]
+
+    def counts(self, bits):
+        """Return per-attribute value counts within a bitset."""
+        return {
+            attribute: {
+                value: popcount(bits & bitset)
+                for value, bitset in sorted(values.items())
+                if bits & bitset
+            }
+            for attribute, values in self.bitsets.items()
+        }
+
+
+@reference_cached
+def spell_bitmap_index():
+    """Build the spell bitmap index from the current reference data."""
+    spells = (
+        db.session.query(
+            Spell.id,
+            Spell.level,
+            Spell.school,
+            Spell.is_ritual,
+            Spell.requires_concentration,
+        )
+        .order_by(Spell.level, Spell.name)
+        .all()
+    )
+    memberships = db.session.query(SpellClass.spell_id, SpellClass.class_name).all()
+    return SpellBitmapIndex(spells, memberships)
+
+
+# Faceted item catalog
+
+# Cost bands as (label, minimum gp, maximum gp or None)
+COST_BANDS = (
+    ("free", 0, 0),
+    ("1-10", 1, 10),
+    ("11-100", 11, 100),
+    ("101-1000", 101, 1000),
+    ("1000+", 1001, None),
+)
+
+ITEM_FACETS = (
+    "item_type",
+    "rarity",
+    "is_magical",
+    "requires_attunement",
+    "damage_type",
+    "cost",
+)
+
+# Item columns whose values feed a facet
+FACET_COLUMNS = {
+    "item_type": "item_type",
+    "rarity": "rarity",
+    "is_magical": "is_magical",
+    "requires_attunement": "requires_attunement",
+    "damage_type": "damage_type",
+    "cost": "cost_gp",
+}
+
+
+def cost_band(cost_gp):
+    """Return the COST_BANDS label for a cost in gold pieces."""
+    for label, minimum, maximum in COST_BANDS:
+        if cost_gp >= minimum and (maximum is None or cost_gp <= maximum):
+            return label
+    return COST_BANDS[0][0]
+
+
+def _facet_value(facet, value):
+    """Normalize a column value to its facet key, or None if not faceted."""
+    if facet == "cost":
+        return cost_band(value or 0)
+    if facet in ("is_magical", "requires_attunement"):
+        return _flag(value)
+    return value.lower() if value else None
+
+
+def item_facet_values(item):
+    """Return {facet: value} for an Item instance."""
+    values = {}
+    for facet, column in FACET_COLUMNS.items():
+        value = _facet_value(facet, getattr(item, column))
+        if value is not None:
+            values[facet] = value
+    return values
+
+
+def _adjust_facet(connection, facet, value, delta):
+    """Add delta to one facet count, creating the row when needed."""
+    table = ItemFacetCount.__table__
+    result = connection.execute(
+        update(table)
+        .where(table.c.facet == facet, table.c.value == value)
+        .values(count=table.c.count + delta)
+    )
+    if result.rowcount == 0 and delta > 0:
+        connection.execute(
+            insert(table).values(facet=facet, value=value, count=delta)
+        )
+
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Load previous values on assignment so updates can decrement them
+for _column in FACET_COLUMNS.values():
+    event.listen(
+        getattr(Item, _column),
+        "set",
+        _load_previous_value,
+        active_history=True,
+        retval=True,
+    )
+
+
+@event.listens_for(Item, "after_insert")
+def count_inserted_item(mapper, connection, target):
+    for facet, value in item_facet_values(target).items():
+        _adjust_facet(connection, facet, value, 1)
+
+
+@event.listens_for(Item, "after_update")
+def count_updated_item(mapper, connection, target):
+    state = inspect(target)
+    for facet, column in FACET_COLUMNS.items():
+        history = state.attrs[column].history
+        if not history.has_changes():
+            continue
+        for old in history.deleted:
+            old_value = _facet_value(facet, old)
+            if old_value is not None:
+                _adjust_facet(connection, facet, old_value, -1)
+        for new in history.added:
+            new_value = _facet_value(facet, new)
+            if new_value is not None:
+                _adjust_facet(connection, facet, new_value, 1)
+
+
+@event.listens_for(Item, "after_delete")
+def count_deleted_item(mapper, connection, target):
+    for facet, value in item_facet_values(target).items():
+        _adjust_facet(connection, facet, value, -1)
+
+
+def rebuild_item_facets():
+    """Recount every facet from scratch, e.g. after seeding."""
+    counts = {}
+    columns = [getattr(Item, column) for column in FACET_COLUMNS.values()]
+    for item in db.session.query(*columns):
+        for facet, value in zip(FACET_COLUMNS, item):
+            key = (facet, _facet_value(facet, value))
+            if key[1] is not None:
+                counts[key] = counts.get(key, 0) + 1
+
+    db.session.query(ItemFacetCount).delete()
+    db.session.add_all(
+        ItemFacetCount(facet=facet, value=value, count=count)
+        for (facet, value), count in counts.items()
+    )
+    db.session.commit()
+
+
+def item_facet_counts():
+    """Return the precomputed {facet: {value: count}} table."""
+    facets = {facet: {} for facet in ITEM_FACETS}
+    rows = (
+        db.session.query(ItemFacetCount)
+        .filter(ItemFacetCount.count > 0)
+        .order_by(ItemFacetCount.facet, ItemFacetCount.value)
+    )
+    for row in rows:
+        facets.setdefault(row.facet, {})[row.value] = row.count
+    return facets
+
+
+def item_facet_filters(criteria):
+    """Translate {facet: [values]} into SQL filters on Item."""
+    filters = []
+    for facet, values in criteria.items():
+        if facet not in FACET_COLUMNS or not values:
+            continue
+        values = [str(value).strip().lower() for value in values]
+        column = getattr(Item, FACET_COLUMNS[facet])
+        if facet == "cost":
+            bands = [band for band in COST_BANDS if band[0] in values]
+            filters.append(
+                or_(
+                    *(
+                        column.between(minimum, maximum)
+                        if maximum is not None
+                        else column >= minimum
+                        for _, minimum, maximum in bands
+                    ),
+                    false(),
+                )
+            )
+        elif facet in ("is_magical", "requires_attunement"):
+            flags = {value in TRUE_VALUES for value in values}
+            filters.append(column.in_(sorted(flags)))
+        else:
+            filters.append(func.lower(column).in_(values))
+    return filters
+
+
+# Race and class creation options
+
+# Languages every character speaks when the species grants none
+DEFAULT_LANGUAGES = ("Common",)
+
+# Languages a class teaches, keyed by lower-cased class name. The class
+# table has no language column, and Druidic is the only SRD case
+CLASS_LANGUAGES = {"druid": ("Druidic",)}
+
+Grants = namedtuple("Grants", ["proficiency_ids", "languages", "trait_ids"])
+OptionSet = namedtuple(
+    "OptionSet", ["proficiency_ids", "base_languages", "language_ids", "trait_ids"]
+)
+
+NO_GRANTS = Grants(frozenset(), (), frozenset())
+
+
+def _key(name):
+    return (name or "").strip().lower()
+
+
+class CreationOptionIndex:
+    """Resolved proficiency, language and trait grants per species and class.
+
+    Built once per reference data version from the Species, SubSpecies
+    and CharacterClass rows, so resolving a race/class combination is a
+    handful of dictionary lookups and set unions.
+    """
+
+    def __init__(self, species, subspecies, classes, proficiencies, languages, traits):
+        self.proficiencies = {prof["id"]: prof for prof in proficiencies}
+        self.languages = {lang["id"]: lang for lang in languages}
+        self.traits = {trait["id"]: trait for trait in traits}
+
+        self._proficiency_ids = {}
+        for prof in proficiencies:
+            self._proficiency_ids[_key(prof["name"])] = prof["id"]
+            # Skills are seeded by their plain name, species grant "Skill: X"
+            self._proficiency_ids.setdefault(_key("Skill: " + prof["name"]), prof["id"])
+        self._language_ids = {_key(lang["name"]): lang["id"] for lang in languages}
+        self._trait_ids = {_key(trait["name"]): trait["id"] for trait in traits}
+
+        self.race_names = sorted(row.name for row in species)
+        self.class_names = sorted(row.name for row in classes)
+        self.species = {
+            _key(row.name): self._grants(row.proficiencies, row.languages, row.traits)
+            for row in species
+        }
+        species_names = {row.id: _key(row.name) for row in species}
+        self.subspecies = {
+            (species_names.get(row.species_id), _key(row.name)): self._grants(
+                row.additional_proficiencies,
+                row.additional_languages,
+                row.additional_traits,
+            )
+            for row in subspecies
+        }
+        self.classes = {
+            _key(row.name): self._grants(
+                list(row.armor_proficiencies or [])
+                + list(row.weapon_proficiencies or [])
+                + list(row.skill_proficiencies or []),
+                CLASS_LANGUAGES.get(_key(row.name), ()),
+                (),
+            )
+            for row in classes
+        }
+
+    def _grants(self, proficiencies, languages, traits):
+        return Grants(
+            frozenset(self._lookup(self._proficiency_ids, proficiencies)),
+            tuple(dict.fromkeys(name for name in languages or () if name)),
+            frozenset(self._lookup(self._trait_ids, traits)),
+        )
+
+    @staticmethod
+    def _lookup(ids, names):
+        return (ids[_key(name)] for name in names or () if _key(name) in ids)
+
+    def resolve(self, race, character_class, subrace=None):
+        """Return the OptionSet for a race, optional subrace and class."""
+        race = _key(race)
+        grants = [
+            self.species.get(race, NO_GRANTS),
+            self.subspecies.get((race, _key(subrace)), NO_GRANTS),
+            self.classes.get(_key(character_class), NO_GRANTS),
+        ]
+        # The default only stands in for the species; class languages add to it
+        species_languages = tuple(
+            name for grant in grants[:2] for name in grant.languages
+        )
+        base_languages = tuple(
+            dict.fromkeys(
+                (species_languages or DEFAULT_LANGUAGES) + grants[2].languages
+            )
+        )
+        return OptionSet(
+            proficiency_ids=frozenset().union(
+                *(grant.proficiency_ids for grant in grants)
+            ),
+            base_languages=base_languages,
+            language_ids=frozenset(
+                self._language_ids[_key(name)]
+                for name in base_languages
+                if _key(name) in self._language_ids
+            ),
+            trait_ids=frozenset().union(*(grant.trait_ids for grant in grants)),
+        )
+
+
+@reference_cached
+def creation_option_index():
+    """Build the race/class option index from the current reference data."""
+    proficiencies = [
+        {
+            "id": row.id,
+            "name": row.name,
+            "type": row.proficiency_type,
+            "description": row.description,
+        }
+        for row in db.session.query(
+            Proficiency.id,
+            Proficiency.name,
+            Proficiency.proficiency_type,
+            Proficiency.description,
+        ).order_by(Proficiency.name)
+    ]
+    languages = [
+        {"id": row.id, "name": row.name, "description": row.description}
+        for row in db.session.query(
+            Language.id, Language.name, Language.description
+        ).order_by(Language.name)
+    ]
+    traits = [
+        {"id": row.id, "name": row.name}
+        for row in db.session.query(Feature.id, Feature.name)
+        .filter(Feature.feature_type == "racial")
+        .order_by(Feature.name)
+    ]
+    return CreationOptionIndex(
+        Species.query.all(),
+        SubSpecies.query.all(),
+        CharacterClass.query.all(),
+        proficiencies,
+        languages,
+        traits,
+    )
+
+
+# Feature bundles
+
+# Feature types offered to every character regardless of race or class
+GENERAL_FEATURE_TYPES = ("general", "feat")
+
+
+class FeatureBundles:
+    """Feature payloads grouped by normalized class and species keys.
+
+    Racial features without a species key predate source_species and are
+    offered to every race.
+    """
+
+    def __init__(self, features):
+        self.class_features = []
+        self.by_class = {}
+        self.shared_racial = []
+        self.by_species = {}
+        self.general = []
+
+        for feature in features:
+            payload = {
+                "id": feature.id,
+                "name": feature.name,
+                "source": feature.source_class or feature.feature_type.title(),
+                "description": feature.description,
+            }
+            if feature.feature_type == "class":
+                self.class_features.append(payload)
+                if feature.class_key:
+                    self.by_class.setdefault(feature.class_key, []).append(payload)
+            elif feature.feature_type == "racial":
+                if feature.species_key:
+                    self.by_species.setdefault(feature.species_key, []).append(payload)
+                else:
+                    self.shared_racial.append(payload)
+            else:
+                self.general.append(payload)
+
+    def for_class(self, character_class):
+        """Class features for a class, or every class feature without one."""
+        key = _key(character_class)
+        return self.by_class.get(key, []) if key else self.class_features
+
+    def for_species(self, race):
+        """Racial features for a race plus those shared by every race."""
+        return self.shared_racial + self.by_species.get(_key(race), [])
+
+    def options(self, race, character_class):
+        """Racial, class and general features offered for a race/class pair."""
+        return (
+            self.for_species(race) + self.for_class(character_class) + self.general
+        )
+
+
+@reference_cached
+def feature_bundles():
+    """Load offered features once and group them by class and species."""
+    features = (
+        db.session.query(
+            Feature.id,
+            Feature.name,
+            text_summary(Feature.description).label("description"),
+            Feature.feature_type,
+            Feature.source_class,
+            Feature.class_key,
+            Feature.species_key,
+        )
+        .filter(
+            Feature.feature_type.in_(("racial", "class") + GENERAL_FEATURE_TYPES)
+        )
+        .order_by(Feature.feature_type, Feature.name)
+        .all()
+    )
+    return FeatureBundles(features)
@@ -0,0 +1,360 @@
+"""JSON API for reading and writing characters.
+
+PATCH applies only the fields present in the request body, so changing
+HP issues an UPDATE of current_hp and the version stamps rather than
+rewriting every column and relationship the way the edit form does.
+Responses honour ?fields= and ?include= (see project.fieldsets).
+Computed values such as modifiers, saves, armor class and attacks are
+read from the CharacterSheet presenter at /<id>/sheet.
+"""
+
+from flask import Blueprint, jsonify, request, url_for
+from flask_login import current_user, login_required
+from sqlalchemy.exc import SQLAlchemyError
+from project import db
+from project.fieldsets import FieldsetError, loader_options, parse_fieldset
+from project.models import (
+    Character,
+    CharacterClass,
+    Feature,
+    Language,
+    Proficiency,
+    Species,
+    Spell,
+    SubSpecies,
+)
+from project.rules import character_sheet
+
+bp = Blueprint("character_api", __name__, url_prefix="/characters/api/characters")
+
+# Character columns clients may write, with the JSON type each accepts
+WRITABLE_FIELDS = {
+    "name": str,
+    "player_name": str,
+    "level": int,
+    "background": str,
+    "alignment": str,
+    "experience_points": int,
+    "proficiency_bonus": int,
+    "strength": int,
+    "dexterity": int,
+    "constitution": int,
+    "intelligence": int,
+    "wisdom": int,
+    "charisma": int,
+    "str_save_proficient": bool,
+    "dex_save_proficient": bool,
+    "con_save_proficient": bool,
+    "int_save_proficient": bool,
+    "wis_save_proficient": bool,
+    "cha_save_proficient": bool,
+    "current_hp": int,
+    "max_hp": int,
+    "temp_hp": int,
+    "hit_dice": str,
+    "armor_class": int,
+    "initiative": int,
+    "speed": int,
+    "death_save_successes": int,
+    "death_save_failures": int,
+    "gold_pieces": int,
+    "silver_pieces": int,
+    "copper_pieces": int,
+    "platinum_pieces": int,
+    "electrum_pieces": int,
+    "age": int,
+    "height": str,
+    "weight": str,
+    "eyes": str,
+    "skin": str,
+    "hair": str,
+    "personality_traits": str,
+    "ideals": str,
+    "bonds": str,
+    "flaws": str,
+    "backstory": str,
+    "why_adventuring": str,
+    "motivation": str,
+    "origin": str,
+    "class_origin": str,
+    "attachments": str,
+    "secret": str,
+    "attitude_origin": str,
+    "other_proficiencies": str,
+    "attacks_spellcasting": str,
+    "features_traits": str,
+    "species_id": int,
+    "subspecies_id": int,
+    "class_id": int,
+}
+
+# Reference rows that a foreign key field must point at
+FOREIGN_KEY_MODELS = {
+    "species_id": Species,
+    "subspecies_id": SubSpecies,
+    "class_id": CharacterClass,
+}
+
+# Many-to-many collections written as lists of reference ids
+RELATIONSHIP_MODELS = {
+    "proficiencies": Proficiency,
+    "languages": Language,
+    "features": Feature,
+    "spells": Spell,
+}
+
+# Maintained by the server and returned, but never written by clients
+READ_ONLY_FIELDS = (
+    "id",
+    "user_id",
+    "inventory_version",
+    "relationship_version",
+    "sheet_version",
+    "created_at",
+    "updated_at",
+)
+
+# Every field a response can carry, in response order
+CHARACTER_FIELDS = (
+    ("id", "user_id")
+    + tuple(WRITABLE_FIELDS)
+    + ("inventory_version", "relationship_version", "sheet_version")
+    + ("created_at", "updated_at")
+)
+
+REQUIRED_FIELDS = (
+    "name",
+    "strength",
+    "dexterity",
+    "constitution",
+    "intelligence",
+    "wisdom",
+    "charisma",
+)
+
+
+def _check_value(name, value):
+    """Return an error message if value is not valid for the column, or None."""
+    expected = WRITABLE_FIELDS[name]
+    if value is None:
+        if not Character.__table__.columns[name].nullable:
+            return "May not be null."
+        return None
+    # bool is a subclass of int, but true is not a valid ability score
+    if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+        return f"Expected {expected.__name__}."
+    model = FOREIGN_KEY_MODELS.get(name)
+    if model is not None and db.session.get(model, value) is None:
+        return f"No {model.__name__} with id {value}."
+    return None
+
+
+def parse_character_data(data, partial):
+    """Validate a request body into (columns, relationships, errors).
+
+    With partial=False (POST) the required fields must all be present;
+    with partial=True (PATCH) only the fields given are checked.
+    """
+    if not isinstance(data, dict):
+        return {}, {}, {"body": "Expected a JSON object."}
+
+    columns, relationships, errors = {}, {}, {}
+    for name, value in data.items():
+        if name in WRITABLE_FIELDS:
+            error = _check_value(name, value)
+            if error:
+                errors[name] = error
+            else:
+                columns[name] = value
+        elif name in RELATIONSHIP_MODELS:
+            if not isinstance(value, list) or not all(
+                isinstance(row_id, int) and not isinstance(row_id, bool)
+                for row_id in value
+            ):
+                errors[name] = "Expected a list of ids."
+                continue
+            model = RELATIONSHIP_MODELS[name]
+            rows = model.query.filter(model.id.in_(value)).all() if value else []
+            missing = set(value) - {row.id for row in rows}
+            if missing:
+                errors[name] = f"Unknown ids: {sorted(missing)}."
+            else:
+                relationships[name] = rows
+        elif name in READ_ONLY_FIELDS:
+            errors[name] = "Read-only field."
+        else:
+            errors[name] = "Unknown field."
+
+    if not partial:
+        for name in REQUIRED_FIELDS:
+            if columns.get(name) is None and name not in errors:
+                errors[name] = "Required field."
+
+    return columns, relationships, errors
+
+
+def apply_character_data(character, columns, relationships):
+    """Set only the given columns and collections on a character."""
+    for name, value in columns.items():
+        setattr(character, name, value)
+    # Keep the stored bonus in step with level unless the client set it
+    if "level" in columns and "proficiency_bonus" not in columns:
+        character.update_proficiency_bonus()
+    for name, rows in relationships.items():
+        setattr(character, name, rows)
+
+
+def character_fieldset(args):
+    """Parse ?fields= and ?include= for character responses."""
+    return parse_fieldset(args, CHARACTER_FIELDS, tuple(RELATIONSHIP_MODELS))
+
+
+def character_loader_options(fieldset):
+    """Load only the columns and relationships a fieldset serializes."""
+    return loader_options(
+        Character,
+        fieldset,
+        related_columns={
+            name: (model.id, model.name) for name, model in RELATIONSHIP_MODELS.items()
+        },
+        relationships=tuple(RELATIONSHIP_MODELS),
+    )
+
+
+def serialize_character(character, fieldset=None):
+    """Return a character's fields and relationships as JSON-ready data."""
+    if fieldset is None:
+        fieldset = character_fieldset({})
+    data = {}
+    for name in fieldset.fields:
+        value = getattr(character, name)
+        data[name] = value.isoformat() if hasattr(value, "isoformat") else value
+    for name in fieldset.include:
+        data[name] = [
+            {"id": row.id, "name": row.name} for row in getattr(character, name)
+        ]
+    return data
+
+
+def _owned_character(character_id, options=()):
+    return (
+        Character.query.options(*options)
+        .filter_by(id=character_id, user_id=current_user.id)
+        .first_or_404()
+    )
+
+
+def _invalid(errors):
+    return jsonify({"errors": errors}), 400
+
+
+def _save_failed(action):
+    db.session.rollback()
+    return jsonify({"error": f"An error occurred while {action} the character."}), 500
+
+
+@bp.errorhandler(404)
+def not_found(error):
+    return jsonify({"error": "Character not found."}), 404
+
+
+@bp.errorhandler(FieldsetError)
+def invalid_fieldset(error):
+    return _invalid({error.parameter: str(error)})
+
+
+@bp.route("", methods=["GET"])
+@login_required
+def list_characters():
+    """List the current user's characters, limited by ?fields= and ?include=."""
+    fieldset = character_fieldset(request.args)
+    characters = (
+        Character.query.options(*character_loader_options(fieldset))
+        .filter_by(user_id=current_user.id)
+        .order_by(Character.name)
+        .all()
+    )
+    return jsonify(
+        {
+            "characters": [
+                serialize_character(character, fieldset) for character in characters
+            ]
+        }
+    )
+
+
+@bp.route("", methods=["POST"])
+@login_required
+def create_character():
+    """Create a character from a JSON body."""
+    fieldset = character_fieldset(request.args)
+    columns, relationships, errors = parse_character_data(
+        request.get_json(silent=True), partial=False
+    )
+    if errors:
+        return _invalid(errors)
+
+    character = Character(user_id=current_user.id)
+    apply_character_data(character, columns, relationships)
+    try:
+        db.session.add(character)
+        db.session.commit()
+    except SQLAlchemyError:
+        return _save_failed("creating")
+
+    response = jsonify(serialize_character(character, fieldset))
+    response.status_code = 201
+    response.headers["Location"] = url_for(
+        "character_api.get_character", character_id=character.id
+    )
+    return response
+
+
+@bp.route("/<int:character_id>", methods=["GET"])
+@login_required
+def get_character(character_id):
+    """Get one character, limited by ?fields= and ?include=."""
+    fieldset = character_fieldset(request.args)
+    character = _owned_character(character_id, character_loader_options(fieldset))
+    return jsonify(serialize_character(character, fieldset))
+
+
+@bp.route("/<int:character_id>/sheet", methods=["GET"])
+@login_required
+def get_character_sheet(character_id):
+    """Get the derived values shown on a character's sheet."""
+    character = _owned_character(character_id)
+    return jsonify(character_sheet(character).as_dict())
+
+
+@bp.route("/<int:character_id>", methods=["PATCH"])
+@login_required
+def update_character(character_id):
+    """Update only the fields present in the JSON body."""
+    fieldset = character_fieldset(request.args)
+    character = _owned_character(character_id)
+    columns, relationships, errors = parse_character_data(
+        request.get_json(silent=True), partial=True
+    )
+    if errors:
+        return _invalid(errors)
+
+    apply_character_data(character, columns, relationships)
+    try:
+        db.session.commit()
+    except SQLAlchemyError:
+        return _save_failed("updating")
+    return jsonify(serialize_character(character, fieldset))
+
+
+@bp.route("/<int:character_id>", methods=["DELETE"])
+@login_required
+def delete_character(character_id):
+    """Delete a character."""
+    character = _owned_character(character_id)
+    try:
+        db.session.delete(character)
+        db.session.commit()
+    except SQLAlchemyError:
+        return _save_failed("deleting")
+    return "", 204
@@ -1,28 +1,75 @@
 """Character management blueprint for D&D character sheets."""
 
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import (
+    Blueprint,
+    current_app,
+    flash,
+    jsonify,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
 from flask_login import login_required, current_user
 from sqlalchemy.exc import SQLAlchemyError
 from project import db
 from project.models import (
     Character,
+    CharacterSummary,
     Proficiency,
     Language,
     Item,
     CharacterItem,
     Feature,
     Spell,
+    SpellClass,
+)
+from project.catalog import (
+    ITEM_FACETS,
+    SpellBitmapIndex,
+    creation_option_index,
+    feature_bundles,
+    item_facet_counts,
+    item_facet_filters,
+    spell_bitmap_index,
+    text_summary,
+)
+from project.caching import LRUCache
+from project.fieldsets import FieldsetError, loader_options, parse_fieldset
+from project.http_cache import (
+    is_not_modified,
+    reference_cache,
+    set_validators,
+    stamp_etag,
+)
+from project.reference import (
+    TYPEAHEAD_MODELS,
+    reference_cached,
+    reference_version,
+    typeahead,
 )
+from project.rules import character_sheet
+from project.search import SEARCH_MODELS, search
 
 bp = Blueprint("characters", __name__, url_prefix="/characters")
 
 
+@bp.errorhandler(FieldsetError)
+def invalid_fieldset(error):
+    return jsonify({"errors": {error.parameter: str(error)}}), 400
+
+
 @bp.route("/")
 @login_required
 def index():
-    """Display all characters for the current user."""
-    characters = Character.query.filter_by(user_id=current_user.id).all()
-    return render_template("characters/index.html", characters=characters)
+    """Display all characters for the current user from their summary rows."""
+    summaries = (
+        CharacterSummary.query.filter_by(user_id=current_user.id)
+        .order_by(CharacterSummary.name)
+        .all()
+    )
+    return render_template("characters/index.html", characters=summaries)
 
 
 @bp.route("/create", methods=["GET", "POST"])
@@ -74,7 +121,7 @@ def create():
         # Validation
         if not all([name, race, character_class]):
             flash("Name, race, and class are required.", "error")
-            return render_template("characters/create.html")
+            return render_create_form()
 
         # Create character
         character = Character(
@@ -146,20 +193,94 @@ def create():
         except SQLAlchemyError:
             db.session.rollback()
             flash("An error occurred while creating the character.", "error")
-            return render_template("characters/create.html")
+            return render_create_form()
 
     # GET request - show form with dynamic loading enabled
-    return render_template("characters/create.html")
+    return render_create_form()
+
+
+def render_create_form():
+    """Render the creation form with races and classes from reference data."""
+    index = creation_option_index()
+    return render_template(
+        "characters/create.html", races=index.race_names, classes=index.class_names
+    )
 
 
 @bp.route("/<int:character_id>")
 @login_required
 def view(character_id):
-    """View a specific character."""
+    """View a specific character.
+
+    The sheet's version stamps are read with a single-row query first, so
+    a revalidation answers 304 without loading relationships or rendering.
+    """
+    stamps = (
+        db.session.query(
+            Character.uid,
+            Character.updated_at,
+            Character.sheet_version,
+            Character.inventory_version,
+            Character.relationship_version,
+        )
+        .filter_by(id=character_id, user_id=current_user.id)
+        .first_or_404()
+    )
+    # Rules-derived sections depend on reference data as well; uid keeps a
+    # character recreated with a deleted one's id from matching its ETag
+    etag = stamp_etag(
+        current_user.id,
+        character_id,
+        stamps.uid,
+        stamps.sheet_version,
+        stamps.inventory_version,
+        stamps.relationship_version,
+        reference_version(),
+    )
+    if is_not_modified(etag, stamps.updated_at):
+        return set_validators(
+            current_app.response_class(status=304), etag, stamps.updated_at
+        )
+
     character = Character.query.filter_by(
         id=character_id, user_id=current_user.id
     ).first_or_404()
-    return render_template("characters/view.html", character=character)
+    sheet = character_sheet(character)
+    response = make_response(
+        render_template(
+            "characters/view.html",
+            character=character,
+            sheet=sheet,
+            fragment_keys=sheet_fragment_keys(character, sheet),
+        )
+    )
+    return set_validators(response, etag, stamps.updated_at)
+
+
+def sheet_fragment_keys(character, sheet):
+    """Cache keys for the sheet sections that view.html caches.
+
+    Sections drawn from the sheet are keyed on the values they render, so
+    a class, species or equipment change always re-renders them, while an
+    HP change reuses every cached section. uid guards against SQLite
+    reusing the id of a deleted character.
+    """
+    identity = (character.id, character.uid)
+    skills = sheet.skills
+    return {
+        "attacks": identity + sheet.attacks,
+        "abilities": identity + sheet.abilities,
+        "skills": identity
+        + (
+            tuple(skills.modifiers.items()),
+            tuple(sorted(skills.proficient)),
+            skills.passive_perception,
+            skills.passive_investigation,
+            skills.passive_insight,
+        ),
+        "relationships": identity + (character.relationship_version,),
+        "inventory": identity + (character.inventory_version,),
+    }
 
 
 @bp.route("/<int:character_id>/edit", methods=["GET", "POST"])
@@ -355,278 +476,361 @@ def remove_item(item_id):
 # API endpoints for dynamic character creation
 @bp.route("/api/proficiencies")
 @login_required
+@reference_cache
 def get_available_proficiencies():
     """Get proficiencies available for a race/class combination."""
     race = request.args.get("race", "")
+    subrace = request.args.get("subrace", "")
     character_class = request.args.get("class", "")
-    proficiencies = []
-
-    # Race-specific proficiencies
-    race_proficiencies = {
-        "Elf": ["Longsword", "Shortbow", "Longbow", "Perception"],
-        "Dwarf": ["Battleaxe", "Handaxe", "Light Hammer", "Warhammer"],
-        "Human": [],  # Humans get flexible proficiencies
-        "Halfling": ["Sling"],
-        "Dragonborn": [],
-        "Gnome": [],
-        "Half-Elf": [],
-        "Half-Orc": [],
-        "Tiefling": [],
-    }
+    return jsonify(proficiency_options(race, character_class, subrace))
 
-    # Class-specific proficiencies
-    class_proficiencies = {
-        "Fighter": [
-            "Simple Weapons",
-            "Martial Weapons",
-            "Light Armor",
-            "Medium Armor",
-            "Heavy Armor",
-            "Shields",
-        ],
-        "Wizard": ["Dagger", "Dart", "Sling", "Quarterstaff", "Light Crossbow"],
-        "Rogue": [
-            "Simple Weapons",
-            "Hand Crossbow",
-            "Longsword",
-            "Rapier",
-            "Shortsword",
-            "Light Armor",
-            "Thieves' Tools",
-        ],
-        "Cleric": ["Simple Weapons", "Light Armor", "Medium Armor", "Shields"],
-        "Ranger": [
-            "Simple Weapons",
-            "Martial Weapons",
-            "Light Armor",
-            "Medium Armor",
-            "Shields",
-        ],
-        "Paladin": [
-            "Simple Weapons",
-            "Martial Weapons",
-            "Light Armor",
-            "Medium Armor",
-            "Heavy Armor",
-            "Shields",
-        ],
-        "Barbarian": [
-            "Simple Weapons",
-            "Martial Weapons",
-            "Light Armor",
-            "Medium Armor",
-            "Shields",
-        ],
-        "Bard": [
-            "Simple Weapons",
-            "Hand Crossbow",
-            "Longsword",
-            "Rapier",
-            "Shortsword",
-            "Light Armor",
-        ],
-        "Druid": [
-            "Light Armor",
-            "Medium Armor",
-            "Shields",
-            "Scimitar",
-            "Shortsword",
-            "Simple Weapons",
-        ],
-        "Monk": ["Simple Weapons", "Shortsword"],
-        "Sorcerer": ["Dagger", "Dart", "Sling", "Quarterstaff", "Light Crossbow"],
-        "Warlock": ["Simple Weapons", "Light Armor"],
-    }
 
-    # Combine race and class proficiencies
-    available_names = set()
-    available_names.update(race_proficiencies.get(race, []))
-    available_names.update(class_proficiencies.get(character_class, []))
+def proficiency_options(race, character_class, subrace=None):
+    """Build the proficiency options payload for a race/class combination."""
+    index = creation_option_index()
+    options = index.resolve(race, character_class, subrace)
 
-    # Get proficiencies from database that match available names
-    if available_names:
-        proficiencies = Proficiency.query.filter(
-            Proficiency.name.in_(available_names)
-        ).all()
+    if options.proficiency_ids:
+        proficiencies = [
+            prof
+            for prof_id, prof in index.proficiencies.items()
+            if prof_id in options.proficiency_ids
+        ]
     else:
         # If no specific restrictions, return all proficiencies
-        proficiencies = Proficiency.query.all()
+        proficiencies = list(index.proficiencies.values())
 
-    return jsonify(
-        {
-            "proficiencies": [
-                {
-                    "id": prof.id,
-                    "name": prof.name,
-                    "type": prof.proficiency_type,
-                    "description": prof.description,
-                }
-                for prof in proficiencies
-            ]
-        }
-    )
+    return {"proficiencies": proficiencies}
 
 
 @bp.route("/api/languages")
 @login_required
+@reference_cache
 def get_available_languages():
     """Get languages available for a race/class combination."""
     race = request.args.get("race", "")
+    subrace = request.args.get("subrace", "")
     character_class = request.args.get("class", "")
-    # Race-specific languages
-    race_languages = {
-        "Elf": ["Common", "Elvish"],
-        "Dwarf": ["Common", "Dwarvish"],
-        "Human": ["Common"],  # Humans get one additional language of choice
-        "Halfling": ["Common", "Halfling"],
-        "Dragonborn": ["Common", "Draconic"],
-        "Gnome": ["Common", "Gnomish"],
-        "Half-Elf": ["Common", "Elvish"],  # Plus one additional
-        "Half-Orc": ["Common", "Orc"],
-        "Tiefling": ["Common", "Infernal"],
-    }
+    return jsonify(language_options(race, character_class, subrace))
 
-    # Some classes might provide additional languages
-    class_languages = {
-        "Druid": ["Druidic"],
-        "Cleric": [],  # Depends on domain
-        "Wizard": [],  # Can learn through study
-    }
 
-    base_languages = race_languages.get(race, ["Common"])
-    class_bonus = class_languages.get(character_class, [])
-    base_languages.extend(class_bonus)
+def language_options(race, character_class, subrace=None):
+    """Build the language options payload for a race/class combination."""
+    index = creation_option_index()
+    options = index.resolve(race, character_class, subrace)
 
-    # Get all languages for selection (players can choose additional ones)
-    all_languages = Language.query.all()
+    # Players can choose additional languages from the full list
+    return {
+        "base_languages": list(options.base_languages),
+        "languages": list(index.languages.values()),
+    }
 
-    return jsonify(
-        {
-            "base_languages": base_languages,
-            "languages": [
-                {"id": lang.id, "name": lang.name, "description": lang.description}
-                for lang in all_languages
-            ],
-        }
-    )
+
+def trait_options(race, subrace=None):
+    """Build the racial trait payload for a race and optional subrace."""
+    index = creation_option_index()
+    options = index.resolve(race, None, subrace)
+    return {
+        "traits": [
+            trait
+            for trait_id, trait in index.traits.items()
+            if trait_id in options.trait_ids
+        ]
+    }
 
 
 @bp.route("/api/features")
 @login_required
+@reference_cache
 def get_available_features():
     """Get features available for a race/class combination."""
+    race = request.args.get("race", "")
     character_class = request.args.get("class", "")
+    return jsonify(feature_options(character_class, race))
 
-    # Get racial features (for now, return all racial features)
-    racial_features = Feature.query.filter(Feature.feature_type == "racial").all()
 
-    # Get class features specific to the class
-    class_features = Feature.query.filter(
-        Feature.feature_type == "class",
-        Feature.source_class.ilike(f"%{character_class}%") if character_class else True,
-    ).all()
+def feature_options(character_class, race=None):
+    """Build the feature options payload for a class and optional race."""
+    return {"features": feature_bundles().options(race, character_class)}
 
-    # Get general features available to all
-    general_features = Feature.query.filter(
-        Feature.feature_type.in_(["general", "feat"])
-    ).all()
 
-    # Combine all available features
-    features = racial_features + class_features + general_features
+@bp.route("/api/spells")
+@login_required
+@reference_cache
+def get_available_spells():
+    """Get spells on a class's spell list, up to a maximum spell level.
 
-    return jsonify(
-        {
-            "features": [
-                {
-                    "id": feat.id,
-                    "name": feat.name,
-                    "source": feat.source_class or feat.feature_type.title(),
-                    "description": feat.description,
-                }
-                for feat in features
-            ]
-        }
+    ?fields= limits the columns selected for each spell.
+    """
+    character_class = request.args.get("class", "")
+    # Spells up to level 2 are offered during character creation by default
+    max_level = request.args.get("max_level", 2, type=int)
+    fieldset = parse_fieldset(request.args, tuple(SPELL_OPTION_COLUMNS))
+    return jsonify(spell_options(character_class, max_level, fieldset.fields))
+
+
+# Columns the spell options list can return, in response order
+SPELL_OPTION_COLUMNS = {
+    "id": Spell.id,
+    "name": Spell.name,
+    "level": Spell.level,
+    "school": Spell.school,
+    "description": text_summary(Spell.description).label("description"),
+}
+
+
+def spell_options(character_class, max_level=2, fields=None):
+    """Build the spell options payload for a class up to max_level.
+
+    fields selects which SPELL_OPTION_COLUMNS are queried and returned.
+    """
+    # Non-spellcasting classes have no spell_class rows and get an empty list
+    if not character_class:
+        return {"spells": []}
+
+    spells = (
+        db.session.query(
+            *[SPELL_OPTION_COLUMNS[name] for name in fields or SPELL_OPTION_COLUMNS]
+        )
+        .join(SpellClass)
+        .filter(
+            SpellClass.class_name == character_class.lower(),
+            Spell.level <= max_level,
+        )
+        .order_by(Spell.level, Spell.name)
+        .all()
     )
 
+    return {"spells": [spell._asdict() for spell in spells]}
 
-@bp.route("/api/spells")
+
+# Fields of the spell detail response, and the Spell attribute behind each
+SPELL_DETAIL_ATTRIBUTES = {
+    "id": Spell.id,
+    "name": Spell.name,
+    "level": Spell.level,
+    "school": Spell.school,
+    "casting_time": Spell.casting_time,
+    "range": Spell.spell_range,
+    "components": Spell.components,
+    "duration": Spell.duration,
+    "description": Spell.description,
+    "higher_level": Spell.higher_level,
+    "source": Spell.source,
+    "is_ritual": Spell.is_ritual,
+    "requires_concentration": Spell.requires_concentration,
+}
+
+
+@bp.route("/api/spells/<int:spell_id>")
 @login_required
-def get_available_spells():
-    """Get spells available for a class."""
+@reference_cache
+def get_spell(spell_id):
+    """Get the complete rules text for a single spell.
+
+    ?fields= limits the columns loaded and returned; ?include=classes
+    (the default) adds the classes whose spell list includes it.
+    """
+    fieldset = parse_fieldset(
+        request.args, tuple(SPELL_DETAIL_ATTRIBUTES), ("classes",)
+    )
+    spell = (
+        Spell.query.options(
+            *loader_options(
+                Spell,
+                fieldset,
+                dict(SPELL_DETAIL_ATTRIBUTES, classes=Spell.class_entries),
+                {"classes": (SpellClass.class_name,)},
+            )
+        )
+        .filter_by(id=spell_id)
+        .first_or_404()
+    )
+    data = {
+        name: getattr(spell, SPELL_DETAIL_ATTRIBUTES[name].key)
+        for name in fieldset.fields
+    }
+    if "classes" in fieldset.include:
+        data["classes"] = [entry.class_name for entry in spell.class_entries]
+    return jsonify(data)
+
+
+@reference_cached
+def creation_bundles():
+    """Per race/class option bundles, discarded when reference data changes."""
+    return LRUCache(maxsize=512)
+
+
+def creation_options(race, character_class, subrace=None):
+    """Return every option set for a race/class pair as one cached bundle."""
+
+    def build():
+        bundle = {"race": race, "subrace": subrace, "class": character_class}
+        bundle.update(proficiency_options(race, character_class, subrace))
+        bundle.update(language_options(race, character_class, subrace))
+        bundle.update(trait_options(race, subrace))
+        bundle.update(feature_options(character_class, race))
+        bundle.update(spell_options(character_class))
+        return bundle
+
+    key = (race, subrace, character_class)
+    return creation_bundles().get_or_compute(key, build)
+
+
+@bp.route("/api/creation-options")
+@login_required
+@reference_cache
+def get_creation_options():
+    """Get proficiencies, languages, features and spells in one response."""
+    race = request.args.get("race", "")
+    subrace = request.args.get("subrace", "")
     character_class = request.args.get("class", "")
-    # Class spell lists
-    class_spell_lists = {
-        "Wizard": ["wizard"],
-        "Sorcerer": ["sorcerer"],
-        "Warlock": ["warlock"],
-        "Bard": ["bard"],
-        "Cleric": ["cleric"],
-        "Druid": ["druid"],
-        "Paladin": ["paladin"],
-        "Ranger": ["ranger"],
+    return jsonify(creation_options(race, character_class, subrace))
+
+
+@bp.route("/api/spells/filter")
+@login_required
+@reference_cache
+def filter_spells():
+    """Filter the spell catalog in memory using precomputed bitsets.
+
+    Each attribute (level, school, ritual, concentration, class) accepts
+    comma-separated values that are ORed; attributes are ANDed together.
+    """
+    criteria = {
+        attribute: [
+            value
+            for value in request.args.get(attribute, "").split(",")
+            if value.strip()
+        ]
+        for attribute in SpellBitmapIndex.ATTRIBUTES
     }
 
-    # Non-spellcasting classes
-    if character_class not in class_spell_lists:
-        return jsonify({"spells": []})
+    index = spell_bitmap_index()
+    bits = index.filter(criteria)
+    ids = index.ids_for(bits)
+
+    return jsonify({"ids": ids, "count": len(ids), "counts": index.counts(bits)})
+
+
+# Columns the item browser can return, in response order
+ITEM_BROWSE_COLUMNS = {
+    "id": Item.id,
+    "name": Item.name,
+    "item_type": Item.item_type,
+    "rarity": Item.rarity,
+    "cost_gp": Item.cost_gp,
+    "weight_lbs": Item.weight_lbs,
+    "is_magical": Item.is_magical,
+    "requires_attunement": Item.requires_attunement,
+    "damage_type": Item.damage_type,
+}
 
-    # Get spells available to this class (level 0-2 for character creation)
-    spells = Spell.query.filter(Spell.level <= 2).all()
+
+@bp.route("/api/items")
+@login_required
+@reference_cache
+def browse_items():
+    """Browse items by facet, returning a page of results and facet counts.
+
+    Facets (item_type, rarity, is_magical, requires_attunement,
+    damage_type, cost) accept comma-separated values. Counts come from
+    the precomputed item_facet_count table rather than GROUP BY queries.
+    ?fields= limits the columns selected for each item.
+    """
+    criteria = {
+        facet: [value for value in request.args.get(facet, "").split(",") if value]
+        for facet in ITEM_FACETS
+    }
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 50, type=int), 1), 200)
+    fieldset = parse_fieldset(request.args, tuple(ITEM_BROWSE_COLUMNS))
+
+    query = db.session.query(
+        *[ITEM_BROWSE_COLUMNS[name] for name in fieldset.fields]
+    ).filter(*item_facet_filters(criteria))
+    total = query.count()
+    items = (
+        query.order_by(Item.name).offset((page - 1) * per_page).limit(per_page).all()
+    )
+
+    return jsonify(
+        {
+            "items": [item._asdict() for item in items],
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "facets": item_facet_counts(),
+        }
+    )
+
+
+@bp.route("/api/search")
+@login_required
+@reference_cache
+def search_rules_text():
+    """Ranked, paginated full-text search over spells, features and items."""
+    query = request.args.get("q", "")
+    kinds = [kind for kind in request.args.get("types", "").split(",") if kind]
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 20, type=int), 1), 100)
+
+    hits, total = search(query, kinds or list(SEARCH_MODELS), page, per_page)
 
     return jsonify(
         {
-            "spells": [
+            "query": query,
+            "page": page,
+            "per_page": per_page,
+            "total": total,
+            "results": [
                 {
-                    "id": spell.id,
-                    "name": spell.name,
-                    "level": spell.level,
-                    "school": spell.school,
-                    "description": (
-                        spell.description[:100] + "..."
-                        if len(spell.description) > 100
-                        else spell.description
-                    ),
+                    "type": hit.kind,
+                    "id": hit.id,
+                    "name": hit.name,
+                    "snippet": hit.snippet,
                 }
-                for spell in spells
-            ]
+                for hit in hits
+            ],
+        }
+    )
+
+
+@bp.route("/api/typeahead")
+@login_required
+@reference_cache
+def name_typeahead():
+    """Autocomplete reference names from the in-process prefix index."""
+    prefix = request.args.get("q", "")
+    kinds = [kind for kind in request.args.get("types", "").split(",") if kind]
+    limit = min(max(request.args.get("limit", 10, type=int), 1), 50)
+
+    matches = typeahead(prefix, kinds or list(TYPEAHEAD_MODELS), limit)
+
+    return jsonify(
+        {
+            "query": prefix,
+            "results": [
+                {"type": match.kind, "id": match.id, "name": match.name}
+                for match in matches
+            ],
         }
     )
 
 
 @bp.route("/api/races")
 @login_required
+@reference_cache
 def get_races():
     """Get all available races."""
-    races = [
-        "Human",
-        "Elf",
-        "Dwarf",
-        "Halfling",
-        "Dragonborn",
-        "Gnome",
-        "Half-Elf",
-        "Half-Orc",
-        "Tiefling",
-    ]
+    races = creation_option_index().race_names
     return jsonify(races)
 
 
 @bp.route("/api/classes")
 @login_required
+@reference_cache
 def get_classes():
     """Get all available classes."""
-    classes = [
-        "Barbarian",
-        "Bard",
-        "Cleric",
-        "Druid",
-        "Fighter",
-        "Monk",
-        "Paladin",
-        "Ranger",
-        "Rogue",
-        "Sorcerer",
-        "Warlock",
-        "Wizard",
-    ]
+    classes = creation_option_index().class_names
     return jsonify(classes)
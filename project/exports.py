@@ -0,0 +1,178 @@
+"""Streaming NDJSON export of a user's characters.
+
+Characters are read with yield_per and their relationships loaded with
+selectinload a batch at a time, then written one JSON object per line
+in chunks, optionally gzip-compressed. Only one batch is held in memory
+however many characters the account has. Records name species, classes
+and other reference rows instead of using database ids, so they can be
+imported into another database.
+"""
+
+import json
+import sys
+import zlib
+import click
+from flask import Blueprint, Response, request, stream_with_context
+from flask_login import current_user, login_required
+from sqlalchemy.orm import selectinload
+from project import db
+from project.character_api import FOREIGN_KEY_MODELS, WRITABLE_FIELDS
+from project.models import (
+    Character,
+    CharacterClass,
+    CharacterItem,
+    Feature,
+    Item,
+    Language,
+    Proficiency,
+    Species,
+    Spell,
+    SubSpecies,
+    User,
+)
+
+bp = Blueprint("exports", __name__, url_prefix="/characters", cli_group=None)
+
+# Characters loaded, serialized and written per chunk
+EXPORT_BATCH_SIZE = 200
+
+# Character columns written as-is; reference ids are written as names
+EXPORT_COLUMNS = tuple(
+    name for name in WRITABLE_FIELDS if name not in FOREIGN_KEY_MODELS
+)
+
+# Record key for each reference a character points at
+EXPORT_REFERENCES = {
+    "species": ("species_id", Species),
+    "subspecies": ("subspecies_id", SubSpecies),
+    "class": ("class_id", CharacterClass),
+}
+
+# Many-to-many collections written as lists of names
+EXPORT_COLLECTIONS = {
+    "proficiencies": Proficiency,
+    "languages": Language,
+    "features": Feature,
+    "spells": Spell,
+}
+
+INVENTORY_COLUMNS = (
+    "quantity",
+    "equipped",
+    "equipment_slot",
+    "condition",
+    "notes",
+    "attuned",
+    "current_charges",
+)
+
+SPELL_SLOT_COLUMNS = ("level", "total_slots", "used_slots")
+
+
+def reference_names():
+    """Return {record key: {id: name}} for the references characters use."""
+    return {
+        key: dict(db.session.query(model.id, model.name))
+        for key, (_, model) in EXPORT_REFERENCES.items()
+    }
+
+
+def export_record(character, names):
+    """Serialize a character, with reference names from reference_names()."""
+    record = {name: getattr(character, name) for name in EXPORT_COLUMNS}
+    for key, (column, _) in EXPORT_REFERENCES.items():
+        record[key] = names[key].get(getattr(character, column))
+    for name in EXPORT_COLLECTIONS:
+        record[name] = sorted(row.name for row in getattr(character, name))
+    record["inventory"] = [
+        dict(
+            {column: getattr(entry, column) for column in INVENTORY_COLUMNS},
+            item=entry.item.name,
+        )
+        for entry in character.inventory
+    ]
+    record["spell_slots"] = [
+        {column: getattr(slot, column) for column in SPELL_SLOT_COLUMNS}
+        for slot in sorted(character.spell_slots, key=lambda slot: slot.level)
+    ]
+    return record
+
+
+def character_records(user_id, batch_size=EXPORT_BATCH_SIZE):
+    """Yield export records for a user's characters a batch at a time."""
+    names = reference_names()
+    options = [
+        selectinload(getattr(Character, name)).load_only(model.name)
+        for name, model in EXPORT_COLLECTIONS.items()
+    ]
+    options += [
+        selectinload(Character.inventory)
+        .selectinload(CharacterItem.item)
+        .load_only(Item.name),
+        selectinload(Character.spell_slots),
+    ]
+    query = (
+        Character.query.options(*options)
+        .filter_by(user_id=user_id)
+        .order_by(Character.id)
+        .yield_per(batch_size)
+    )
+    for character in query:
+        yield export_record(character, names)
+
+
+def ndjson_chunks(records, batch_size=EXPORT_BATCH_SIZE):
+    """Encode records as NDJSON, yielding one bytes chunk per batch."""
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, separators=(",", ":"), default=str))
+        if len(lines) >= batch_size:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def gzip_chunks(chunks):
+    """Compress a stream of bytes chunks into a single gzip stream."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(user_id, compress=False):
+    """The export file for a user as a stream of bytes chunks."""
+    chunks = ndjson_chunks(character_records(user_id))
+    return gzip_chunks(chunks) if compress else chunks
+
+
+@bp.route("/export")
+@login_required
+def export():
+    """Download every character as NDJSON; ?gzip=1 compresses the file."""
+    compress = request.args.get("gzip", type=int, default=0) == 1
+    filename = "characters.ndjson.gz" if compress else "characters.ndjson"
+    response = Response(
+        stream_with_context(export_chunks(current_user.id, compress)),
+        mimetype="application/gzip" if compress else "application/x-ndjson",
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+@bp.cli.command("export-characters")
+@click.argument("email")
+@click.option("--output", "-o", type=click.File("wb"), help="File to write.")
+@click.option("--gzip", "compress", is_flag=True, help="Compress with gzip.")
+def export_command(email, output, compress):
+    """Write every character owned by EMAIL as NDJSON to stdout or a file."""
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise click.ClickException(f"No user with email {email}.")
+    output = output or sys.stdout.buffer
+    for chunk in export_chunks(user.id, compress):
+        output.write(chunk)
+    output.flush()
@@ -0,0 +1,83 @@
+"""Sparse fieldsets for the JSON APIs.
+
+?fields=name,current_hp limits a response to those keys and
+?include=languages picks the relationships embedded in it. Endpoints
+pass the same Fieldset to their query, so columns and relationships a
+client did not ask for are never loaded either.
+"""
+
+from collections import namedtuple
+from sqlalchemy.orm import lazyload, load_only, selectinload
+
+Fieldset = namedtuple("Fieldset", ["fields", "include"])
+
+
+class FieldsetError(ValueError):
+    """Raised when fields or include name something the API does not offer."""
+
+    def __init__(self, parameter, names):
+        self.parameter = parameter
+        self.names = names
+        super().__init__(f"Unknown {parameter}: {', '.join(names)}.")
+
+
+def _names(value):
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def parse_fieldset(args, fields, relationships=(), always=("id",)):
+    """Read ?fields= and ?include= from request args into a Fieldset.
+
+    Without ?fields= every field is returned; without ?include= every
+    relationship is. Names are returned in the API's own order, always
+    starting with the fields in always, so equal requests give equal
+    bodies. Unknown names raise FieldsetError.
+    """
+    selected = fields
+    if "fields" in args:
+        requested = _names(args["fields"])
+        unknown = [name for name in requested if name not in fields]
+        if unknown:
+            raise FieldsetError("fields", unknown)
+        requested = set(requested) | set(always)
+        selected = tuple(name for name in fields if name in requested)
+
+    included = tuple(relationships)
+    if "include" in args:
+        requested = _names(args["include"])
+        unknown = [name for name in requested if name not in relationships]
+        if unknown:
+            raise FieldsetError("include", unknown)
+        included = tuple(name for name in relationships if name in requested)
+
+    return Fieldset(selected, included)
+
+
+def loader_options(
+    model, fieldset, attributes=None, related_columns=None, relationships=()
+):
+    """Loader options that fetch only the columns and relationships asked for.
+
+    attributes maps a field or relationship name to its model attribute
+    where the two differ; fields mapped to None are computed rather than
+    loaded. related_columns maps a relationship to the columns loaded
+    for it. Relationships in relationships that were not included fall
+    back to lazy loading, so eager defaults on the model are skipped.
+    """
+    attributes = attributes or {}
+    related_columns = related_columns or {}
+
+    def attribute(name):
+        return attributes[name] if name in attributes else getattr(model, name)
+
+    columns = [attribute(name) for name in fieldset.fields]
+    options = [load_only(*[column for column in columns if column is not None])]
+    for name in fieldset.include:
+        loader = selectinload(attribute(name))
+        if name in related_columns:
+            loader = loader.load_only(*related_columns[name])
+        options.append(loader)
+    for name in relationships:
+        if name not in fieldset.include:
+            options.append(lazyload(attribute(name)))
+    return options
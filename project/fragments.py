@@ -0,0 +1,52 @@
+"""Fragment caching for template sections.
+
+Wrapping part of a template in {% cache "name", key %}...{% endcache %}
+stores its rendered output in a bounded per-app LRU cache. The body,
+including any lazy relationship loads inside it, only runs on a miss.
+Keys are combined with the template name and the reference data
+version, so reseeding never serves stale reference names.
+"""
+
+from flask import current_app, has_app_context
+from jinja2 import nodes
+from jinja2.ext import Extension
+from project.caching import LRUCache
+from project.reference import reference_version
+
+# Rendered fragments kept per app
+DEFAULT_FRAGMENT_CACHE_SIZE = 4096
+
+
+def fragment_cache():
+    """Return this app's rendered fragment cache."""
+    cache = current_app.extensions.get("template_fragments")
+    if cache is None:
+        size = current_app.config.get(
+            "FRAGMENT_CACHE_SIZE", DEFAULT_FRAGMENT_CACHE_SIZE
+        )
+        cache = current_app.extensions.setdefault(
+            "template_fragments", LRUCache(maxsize=size)
+        )
+    return cache
+
+
+class FragmentCacheExtension(Extension):
+    """Adds the {% cache key, ... %}...{% endcache %} tag."""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [nodes.Const(parser.name), parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        key = nodes.Tuple(parts, "load")
+        return nodes.CallBlock(
+            self.call_method("_render", [key]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        if not has_app_context():
+            return caller()
+        return fragment_cache().get_or_compute(key + (reference_version(),), caller)
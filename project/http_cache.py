@@ -0,0 +1,135 @@
+"""HTTP validators, Cache-Control and content negotiation for cached data."""
+
+import functools
+import hashlib
+from datetime import timezone
+from flask import current_app, make_response, request, session
+from project.payloads import (
+    ENCODINGS,
+    canonical_query,
+    is_stored_request,
+    load_payload,
+    negotiate_encoding,
+    save_payload,
+)
+from project.reference import reference_version
+
+# Seconds a browser may reuse a reference response before revalidating
+DEFAULT_REFERENCE_MAX_AGE = 300
+
+
+def reference_etag():
+    """Strong ETag for the current request against the reference data version.
+
+    Query arguments are sorted so equivalent URLs share a validator.
+    """
+    args = "&".join(
+        f"{key}={value}"
+        for key, value in canonical_query(request.args.items(multi=True))
+    )
+    key = f"{reference_version()}:{request.path}?{args}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def not_modified(etag, cache_control):
+    """Build an empty 304 response carrying the validators."""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def variant_etag(etag, encoding):
+    """ETag for one content-coding of a representation."""
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def payload_response(payload, etag):
+    """Serve the best stored variant of a payload for this request."""
+    encoding = negotiate_encoding(payload, request.accept_encodings)
+    body = getattr(payload, encoding) if encoding else payload.identity
+    response = current_app.response_class(body, mimetype="application/json")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.set_etag(variant_etag(etag, encoding))
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def reference_cache(view):
+    """Serve a reference endpoint with validators and stored payloads.
+
+    The If-None-Match check runs before the view, so a revalidation costs
+    no reference queries or serialization. For the pregenerated parameter
+    sets in stored_payload_requests() the view only runs the first time a
+    URL is requested for a reference data version; its JSON body is stored
+    with compressed variants and negotiated via Accept-Encoding. Any other
+    query, such as a typeahead keystroke, runs the view and only gets the
+    validators.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        max_age = current_app.config.get(
+            "REFERENCE_CACHE_MAX_AGE", DEFAULT_REFERENCE_MAX_AGE
+        )
+        # Reference endpoints sit behind login, so shared caches must not store them
+        cache_control = f"private, max-age={max_age}"
+        etag = reference_etag()
+        for encoding in (None,) + ENCODINGS:
+            if request.if_none_match.contains(variant_etag(etag, encoding)):
+                return not_modified(variant_etag(etag, encoding), cache_control)
+
+        if not is_stored_request(request.path, request.args.items(multi=True)):
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = cache_control
+            return response
+
+        payload = load_payload(etag)
+        if payload is None:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or not response.is_json:
+                return response
+            payload = save_payload(etag, response.get_data())
+
+        response = payload_response(payload, etag)
+        response.headers["Cache-Control"] = cache_control
+        return response
+
+    return wrapper
+
+
+def stamp_etag(*parts):
+    """Strong ETag from version stamps such as ids, counters and tokens."""
+    key = ":".join(str(part) for part in parts)
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def is_not_modified(etag, last_modified=None):
+    """Whether the request's validators still match etag and last_modified.
+
+    If-None-Match takes precedence over If-Modified-Since. Pending flash
+    messages always force a full response, since rendering consumes them.
+    """
+    if session.get("_flashes"):
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        # Database timestamps are naive UTC; HTTP dates have whole seconds
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def set_validators(response, etag, last_modified=None, cache_control="no-cache"):
+    """Attach ETag, Last-Modified and Cache-Control to a response."""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = cache_control
+    return response
@@ -0,0 +1,565 @@
+"""Bulk character import from NDJSON or CSV.
+
+Records use the format written by project.exports: character columns,
+reference rows by name, and lists of names for proficiencies, languages,
+features and spells. NDJSON records may also carry inventory and
+spell_slots lists; in CSV, list columns hold ";"-separated names.
+
+Large files are validated in a process pool, since validation only needs
+the record itself. Names are then resolved to ids through maps built
+once per reference data version, and characters, association rows,
+inventory, spell slots and summaries are written with core executemany
+inserts a chunk at a time. Invalid records are skipped and reported with
+their line number; the rest are imported.
+"""
+
+import csv
+import functools
+import gzip
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import click
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import current_user, login_required
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from project import db
+from project.character_api import REQUIRED_FIELDS, WRITABLE_FIELDS
+from project.exports import (
+    EXPORT_COLLECTIONS,
+    EXPORT_COLUMNS,
+    EXPORT_REFERENCES,
+    INVENTORY_COLUMNS,
+    SPELL_SLOT_COLUMNS,
+)
+from project.models import (
+    Character,
+    CharacterItem,
+    Item,
+    SpellSlot,
+    User,
+)
+from project.reference import reference_cached
+from project.rules import proficiency_bonus_for_level
+from project.summaries import insert_character_summaries
+
+bp = Blueprint("imports", __name__, url_prefix="/characters", cli_group=None)
+
+# Characters written per transaction
+DEFAULT_IMPORT_CHUNK_SIZE = 500
+
+# Files smaller than this are validated in-process; a pool costs more
+DEFAULT_IMPORT_PARALLEL_MIN_RECORDS = 1000
+
+FORMATS = ("ndjson", "csv")
+
+# Separator for list columns in CSV files
+CSV_LIST_SEPARATOR = ";"
+
+# Record key holding the cells of a CSV row that has more cells than headers
+CSV_EXTRA_KEY = "extra_columns"
+
+TRUE_STRINGS = ("1", "true", "yes", "y")
+FALSE_STRINGS = ("0", "false", "no", "n")
+
+NULLABLE_COLUMNS = frozenset(
+    column.name for column in Character.__table__.columns if column.nullable
+)
+
+
+def _string_lengths(table):
+    return {
+        column.name: column.type.length
+        for column in table.columns
+        if getattr(column.type, "length", None)
+    }
+
+
+# Declared String lengths, checked during validation since SQLite does not
+# enforce them and PostgreSQL would reject the whole chunk
+CHARACTER_LENGTHS = _string_lengths(Character.__table__)
+INVENTORY_LENGTHS = _string_lengths(CharacterItem.__table__)
+
+
+def _scalar_defaults(table):
+    return {
+        column.name: column.default.arg
+        for column in table.columns
+        if column.default is not None and column.default.is_scalar
+    }
+
+
+# executemany needs the same keys in every row, so absent values are
+# filled with the column default rather than left out
+CHARACTER_DEFAULTS = _scalar_defaults(Character.__table__)
+INVENTORY_DEFAULTS = _scalar_defaults(CharacterItem.__table__)
+SPELL_SLOT_DEFAULTS = _scalar_defaults(SpellSlot.__table__)
+
+# Association table and reference id column for each collection
+ASSOCIATIONS = {
+    name: (
+        getattr(Character, name).property.secondary,
+        getattr(Character, name).property.secondary.c[f"{model.__tablename__}_id"],
+    )
+    for name, model in EXPORT_COLLECTIONS.items()
+}
+
+# Reference models looked up by name, keyed by the record key naming them
+NAMED_MODELS = dict(
+    {key: model for key, (_, model) in EXPORT_REFERENCES.items()},
+    item=Item,
+    **EXPORT_COLLECTIONS,
+)
+
+
+class ImportFormatError(ValueError):
+    """Raised when an import file cannot be read at all."""
+
+
+# Parsing
+
+
+def detect_format(filename, declared=None):
+    """Pick the import format from an explicit choice or the file name."""
+    if declared:
+        if declared not in FORMATS:
+            raise ImportFormatError(f"Unknown format {declared}.")
+        return declared
+    name = (filename or "").lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+
+def read_records(data, file_format):
+    """Yield (line number, record or None, error or None) from file bytes.
+
+    gzip-compressed input is detected from its header and decompressed.
+    """
+    if data[:2] == b"\x1f\x8b":
+        try:
+            data = gzip.decompress(data)
+        except (OSError, EOFError) as e:
+            raise ImportFormatError(f"Invalid gzip data: {e}.")
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ImportFormatError("Files must be UTF-8 encoded.")
+
+    if file_format == "csv":
+        reader = csv.DictReader(io.StringIO(text), restkey=CSV_EXTRA_KEY)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}."
+            continue
+        yield line_number, record, None
+
+
+# Validation, run in worker processes for large files
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _from_csv(value, expected):
+    """Convert a CSV cell to the expected type; raises ValueError."""
+    if value is None or value.strip() == "":
+        return None
+    value = value.strip()
+    if expected is int:
+        return int(value)
+    if expected is bool:
+        if value.lower() in TRUE_STRINGS:
+            return True
+        if value.lower() in FALSE_STRINGS:
+            return False
+        raise ValueError(value)
+    if expected is list:
+        names = value.split(CSV_LIST_SEPARATOR)
+        return [name.strip() for name in names if name.strip()]
+    return value
+
+
+def _too_long(value, length):
+    return length is not None and isinstance(value, str) and len(value) > length
+
+
+def _check_entries(entries, required, types, lengths=None):
+    """Validate inventory or spell slot entries; returns an error or None."""
+    lengths = lengths or {}
+    if not isinstance(entries, list) or not all(
+        isinstance(entry, dict) for entry in entries
+    ):
+        return "Expected a list of objects."
+    for entry in entries:
+        for key, value in entry.items():
+            if key not in types:
+                return f"Unknown key {key}."
+            if value is None:
+                if key in required:
+                    return f"{key} is required."
+                continue
+            expected = types[key]
+            if not (_is_int(value) if expected is int else isinstance(value, expected)):
+                return f"{key} must be {expected.__name__}."
+            if _too_long(value, lengths.get(key)):
+                return f"{key} must be at most {lengths[key]} characters."
+        missing = [key for key in required if key not in entry]
+        if missing:
+            return f"{missing[0]} is required."
+    return None
+
+
+INVENTORY_TYPES = dict(
+    item=str,
+    quantity=int,
+    equipped=bool,
+    equipment_slot=str,
+    condition=str,
+    notes=str,
+    attuned=bool,
+    current_charges=int,
+)
+
+SPELL_SLOT_TYPES = dict(level=int, total_slots=int, used_slots=int)
+
+
+def _column_value(key, value, from_csv):
+    """Check a character column; returns (value or None to skip, error)."""
+    expected = WRITABLE_FIELDS[key]
+    if from_csv:
+        try:
+            value = _from_csv(value, expected)
+        except ValueError:
+            return None, f"Expected {expected.__name__}."
+    if value is None:
+        if key not in NULLABLE_COLUMNS and key not in CHARACTER_DEFAULTS:
+            return None, "May not be null."
+        return None, None
+    if not (_is_int(value) if expected is int else isinstance(value, expected)):
+        return None, f"Expected {expected.__name__}."
+    if _too_long(value, CHARACTER_LENGTHS.get(key)):
+        return None, f"At most {CHARACTER_LENGTHS[key]} characters."
+    return value, None
+
+
+def _reference_value(key, value, from_csv):
+    """Check a species, subspecies or class name."""
+    if from_csv:
+        value = _from_csv(value, str)
+    if value is not None and not isinstance(value, str):
+        return None, "Expected a name."
+    return value, None
+
+
+def _collection_value(key, value, from_csv):
+    """Check a list of proficiency, language, feature or spell names."""
+    if from_csv:
+        value = _from_csv(value, list) or []
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        return None, "Expected a list of names."
+    return value, None
+
+
+def _entries_value(key, value, from_csv):
+    """Check inventory or spell slot entries, which CSV files cannot hold."""
+    if from_csv:
+        return None, "Unknown field."
+    if key == "inventory":
+        error = _check_entries(value, ("item",), INVENTORY_TYPES, INVENTORY_LENGTHS)
+    else:
+        error = _check_entries(value, ("level", "total_slots"), SPELL_SLOT_TYPES)
+    return (None, error) if error else (value, None)
+
+
+def _record_check(key):
+    """Return (checker, "values" or "names") for a record key, or None."""
+    if key in EXPORT_COLUMNS:
+        return _column_value, "values"
+    if key in EXPORT_REFERENCES:
+        return _reference_value, "names"
+    if key in EXPORT_COLLECTIONS:
+        return _collection_value, "names"
+    if key in ("inventory", "spell_slots"):
+        return _entries_value, "names"
+    return None
+
+
+def validate_record(record, from_csv=False):
+    """Check one record without touching the database.
+
+    Returns (values, names, errors): the character column values, the
+    reference names and entries still to be resolved, and per-field
+    errors. Runs in worker processes, so it only uses plain data.
+    """
+    if not isinstance(record, dict):
+        return {}, {}, {"record": "Expected a JSON object."}
+
+    checked = {"values": {}, "names": {}}
+    errors = {}
+    for key, value in record.items():
+        if from_csv and key == CSV_EXTRA_KEY:
+            errors[key] = "More cells than header columns."
+            continue
+        check = _record_check(key)
+        if check is None:
+            errors[key] = "Unknown field."
+            continue
+        checker, target = check
+        value, error = checker(key, value, from_csv)
+        if error:
+            errors[key] = error
+        elif value is not None:
+            checked[target][key] = value
+
+    for key in REQUIRED_FIELDS:
+        if key not in checked["values"] and key not in errors:
+            errors[key] = "Required field."
+
+    return checked["values"], checked["names"], errors
+
+
+def validate_records(records, from_csv=False):
+    """Validate records, in a process pool when there are enough of them."""
+    validate = functools.partial(validate_record, from_csv=from_csv)
+    threshold = current_app.config.get(
+        "IMPORT_PARALLEL_MIN_RECORDS", DEFAULT_IMPORT_PARALLEL_MIN_RECORDS
+    )
+    if len(records) < threshold:
+        return [validate(record) for record in records]
+    workers = current_app.config.get("IMPORT_WORKERS") or os.cpu_count() or 1
+    # A few chunks per worker keeps pickling overhead low but work balanced
+    chunksize = max(1, len(records) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(validate, records, chunksize=chunksize))
+
+
+# Resolution and insertion
+
+
+@reference_cached
+def import_name_maps():
+    """{record key: {lower-cased name: id}} for every named reference."""
+    maps = {}
+    for key, model in NAMED_MODELS.items():
+        names = {}
+        for row_id, name in db.session.query(model.id, model.name).order_by(
+            model.id
+        ):
+            names.setdefault(name.lower(), row_id)
+        maps[key] = names
+    return maps
+
+
+def _lookup(maps, key, name, errors, field=None):
+    row_id = maps[key].get(name.lower())
+    if row_id is None:
+        errors.setdefault(field or key, f"Unknown {key} {name}.")
+    return row_id
+
+
+def resolve_record(user_id, values, names, maps):
+    """Build the character row and its linked rows, or return errors."""
+    errors = {}
+    row = {column: CHARACTER_DEFAULTS.get(column) for column in EXPORT_COLUMNS}
+    row.update(values, user_id=user_id)
+    if "proficiency_bonus" not in values:
+        row["proficiency_bonus"] = proficiency_bonus_for_level(row["level"])
+    for key, (column, _) in EXPORT_REFERENCES.items():
+        name = names.get(key)
+        row[column] = _lookup(maps, key, name, errors) if name else None
+
+    links = {}
+    for key in EXPORT_COLLECTIONS:
+        ids = [_lookup(maps, key, name, errors) for name in names.get(key, [])]
+        links[key] = list(dict.fromkeys(ids))
+    links["inventory"] = [
+        dict(
+            {column: INVENTORY_DEFAULTS.get(column) for column in INVENTORY_COLUMNS},
+            **{
+                key: value
+                for key, value in entry.items()
+                if key != "item" and value is not None
+            },
+            item_id=_lookup(maps, "item", entry["item"], errors, "inventory"),
+        )
+        for entry in names.get("inventory", [])
+    ]
+    links["spell_slots"] = [
+        dict(
+            {column: SPELL_SLOT_DEFAULTS.get(column) for column in SPELL_SLOT_COLUMNS},
+            **{key: value for key, value in slot.items() if value is not None},
+        )
+        for slot in names.get("spell_slots", [])
+    ]
+    return (row, links), errors
+
+
+def insert_characters(entries):
+    """Insert (row, links) entries with executemany core inserts.
+
+    Returns the new character ids in entry order. The caller commits.
+    """
+    table = Character.__table__
+    ids = (
+        db.session.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True),
+            [row for row, _ in entries],
+        )
+        .scalars()
+        .all()
+    )
+
+    for key, (association, column) in ASSOCIATIONS.items():
+        rows = [
+            {"character_id": character_id, column.name: row_id}
+            for character_id, (_, links) in zip(ids, entries)
+            for row_id in links[key]
+        ]
+        if rows:
+            db.session.execute(insert(association), rows)
+
+    for key, model in (("inventory", CharacterItem), ("spell_slots", SpellSlot)):
+        rows = [
+            dict(entry, character_id=character_id)
+            for character_id, (_, links) in zip(ids, entries)
+            for entry in links[key]
+        ]
+        if rows:
+            db.session.execute(insert(model.__table__), rows)
+
+    insert_character_summaries(ids)
+    return ids
+
+
+def _save_chunk(chunk):
+    """Insert and commit (line, entry) pairs; return the pairs that failed.
+
+    A failed chunk is rolled back and retried one record at a time, so a
+    single bad row only loses itself.
+    """
+    try:
+        insert_characters([entry for _, entry in chunk])
+        db.session.commit()
+        return []
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        if len(chunk) == 1:
+            current_app.logger.warning(
+                "Could not import the character on line %s: %s", chunk[0][0], e
+            )
+            return chunk
+    failed = []
+    for pair in chunk:
+        failed.extend(_save_chunk([pair]))
+    return failed
+
+
+def import_characters(user_id, data, file_format="ndjson"):
+    """Import characters from file bytes for a user.
+
+    Returns {"imported": count, "errors": [{"line", "name", "errors"}]}.
+    """
+    chunk_size = current_app.config.get(
+        "IMPORT_CHUNK_SIZE", DEFAULT_IMPORT_CHUNK_SIZE
+    )
+    failures = []
+    parsed = []
+    for line_number, record, error in read_records(data, file_format):
+        if error:
+            failures.append(
+                {"line": line_number, "name": None, "errors": {"record": error}}
+            )
+        else:
+            parsed.append((line_number, record))
+
+    results = validate_records(
+        [record for _, record in parsed], from_csv=file_format == "csv"
+    )
+    maps = import_name_maps()
+    entries = []
+    for (line_number, record), (values, names, errors) in zip(parsed, results):
+        if not errors:
+            entry, errors = resolve_record(user_id, values, names, maps)
+        if errors:
+            name = record.get("name") if isinstance(record, dict) else None
+            failures.append({"line": line_number, "name": name, "errors": errors})
+        else:
+            entries.append((line_number, entry))
+
+    imported = 0
+    for start in range(0, len(entries), chunk_size):
+        end = start + chunk_size
+        chunk = entries[start:end]
+        failed = _save_chunk(chunk)
+        imported += len(chunk) - len(failed)
+        failures.extend(
+            {
+                "line": line_number,
+                "name": entry[0]["name"],
+                "errors": {"record": "Could not be saved."},
+            }
+            for line_number, entry in failed
+        )
+
+    failures.sort(key=lambda failure: failure["line"])
+    return {"imported": imported, "errors": failures}
+
+
+@bp.route("/import", methods=["POST"])
+@login_required
+def import_view():
+    """Import characters from an uploaded NDJSON or CSV file.
+
+    Send the file as multipart "file", or as the raw request body. The
+    format follows ?format=, then the file name, defaulting to NDJSON.
+    """
+    upload = request.files.get("file")
+    data = upload.read() if upload else request.get_data()
+    try:
+        file_format = detect_format(
+            upload.filename if upload else None, request.args.get("format")
+        )
+        result = import_characters(current_user.id, data, file_format)
+    except ImportFormatError as e:
+        return jsonify({"errors": {"file": str(e)}}), 400
+    return jsonify(result)
+
+
+@bp.cli.command("import-characters")
+@click.argument("email")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format", "file_format", type=click.Choice(FORMATS), help="File format."
+)
+def import_command(email, path, file_format):
+    """Import characters for EMAIL from an NDJSON or CSV file at PATH."""
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise click.ClickException(f"No user with email {email}.")
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        result = import_characters(user.id, data, detect_format(path, file_format))
+    except ImportFormatError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"Imported {result['imported']} characters.")
+    for failure in result["errors"]:
+        messages = "; ".join(
+            f"{key}: {message}" for key, message in failure["errors"].items()
+        )
+        click.echo(f"Line {failure['line']}: {messages}", err=True)
+    if result["errors"]:
+        raise click.exceptions.Exit(1)
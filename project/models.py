@@ -1,3 +1,7 @@
+import functools
+import uuid
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Mapper, Session, validates
 from project import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -41,6 +45,64 @@ character_spells = db.Table(
 )
 
 
+# Bit flags for Item.weapon_flags, parsed from the free-text weapon_properties
+WEAPON_PROPERTY_FLAGS = {
+    "simple": 1 << 0,
+    "martial": 1 << 1,
+    "finesse": 1 << 2,
+    "light": 1 << 3,
+    "heavy": 1 << 4,
+    "two-handed": 1 << 5,
+    "versatile": 1 << 6,
+    "thrown": 1 << 7,
+    "reach": 1 << 8,
+    "ammunition": 1 << 9,
+    "loading": 1 << 10,
+    "special": 1 << 11,
+    "monk": 1 << 12,
+}
+
+
+def parse_weapon_properties(text):
+    """Convert e.g. "finesse, light, thrown (range 20/60)" into property flag bits."""
+    flags = 0
+    for token in (text or "").split(","):
+        # Drop any parenthesised detail, e.g. "versatile (1d10)"
+        name = token.split("(")[0].strip().lower().replace(" ", "-")
+        flags |= WEAPON_PROPERTY_FLAGS.get(name, 0)
+    return flags
+
+
+# Character attributes each derived property is computed from
+DERIVED_DEPENDENCIES = {}
+
+
+def derived_property(*dependencies):
+    """Property memoized on the instance until one of its dependencies changes.
+
+    Listeners registered at the bottom of this module drop the value when a
+    listed column or relationship is set, appended to or removed from, and
+    drop every value when the instance is expired or refreshed (e.g. on
+    commit). The memoized list or dict is copied on the way out, so callers
+    cannot change it.
+    """
+
+    def decorator(method):
+        name = method.__name__
+        DERIVED_DEPENDENCIES[name] = dependencies
+
+        @functools.wraps(method)
+        def getter(self):
+            memo = self.__dict__.setdefault("_derived_values", {})
+            if name not in memo:
+                memo[name] = method(self)
+            return memo[name].copy()
+
+        return property(getter)
+
+    return decorator
+
+
 class User(UserMixin, db.Model):
     """User model for authentication and user management."""
 
@@ -163,6 +225,19 @@ class Character(db.Model):
     )
     class_id = db.Column(db.Integer, db.ForeignKey("character_class.id"), nullable=True)
 
+    # Bumped whenever an inventory row is added, changed or removed so that
+    # values derived from equipment can be cached per character version
+    inventory_version = db.Column(db.Integer, default=0, nullable=False)
+    # Bumped when proficiencies, languages, features, spells or spell slots
+    # change, which does not otherwise touch the character row
+    relationship_version = db.Column(db.Integer, default=0, nullable=False)
+    # Bumped on every change to the character, its relationships or its
+    # inventory; unlike updated_at it never repeats within a second
+    sheet_version = db.Column(db.Integer, default=0, nullable=False)
+    # Random per-row identity; SQLite reuses the id of a deleted character,
+    # so caches and ETags keyed on id and versions include this as well
+    uid = db.Column(db.String(32), default=lambda: uuid.uuid4().hex, nullable=False)
+
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     updated_at = db.Column(
         db.DateTime,
@@ -239,7 +314,18 @@ class Character(db.Model):
         else:
             self.proficiency_bonus = 2
 
-    @property
+    @derived_property(
+        "strength",
+        "dexterity",
+        "constitution",
+        "intelligence",
+        "wisdom",
+        "charisma",
+        "species",
+        "species_id",
+        "subspecies",
+        "subspecies_id",
+    )
     def effective_ability_scores(self):
         """Calculate ability scores with species bonuses applied."""
         base_scores = {
@@ -265,7 +351,15 @@ class Character(db.Model):
 
         return base_scores
 
-    @property
+    @derived_property(
+        "species",
+        "species_id",
+        "subspecies",
+        "subspecies_id",
+        "char_class",
+        "class_id",
+        "proficiencies",
+    )
     def all_proficiencies(self):
         """Get all proficiencies from species, class, and individual sources."""
         proficiencies = set()
@@ -286,9 +380,11 @@ class Character(db.Model):
         for prof in self.proficiencies:
             proficiencies.add(prof.name)
 
-        return list(proficiencies)
+        return sorted(proficiencies)
 
-    @property
+    @derived_property(
+        "species", "species_id", "subspecies", "subspecies_id", "languages"
+    )
     def all_languages(self):
         """Get all languages from species, subspecies, and individual sources."""
         languages = set()
@@ -305,11 +401,11 @@ class Character(db.Model):
         for lang in self.languages:
             languages.add(lang.name)
 
-        return list(languages)
+        return sorted(languages)
 
-    @property
+    @derived_property("species", "species_id", "subspecies", "subspecies_id")
     def all_traits(self):
-        """Get all traits from species and subspecies."""
+        """Get all traits from species and subspecies, in that order."""
         traits = []
 
         # Add species traits
@@ -320,7 +416,8 @@ class Character(db.Model):
         if self.subspecies and self.subspecies.additional_traits:
             traits.extend(self.subspecies.additional_traits)
 
-        return traits
+        # A subspecies can repeat a species trait; keep the first
+        return list(dict.fromkeys(traits))
 
     @property
     def effective_speed(self):
@@ -396,6 +493,8 @@ class Item(db.Model):
     weapon_properties = db.Column(db.Text, nullable=True)
     # For versatile weapons like longsword
     versatile_damage = db.Column(db.String(20), nullable=True)
+    # weapon_properties parsed once into WEAPON_PROPERTY_FLAGS bits
+    weapon_flags = db.Column(db.Integer, default=0, nullable=False)
 
     # Armor-specific properties
     armor_class = db.Column(db.Integer, nullable=True)  # Base AC for armor
@@ -420,10 +519,34 @@ class Item(db.Model):
         db.Boolean, default=False, nullable=False
     )  # Gets used up when used
 
+    @validates("weapon_properties")
+    def _parse_weapon_properties(self, key, value):
+        """Keep weapon_flags in step with the weapon_properties text."""
+        self.weapon_flags = parse_weapon_properties(value)
+        return value
+
+    def has_weapon_property(self, name):
+        """Check a parsed weapon property such as "finesse" or "two-handed"."""
+        return bool((self.weapon_flags or 0) & WEAPON_PROPERTY_FLAGS[name])
+
     def __repr__(self):
         return f"<Item {self.name}>"
 
 
+class ItemFacetCount(db.Model):
+    """Precomputed number of items per catalog facet value."""
+
+    __tablename__ = "item_facet_count"
+
+    # "item_type", "rarity", "is_magical", "requires_attunement", etc.
+    facet = db.Column(db.String(30), primary_key=True)
+    value = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<ItemFacetCount {self.facet}={self.value}: {self.count}>"
+
+
 class CharacterItem(db.Model):
     """Association model for character inventory with quantity and equipment details."""
 
@@ -459,6 +582,11 @@ class CharacterItem(db.Model):
 class Feature(db.Model):
     """Model for character features from race, class, background, etc."""
 
+    __table_args__ = (
+        db.Index("ix_feature_type_class_key", "feature_type", "class_key"),
+        db.Index("ix_feature_type_species_key", "feature_type", "species_key"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
@@ -478,11 +606,27 @@ class Feature(db.Model):
     source_class = db.Column(db.String(50), nullable=True)
     # Which subclass grants this feature
     source_subclass = db.Column(db.String(50), nullable=True)
+    # Which species grants this racial feature
+    source_species = db.Column(db.String(50), nullable=True)
+
+    # Normalized lookup keys, kept in step with source_class/source_species
+    class_key = db.Column(db.String(50), nullable=True)
+    species_key = db.Column(db.String(50), nullable=True)
 
     # Prerequisites and conditions
     # Any requirements to use this feature
     prerequisites = db.Column(db.Text, nullable=True)
 
+    @validates("source_class", "source_species")
+    def _normalize_source(self, key, value):
+        """Store the lower-cased source name alongside the display name."""
+        normalized = value.strip().lower() if value and value.strip() else None
+        if key == "source_class":
+            self.class_key = normalized
+        else:
+            self.species_key = normalized
+        return value
+
     def __repr__(self):
         return f"<Feature {self.name}>"
 
@@ -533,7 +677,7 @@ class Spell(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
-    level = db.Column(db.Integer, nullable=False)  # 0-9, where 0 is cantrips
+    level = db.Column(db.Integer, nullable=False, index=True)  # 0-9, 0 is cantrips
     # "evocation", "illusion", etc.
     school = db.Column(db.String(30), nullable=False)
 
@@ -553,7 +697,7 @@ class Spell(db.Model):
     higher_level = db.Column(db.Text, nullable=True)
 
     # Spell lists (which classes can learn this spell)
-    # Comma-separated: "wizard,sorcerer,bard"
+    # Comma-separated: "wizard,sorcerer,bard"; normalized into SpellClass rows
     class_lists = db.Column(db.Text, nullable=True)
 
     # Source and references
@@ -563,10 +707,102 @@ class Spell(db.Model):
     is_ritual = db.Column(db.Boolean, default=False, nullable=False)
     requires_concentration = db.Column(db.Boolean, default=False, nullable=False)
 
+    # Normalized class membership, kept in step with class_lists
+    class_entries = db.relationship(
+        "SpellClass", backref="spell", lazy=True, cascade="all, delete-orphan"
+    )
+
+    @validates("class_lists")
+    def _index_class_lists(self, key, value):
+        """Rebuild the spell_class rows whenever class_lists is assigned."""
+        names = sorted(
+            {name.strip().lower() for name in (value or "").split(",") if name.strip()}
+        )
+        current = {entry.class_name: entry for entry in self.class_entries}
+        self.class_entries = [
+            current.get(name) or SpellClass(class_name=name) for name in names
+        ]
+        return value
+
     def __repr__(self):
         return f"<Spell {self.name} (Level {self.level})>"
 
 
+class SpellClass(db.Model):
+    """Normalized spell-to-class membership derived from Spell.class_lists."""
+
+    __tablename__ = "spell_class"
+    __table_args__ = (
+        db.Index("ix_spell_class_class_spell", "class_name", "spell_id"),
+    )
+
+    spell_id = db.Column(db.Integer, db.ForeignKey("spell.id"), primary_key=True)
+    # Lower-cased class name, e.g. "wizard"
+    class_name = db.Column(db.String(50), primary_key=True)
+
+    def __repr__(self):
+        return f"<SpellClass {self.class_name}:{self.spell_id}>"
+
+
+class CharacterSummary(db.Model):
+    """Display columns for character lists, maintained on every write.
+
+    Kept in step with Character, Species and CharacterClass by the mapper
+    events in project.summaries, so list pages and dashboards read one
+    narrow row per character instead of joining the full character row.
+    """
+
+    __tablename__ = "character_summary"
+    __table_args__ = (db.Index("ix_character_summary_user_name", "user_id", "name"),)
+
+    character_id = db.Column(
+        db.Integer, db.ForeignKey("character.id", ondelete="CASCADE"), primary_key=True
+    )
+    user_id = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    player_name = db.Column(db.String(100), nullable=True)
+    level = db.Column(db.Integer, nullable=False)
+    species_id = db.Column(db.Integer, nullable=True, index=True)
+    species_name = db.Column(db.String(50), nullable=True)
+    class_id = db.Column(db.Integer, nullable=True, index=True)
+    class_name = db.Column(db.String(50), nullable=True)
+    current_hp = db.Column(db.Integer, nullable=True)
+    max_hp = db.Column(db.Integer, nullable=True)
+    # Current HP as a whole percentage of max HP, None without max HP
+    hp_percent = db.Column(db.Integer, nullable=True)
+    gold_pieces = db.Column(db.Integer, default=0, nullable=False)
+    strength = db.Column(db.Integer, nullable=False)
+    dexterity = db.Column(db.Integer, nullable=False)
+    constitution = db.Column(db.Integer, nullable=False)
+    intelligence = db.Column(db.Integer, nullable=False)
+    wisdom = db.Column(db.Integer, nullable=False)
+    charisma = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<CharacterSummary {self.name}>"
+
+
+class ReferenceDataVersion(db.Model):
+    """Single-row token identifying the current set of reference data.
+
+    The token changes whenever spells, items, features, proficiencies,
+    languages, species or classes are written, so in-process indexes and
+    HTTP caches built from that data know when to rebuild.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(32), nullable=False)
+    updated_at = db.Column(
+        db.DateTime,
+        default=db.func.current_timestamp(),
+        onupdate=db.func.current_timestamp(),
+    )
+
+    def __repr__(self):
+        return f"<ReferenceDataVersion {self.token}>"
+
+
 class Post(db.Model):
     """Post model for user-generated content."""
 
@@ -734,3 +970,107 @@ class SubSpecies(db.Model):
 
     def __repr__(self):
         return f"<SubSpecies {self.name}>"
+
+
+@event.listens_for(Session, "before_flush")
+def bump_inventory_versions(session, flush_context, instances):
+    """Bump Character.inventory_version for characters whose inventory changed."""
+    changed = [
+        obj
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, CharacterItem)
+        and (obj in session.new or obj in session.deleted or session.is_modified(obj))
+    ]
+    if not changed:
+        return
+
+    characters = set()
+    with session.no_autoflush:
+        for character_item in changed:
+            character = character_item.character
+            if character is None and character_item.character_id is not None:
+                character = session.get(Character, character_item.character_id)
+            if character is not None and character not in session.deleted:
+                characters.add(character)
+
+    for character in characters:
+        character.inventory_version = (character.inventory_version or 0) + 1
+
+
+def _forget_derived(names):
+    def forget(target, *args):
+        memo = target.__dict__.get("_derived_values")
+        if memo:
+            for name in names:
+                memo.pop(name, None)
+
+    return forget
+
+
+@event.listens_for(Mapper, "after_configured", once=True)
+def track_derived_dependencies():
+    """Invalidate memoized Character properties when their inputs change.
+
+    Registered once mappers are configured, since species, subspecies and
+    char_class are backrefs that only exist from then on.
+    """
+    dependents = {}
+    for name, dependencies in DERIVED_DEPENDENCIES.items():
+        for dependency in dependencies:
+            dependents.setdefault(dependency, []).append(name)
+
+    for dependency, names in dependents.items():
+        attribute = getattr(Character, dependency)
+        forget = _forget_derived(tuple(names))
+        if getattr(attribute.property, "uselist", False):
+            for identifier in ("append", "remove", "bulk_replace"):
+                event.listen(attribute, identifier, forget)
+        else:
+            event.listen(attribute, "set", forget)
+
+
+@event.listens_for(Character, "expire")
+@event.listens_for(Character, "refresh")
+def forget_all_derived(target, *args):
+    # Expiry on commit can reach states whose instance was garbage collected
+    if target is not None:
+        target.__dict__.pop("_derived_values", None)
+
+
+# Character collections tracked by Character.relationship_version
+CHARACTER_COLLECTIONS = ("proficiencies", "languages", "features", "spells")
+
+
+@event.listens_for(Session, "before_flush")
+def bump_sheet_versions(session, flush_context, instances):
+    """Bump relationship_version and sheet_version for changed characters.
+
+    Runs after bump_inventory_versions, so inventory changes also count
+    as a change to the sheet.
+    """
+    relationship_changes = set()
+    with session.no_autoflush:
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if not isinstance(obj, SpellSlot):
+                continue
+            character = obj.character
+            if character is None and obj.character_id is not None:
+                character = session.get(Character, obj.character_id)
+            if character is not None and character not in session.deleted:
+                relationship_changes.add(character)
+
+    for obj in session.dirty:
+        if isinstance(obj, Character):
+            state = inspect(obj)
+            if any(
+                state.attrs[name].history.has_changes()
+                for name in CHARACTER_COLLECTIONS
+            ):
+                relationship_changes.add(obj)
+
+    for character in relationship_changes:
+        character.relationship_version = (character.relationship_version or 0) + 1
+
+    for obj in list(session.dirty):
+        if isinstance(obj, Character) and session.is_modified(obj):
+            obj.sheet_version = (obj.sheet_version or 0) + 1
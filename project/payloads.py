@@ -0,0 +1,185 @@
+"""Serialized and precompressed reference payloads.
+
+Reference responses for the common race and class parameter sets are
+serialized once per reference data version and kept with gzip and
+brotli variants (brotli is skipped if the package is missing) in
+memory and under instance/payloads/<version>/, so repeat requests only
+pick the pre-encoded bytes the client accepts. Other query strings are
+never stored, so free-text and filter requests cannot grow the store.
+"""
+
+import gzip
+import os
+import shutil
+from collections import namedtuple
+from pathlib import Path
+from urllib.parse import urlencode
+from flask import current_app
+from project.caching import LRUCache
+from project.catalog import creation_option_index
+from project.reference import reference_cached, reference_version
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Content encodings in order of preference
+ENCODINGS = ("br", "gzip")
+
+# File suffix for each stored variant
+SUFFIXES = {None: ".json", "gzip": ".json.gz", "br": ".json.br"}
+
+Payload = namedtuple("Payload", ["identity", "gzip", "br"])
+
+
+def encode_payload(body):
+    """Compress a serialized body into every supported variant."""
+    return Payload(
+        identity=body,
+        gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        br=brotli.compress(body, quality=11) if brotli is not None else None,
+    )
+
+
+def payload_dir(token=None):
+    """Directory holding the stored payloads for a reference data version."""
+    root = current_app.config.get("REFERENCE_PAYLOAD_DIR") or os.path.join(
+        current_app.instance_path, "payloads"
+    )
+    return Path(root) / (token or reference_version())
+
+
+def _read(directory, name):
+    variants = {}
+    for encoding, suffix in SUFFIXES.items():
+        path = directory / f"{name}{suffix}"
+        variants[encoding] = path.read_bytes() if path.exists() else None
+    if variants[None] is None:
+        return None
+    return Payload(variants[None], variants["gzip"], variants["br"])
+
+
+def _write(directory, name, payload):
+    directory.mkdir(parents=True, exist_ok=True)
+    # The identity file is written last, since _read treats it as the marker
+    for encoding in ENCODINGS + (None,):
+        body = payload.identity if encoding is None else getattr(payload, encoding)
+        if body is not None:
+            # Write then rename so readers never see a partial file
+            path = directory / f"{name}{SUFFIXES[encoding]}"
+            temp = path.with_name(path.name + ".tmp")
+            temp.write_bytes(body)
+            temp.replace(path)
+
+
+@reference_cached
+def payload_cache():
+    """In-memory payloads for the current reference data version."""
+    return LRUCache(maxsize=1024)
+
+
+def load_payload(name):
+    """Return the stored Payload called name, from memory or disk, or None."""
+    cache = payload_cache()
+    payload = cache.get(name)
+    if payload is None:
+        try:
+            payload = _read(payload_dir(), name)
+        except OSError:
+            return None
+        if payload is not None:
+            cache.set(name, payload)
+    return payload
+
+
+def save_payload(name, body):
+    """Compress body and store it in memory and on disk under name."""
+    payload = encode_payload(body)
+    payload_cache().set(name, payload)
+    try:
+        _write(payload_dir(), name, payload)
+    except OSError as e:
+        current_app.logger.warning("Could not store payload %s: %s", name, e)
+    return payload
+
+
+def negotiate_encoding(payload, accept_encodings):
+    """Pick the best stored variant the client accepts, or None for identity."""
+    for encoding in ENCODINGS:
+        if getattr(payload, encoding) is not None and accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def prune_payload_dirs():
+    """Remove stored payloads belonging to older reference data versions."""
+    current = payload_dir()
+    root = current.parent
+    if not root.exists():
+        return
+    for directory in root.iterdir():
+        if directory.is_dir() and directory != current:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def canonical_query(args):
+    """Sort (key, value) query pairs so equivalent URLs share one key."""
+    return tuple(sorted(args))
+
+
+@reference_cached
+def stored_payload_requests():
+    """Return the (path, canonical query) pairs whose payloads are stored.
+
+    These are the reference URLs and common parameter sets worth
+    pregenerating; the result is ordered and supports fast membership.
+    """
+    index = creation_option_index()
+    requests = [("/characters/api/races", ()), ("/characters/api/classes", ())]
+    for character_class in index.class_names:
+        query = canonical_query([("class", character_class)])
+        requests.append(("/characters/api/features", query))
+        requests.append(("/characters/api/spells", query))
+    for race in index.race_names:
+        for character_class in index.class_names:
+            query = canonical_query([("race", race), ("class", character_class)])
+            requests.append(("/characters/api/proficiencies", query))
+            requests.append(("/characters/api/languages", query))
+            requests.append(("/characters/api/creation-options", query))
+    return dict.fromkeys(requests)
+
+
+def is_stored_request(path, args):
+    """Whether a request's payload belongs in the payload store."""
+    return (path, canonical_query(args)) in stored_payload_requests()
+
+
+def reference_payload_urls():
+    """List the reference URLs whose payloads are pregenerated."""
+    return [
+        f"{path}?{urlencode(query)}" if query else path
+        for path, query in stored_payload_requests()
+    ]
+
+
+def warm_reference_payloads(app):
+    """Generate stored payloads for every common reference request.
+
+    Intended for seed time: requests go through the real views with login
+    disabled, so keys and bytes match what the web process would build.
+    Returns the number of payloads generated.
+    """
+    login_disabled = app.config.get("LOGIN_DISABLED", False)
+    app.config["LOGIN_DISABLED"] = True
+    try:
+        client = app.test_client()
+        with app.app_context():
+            urls = reference_payload_urls()
+        for url in urls:
+            client.get(url)
+        with app.app_context():
+            prune_payload_dirs()
+        return len(urls)
+    finally:
+        app.config["LOGIN_DISABLED"] = login_disabled
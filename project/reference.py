@@ -0,0 +1,237 @@
+"""Reference data versioning and the in-process indexes derived from it.
+
+Spells, items, features, proficiencies, languages, species and classes
+only change when the database is reseeded. Any write to them replaces
+the ReferenceDataVersion token, and functions decorated with
+reference_cached are rebuilt the first time they are called after the
+token changes.
+"""
+
+import functools
+import time
+import uuid
+from bisect import bisect_left
+from collections import namedtuple
+from itertools import chain
+from threading import RLock
+from flask import current_app, has_app_context
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+from project import db
+from project.models import (
+    CharacterClass,
+    Feature,
+    Item,
+    Language,
+    Proficiency,
+    ReferenceDataVersion,
+    Species,
+    Spell,
+    SubSpecies,
+)
+
+# Models whose rows make up the reference data set
+REFERENCE_MODELS = (
+    CharacterClass,
+    Feature,
+    Item,
+    Language,
+    Proficiency,
+    Species,
+    Spell,
+    SubSpecies,
+)
+
+# Token used for databases seeded before versioning existed
+INITIAL_TOKEN = "initial"
+
+# Seconds between checks of the stored token for writes by other processes
+DEFAULT_VERSION_TTL = 30
+
+# Reentrant, since one reference_cached builder may call another
+_lock = RLock()
+
+
+def _state():
+    """Return this app's version and derived-cache state."""
+    return current_app.extensions.setdefault(
+        "reference_data", {"token": None, "checked_at": 0.0, "cache": {}}
+    )
+
+
+def reference_version():
+    """Return the current reference data token.
+
+    The stored token is re-read at most every REFERENCE_VERSION_TTL
+    seconds; writes made by this process are picked up on commit.
+    """
+    state = _state()
+    ttl = current_app.config.get("REFERENCE_VERSION_TTL", DEFAULT_VERSION_TTL)
+    now = time.monotonic()
+    if state["token"] is None or now - state["checked_at"] > ttl:
+        token = db.session.query(ReferenceDataVersion.token).filter_by(id=1).scalar()
+        state["token"] = token or INITIAL_TOKEN
+        state["checked_at"] = now
+    return state["token"]
+
+
+def reference_cached(func):
+    """Memoize a zero-argument builder until the reference data changes."""
+
+    key = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper():
+        token = reference_version()
+        cache = _state()["cache"]
+        entry = cache.get(key)
+        if entry is None or entry[0] != token:
+            with _lock:
+                entry = cache.get(key)
+                if entry is None or entry[0] != token:
+                    entry = (token, func())
+                    cache[key] = entry
+        return entry[1]
+
+    return wrapper
+
+
+@event.listens_for(Session, "before_flush")
+def detect_reference_changes(session, flush_context, instances):
+    """Flag flushes that add, change or remove reference data rows."""
+    for obj in chain(session.new, session.deleted, session.dirty):
+        if not isinstance(obj, REFERENCE_MODELS):
+            continue
+        # Appending to e.g. Character.proficiencies touches the backref
+        # collection on Proficiency, which does not change reference data
+        if obj in session.dirty and not session.is_modified(
+            obj, include_collections=False
+        ):
+            continue
+        session.info["reference_changed"] = True
+        return
+
+
+@event.listens_for(Session, "after_flush")
+def bump_reference_version(session, flush_context):
+    """Replace the stored token in the same transaction as the change."""
+    if not session.info.pop("reference_changed", False):
+        return
+    token = uuid.uuid4().hex
+    table = ReferenceDataVersion.__table__
+    connection = session.connection()
+    result = connection.execute(
+        update(table)
+        .where(table.c.id == 1)
+        .values(token=token, updated_at=db.func.current_timestamp())
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(id=1, token=token))
+    session.info["reference_token"] = token
+
+
+@event.listens_for(Session, "after_commit")
+def publish_reference_version(session):
+    """Make a committed token visible to this process immediately."""
+    token = session.info.pop("reference_token", None)
+    if token and has_app_context():
+        state = _state()
+        state["token"] = token
+        state["checked_at"] = time.monotonic()
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_reference_version(session):
+    session.info.pop("reference_token", None)
+    session.info.pop("reference_changed", None)
+
+
+# Typeahead prefix index
+
+TYPEAHEAD_MODELS = {
+    "spell": Spell,
+    "item": Item,
+    "feature": Feature,
+    "proficiency": Proficiency,
+    "language": Language,
+}
+
+TypeaheadEntry = namedtuple("TypeaheadEntry", ["kind", "id", "name"])
+
+
+class PrefixIndex:
+    """Sorted word-prefix index over names, searched with bisect.
+
+    Every word in a name is indexed, so "miss" finds "Magic Missile".
+    Whole names and later words are kept in separate sorted arrays, so
+    matches at the start of a name come first and a lookup stops as soon
+    as it has limit matches.
+    """
+
+    def __init__(self, entries):
+        names = []
+        words = []
+        for entry in entries:
+            lowered = entry.name.lower().split()
+            names.append((" ".join(lowered), entry))
+            for position in range(1, len(lowered)):
+                words.append((" ".join(lowered[position:]), entry))
+        names.sort(key=lambda item: (item[0], item[1].name))
+        words.sort(key=lambda item: (item[0], item[1].name))
+        self._name_keys = [key for key, _ in names]
+        self._names = [entry for _, entry in names]
+        self._word_keys = [key for key, _ in words]
+        self._words = [entry for _, entry in words]
+
+    @staticmethod
+    def _scan(keys, entries, prefix, limit, matches):
+        index = bisect_left(keys, prefix)
+        while (
+            len(matches) < limit
+            and index < len(keys)
+            and keys[index].startswith(prefix)
+        ):
+            entry = entries[index]
+            matches.setdefault((entry.kind, entry.id), entry)
+            index += 1
+
+    def lookup(self, prefix, limit=10):
+        """Return up to limit entries with a word starting with prefix."""
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return []
+        matches = {}
+        self._scan(self._name_keys, self._names, prefix, limit, matches)
+        starts = len(matches)
+        self._scan(self._word_keys, self._words, prefix, limit, matches)
+        found = list(matches.values())
+        return found[:starts] + sorted(found[starts:], key=lambda entry: entry.name)
+
+    def __len__(self):
+        return len(self._name_keys) + len(self._word_keys)
+
+
+@reference_cached
+def typeahead_indexes():
+    """Build one PrefixIndex per reference kind from the current data."""
+    indexes = {}
+    for kind, model in TYPEAHEAD_MODELS.items():
+        rows = db.session.query(model.id, model.name).all()
+        indexes[kind] = PrefixIndex(
+            TypeaheadEntry(kind, row.id, row.name) for row in rows
+        )
+    return indexes
+
+
+def typeahead(prefix, kinds=None, limit=10):
+    """Return name matches for prefix across the requested kinds."""
+    indexes = typeahead_indexes()
+    kinds = [kind for kind in (kinds or TYPEAHEAD_MODELS) if kind in indexes]
+    matches = []
+    for kind in kinds:
+        matches.extend(indexes[kind].lookup(prefix, limit))
+    prefix = prefix.strip().lower()
+    matches.sort(
+        key=lambda entry: (not entry.name.lower().startswith(prefix), entry.name)
+    )
+    return matches[:limit]
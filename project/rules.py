@@ -0,0 +1,807 @@
+"""D&D 5e rules engines for values derived from a character's data."""
+
+from collections import namedtuple
+from flask import current_app
+from project import db
+from project.caching import LRUCache
+from project.models import (
+    Character,
+    CharacterItem,
+    Item,
+    Proficiency,
+    Species,
+    SubSpecies,
+    WEAPON_PROPERTY_FLAGS,
+)
+from project.reference import reference_cached, reference_version
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+# Unarmored characters use 10 + Dexterity modifier
+UNARMORED_BASE_AC = 10
+
+# Equipment slots that mark an equipped armor item as a shield
+SHIELD_SLOTS = ("shield", "off_hand")
+
+ArmorClass = namedtuple(
+    "ArmorClass",
+    [
+        "total",
+        "base",
+        "dex_bonus",
+        "shield_bonus",
+        "armor",
+        "shield",
+        "stealth_disadvantage",
+        "meets_strength_requirement",
+    ],
+)
+
+AttackProfile = namedtuple(
+    "AttackProfile",
+    [
+        "item_id",
+        "name",
+        "ability",
+        "proficient",
+        "to_hit",
+        "damage",
+        "versatile_damage",
+        "damage_type",
+        "weapon_range",
+        "properties",
+    ],
+)
+
+# SRD skill-to-ability map, used where the Skills dataset has not been seeded
+SRD_SKILL_ABILITIES = {
+    "Acrobatics": "dex",
+    "Animal Handling": "wis",
+    "Arcana": "int",
+    "Athletics": "str",
+    "Deception": "cha",
+    "History": "int",
+    "Insight": "wis",
+    "Intimidation": "cha",
+    "Investigation": "int",
+    "Medicine": "wis",
+    "Nature": "int",
+    "Perception": "wis",
+    "Performance": "cha",
+    "Persuasion": "cha",
+    "Religion": "int",
+    "Sleight of Hand": "dex",
+    "Stealth": "dex",
+    "Survival": "wis",
+}
+
+# Passive scores shown on the sheet (10 + skill modifier)
+PASSIVE_SKILLS = ("Perception", "Investigation", "Insight")
+
+ABILITY_KEYS = {
+    "strength": "str",
+    "dexterity": "dex",
+    "constitution": "con",
+    "intelligence": "int",
+    "wisdom": "wis",
+    "charisma": "cha",
+}
+
+SkillTable = namedtuple(
+    "SkillTable",
+    [
+        "modifiers",
+        "proficient",
+        "passive_perception",
+        "passive_investigation",
+        "passive_insight",
+    ],
+)
+
+# Armor class and attack profile results kept per app
+DEFAULT_RULES_CACHE_SIZE = 2048
+
+
+def ability_modifier(score):
+    """Calculate ability modifier from ability score."""
+    return (score - 10) // 2
+
+
+def _rules_cache(name):
+    """Return this app's LRU cache for one rules engine."""
+    cache = current_app.extensions.get(name)
+    if cache is None:
+        size = current_app.config.get("RULES_CACHE_SIZE", DEFAULT_RULES_CACHE_SIZE)
+        cache = current_app.extensions.setdefault(name, LRUCache(maxsize=size))
+    return cache
+
+
+def _is_shield(item_type, equipment_slot):
+    """Return True if an equipped armor row describes a shield."""
+    return (item_type or "").lower() == "shield" or (
+        equipment_slot or ""
+    ).lower() in SHIELD_SLOTS
+
+
+def _equipped_armor_rows(character_id):
+    """Load every equipped item that contributes to AC in a single query."""
+    return (
+        db.session.query(
+            Item.name,
+            Item.item_type,
+            Item.armor_class,
+            Item.max_dex_bonus,
+            Item.min_strength,
+            Item.stealth_disadvantage,
+            CharacterItem.equipment_slot,
+        )
+        .join(CharacterItem, CharacterItem.item_id == Item.id)
+        .filter(
+            CharacterItem.character_id == character_id,
+            CharacterItem.equipped.is_(True),
+            Item.armor_class.isnot(None),
+        )
+        .all()
+    )
+
+
+def resolve_armor_class(rows, dexterity, strength):
+    """Resolve AC from equipped armor rows and the character's scores.
+
+    The best body armor and the best shield are used; a body armor's
+    max_dex_bonus caps the Dexterity contribution (None means uncapped)
+    and heavy armor, capped at 0, ignores Dexterity entirely.
+    """
+    armor = None
+    shield = None
+    for row in rows:
+        if _is_shield(row.item_type, row.equipment_slot):
+            if shield is None or row.armor_class > shield.armor_class:
+                shield = row
+        elif armor is None or row.armor_class > armor.armor_class:
+            armor = row
+
+    dex_bonus = ability_modifier(dexterity)
+    if armor is None:
+        base = UNARMORED_BASE_AC
+    else:
+        base = armor.armor_class
+        if armor.max_dex_bonus == 0:
+            dex_bonus = 0
+        elif armor.max_dex_bonus is not None:
+            dex_bonus = min(dex_bonus, armor.max_dex_bonus)
+
+    shield_bonus = shield.armor_class if shield is not None else 0
+    meets_strength = armor is None or not armor.min_strength or (
+        strength >= armor.min_strength
+    )
+
+    return ArmorClass(
+        total=base + dex_bonus + shield_bonus,
+        base=base,
+        dex_bonus=dex_bonus,
+        shield_bonus=shield_bonus,
+        armor=armor.name if armor is not None else None,
+        shield=shield.name if shield is not None else None,
+        stealth_disadvantage=bool(armor is not None and armor.stealth_disadvantage),
+        meets_strength_requirement=meets_strength,
+    )
+
+
+def compute_armor_class(character):
+    """Return the character's ArmorClass derived from equipped items.
+
+    Results are cached per (character id and uid, inventory version,
+    Dexterity, Strength, reference version), so the inventory is only
+    rescanned after equipment, the relevant ability scores or item data
+    change.
+    """
+    scores = character.effective_ability_scores
+    dexterity, strength = scores["dex"], scores["str"]
+
+    if character.id is None:
+        return resolve_armor_class([], dexterity, strength)
+
+    key = (
+        character.id,
+        character.uid,
+        character.inventory_version or 0,
+        dexterity,
+        strength,
+        reference_version(),
+    )
+    return _rules_cache("armor_classes").get_or_compute(
+        key,
+        lambda: resolve_armor_class(
+            _equipped_armor_rows(character.id), dexterity, strength
+        ),
+    )
+
+
+def _format_damage(dice, modifier):
+    """Format a damage expression such as "1d8+3"."""
+    if not dice:
+        return None
+    if modifier == 0:
+        return dice
+    return f"{dice}{modifier:+d}"
+
+
+def _flag_names(flags):
+    """Return the property names set in a weapon_flags value."""
+    return tuple(name for name, bit in WEAPON_PROPERTY_FLAGS.items() if flags & bit)
+
+
+def _equipped_weapon_rows(character_id):
+    """Load every equipped weapon in a single query."""
+    return (
+        db.session.query(
+            Item.id,
+            Item.name,
+            Item.damage_dice,
+            Item.damage_type,
+            Item.weapon_range,
+            Item.weapon_flags,
+            Item.versatile_damage,
+        )
+        .join(CharacterItem, CharacterItem.item_id == Item.id)
+        .filter(
+            CharacterItem.character_id == character_id,
+            CharacterItem.equipped.is_(True),
+            Item.damage_dice.isnot(None),
+        )
+        .order_by(Item.name)
+        .all()
+    )
+
+
+def _is_proficient(name, flags, proficiencies):
+    """Check weapon proficiency by category ("Simple Weapons") or by name."""
+    name = name.lower()
+    if name in proficiencies or f"{name}s" in proficiencies:
+        return True
+    if flags & WEAPON_PROPERTY_FLAGS["simple"] and (
+        "simple weapons" in proficiencies or "simple" in proficiencies
+    ):
+        return True
+    if flags & WEAPON_PROPERTY_FLAGS["martial"] and (
+        "martial weapons" in proficiencies or "martial" in proficiencies
+    ):
+        return True
+    return False
+
+
+def resolve_attack_profiles(rows, scores, proficiency_bonus, proficiencies):
+    """Build AttackProfiles from equipped weapon rows.
+
+    Ranged and ammunition weapons use Dexterity, finesse weapons use the
+    better of Strength and Dexterity and everything else uses Strength.
+    """
+    str_mod = ability_modifier(scores["str"])
+    dex_mod = ability_modifier(scores["dex"])
+
+    profiles = []
+    for row in rows:
+        flags = row.weapon_flags or 0
+        ranged = (row.weapon_range or "").lower().startswith("ranged") or bool(
+            flags & WEAPON_PROPERTY_FLAGS["ammunition"]
+        )
+        if ranged:
+            ability, modifier = "dex", dex_mod
+        elif flags & WEAPON_PROPERTY_FLAGS["finesse"] and dex_mod > str_mod:
+            ability, modifier = "dex", dex_mod
+        else:
+            ability, modifier = "str", str_mod
+
+        proficient = _is_proficient(row.name, flags, proficiencies)
+        versatile = None
+        if flags & WEAPON_PROPERTY_FLAGS["versatile"]:
+            versatile = _format_damage(row.versatile_damage, modifier)
+
+        profiles.append(
+            AttackProfile(
+                item_id=row.id,
+                name=row.name,
+                ability=ability,
+                proficient=proficient,
+                to_hit=modifier + (proficiency_bonus if proficient else 0),
+                damage=_format_damage(row.damage_dice, modifier),
+                versatile_damage=versatile,
+                damage_type=row.damage_type,
+                weapon_range=row.weapon_range,
+                properties=_flag_names(flags),
+            )
+        )
+    return profiles
+
+
+def weapon_proficiency_names(character):
+    """Return the lower-cased proficiency names relevant to weapon attacks."""
+    names = {name.lower() for name in character.all_proficiencies}
+    char_class = character.char_class
+    if char_class and char_class.weapon_proficiencies:
+        names.update(name.lower() for name in char_class.weapon_proficiencies)
+    return frozenset(names)
+
+
+def compute_attack_profiles(character):
+    """Return to-hit and damage AttackProfiles for every equipped weapon.
+
+    Results are cached per (character id and uid, inventory version,
+    Strength, Dexterity, proficiency bonus, proficiencies, reference
+    version), so
+    sheet and combat views never reparse weapon strings or rescan the
+    inventory.
+    """
+    if character.id is None:
+        return ()
+
+    scores = character.effective_ability_scores
+    proficiency_bonus = character.proficiency_bonus or 2
+    proficiencies = weapon_proficiency_names(character)
+
+    key = (
+        character.id,
+        character.uid,
+        character.inventory_version or 0,
+        scores["str"],
+        scores["dex"],
+        proficiency_bonus,
+        proficiencies,
+        reference_version(),
+    )
+    return _rules_cache("attack_profiles").get_or_compute(
+        key,
+        lambda: tuple(
+            resolve_attack_profiles(
+                _equipped_weapon_rows(character.id),
+                scores,
+                proficiency_bonus,
+                proficiencies,
+            )
+        ),
+    )
+
+
+def normalize_ability(ability):
+    """Map "Wisdom", "wisdom", "WIS" or "wis" to the "wis" score key."""
+    ability = (ability or "").strip().lower()
+    return ABILITY_KEYS.get(ability, ability[:3])
+
+
+def _skill_name(name):
+    """Strip the SRD "Skill: " prefix from a proficiency name."""
+    prefix = "Skill: "
+    return name[len(prefix):] if name.startswith(prefix) else name
+
+
+@reference_cached
+def skill_abilities():
+    """Return the skill-to-ability map, rebuilt when reference data changes.
+
+    Seeded skill proficiencies override the SRD defaults.
+    """
+    abilities = dict(SRD_SKILL_ABILITIES)
+    rows = (
+        db.session.query(Proficiency.name, Proficiency.associated_ability)
+        .filter(
+            Proficiency.proficiency_type == "skill",
+            Proficiency.associated_ability.isnot(None),
+        )
+        .all()
+    )
+    for name, ability in rows:
+        abilities[_skill_name(name)] = normalize_ability(ability)
+    return abilities
+
+
+def proficient_skills(character, abilities):
+    """Return the skills a character is proficient in.
+
+    Chosen proficiencies and species/subspecies grants count; the class
+    skill list only describes the options offered at creation.
+    """
+    names = [prof.name for prof in character.proficiencies]
+    if character.species and character.species.proficiencies:
+        names.extend(character.species.proficiencies)
+    if character.subspecies and character.subspecies.additional_proficiencies:
+        names.extend(character.subspecies.additional_proficiencies)
+    return frozenset(
+        skill for skill in map(_skill_name, names) if skill in abilities
+    )
+
+
+def resolve_skill_table(scores, proficiency_bonus, proficient, abilities):
+    """Build a SkillTable from effective scores and proficient skills."""
+    ability_mods = {key: ability_modifier(score) for key, score in scores.items()}
+    modifiers = {
+        skill: ability_mods.get(ability, 0)
+        + (proficiency_bonus if skill in proficient else 0)
+        for skill, ability in sorted(abilities.items())
+    }
+    passives = [10 + modifiers.get(skill, 0) for skill in PASSIVE_SKILLS]
+    return SkillTable(modifiers, proficient, *passives)
+
+
+def compute_skill_table(character):
+    """Return every skill modifier and passive score for one character."""
+    return compute_skill_tables([character])[character.id]
+
+
+def compute_skill_tables(characters):
+    """Return {character id: SkillTable} for a list of characters in one pass.
+
+    The skill map is resolved once for the whole batch, so party and DM
+    views do not issue per-skill or per-character lookups.
+    """
+    abilities = skill_abilities()
+    tables = {}
+    for character in characters:
+        tables[character.id] = resolve_skill_table(
+            character.effective_ability_scores,
+            character.proficiency_bonus or 2,
+            proficient_skills(character, abilities),
+            abilities,
+        )
+    return tables
+
+
+# Character sheet presenter
+
+# (attribute, key, label) for the six abilities in sheet order
+ABILITIES = (
+    ("strength", "str", "STR"),
+    ("dexterity", "dex", "DEX"),
+    ("constitution", "con", "CON"),
+    ("intelligence", "int", "INT"),
+    ("wisdom", "wis", "WIS"),
+    ("charisma", "cha", "CHA"),
+)
+
+AbilityScore = namedtuple(
+    "AbilityScore",
+    [
+        "name",
+        "key",
+        "label",
+        "score",
+        "effective_score",
+        "modifier",
+        "save_bonus",
+        "save_proficient",
+    ],
+)
+
+# Rendered sheets kept per app
+DEFAULT_SHEET_CACHE_SIZE = 2048
+
+
+class CharacterSheet:
+    """Every derived value shown on a character sheet, computed once.
+
+    Templates and APIs read from this instead of calling back into the
+    ORM instance, so each modifier and save is worked out a single time.
+    """
+
+    __slots__ = (
+        "character_id",
+        "name",
+        "level",
+        "species",
+        "subspecies",
+        "character_class",
+        "proficiency_bonus",
+        "abilities",
+        "modifiers",
+        "saves",
+        "effective_scores",
+        "initiative",
+        "speed",
+        "size",
+        "armor",
+        "attacks",
+        "skills",
+    )
+
+    def __init__(self, character):
+        self.character_id = character.id
+        self.name = character.name
+        self.level = character.level
+        self.species = character.species.name if character.species else None
+        self.subspecies = character.subspecies.name if character.subspecies else None
+        self.character_class = (
+            character.char_class.name if character.char_class else None
+        )
+        self.proficiency_bonus = character.proficiency_bonus or 2
+
+        self.effective_scores = character.effective_ability_scores
+        self.modifiers = {}
+        self.saves = {}
+        abilities = []
+        for name, key, label in ABILITIES:
+            score = getattr(character, name) or 10
+            effective_score = self.effective_scores[key] or 10
+            modifier = ability_modifier(effective_score)
+            save_proficient = bool(getattr(character, f"{key}_save_proficient"))
+            save_bonus = modifier + (self.proficiency_bonus if save_proficient else 0)
+            self.modifiers[key] = modifier
+            self.saves[key] = save_bonus
+            abilities.append(
+                AbilityScore(
+                    name,
+                    key,
+                    label,
+                    score,
+                    effective_score,
+                    modifier,
+                    save_bonus,
+                    save_proficient,
+                )
+            )
+        self.abilities = tuple(abilities)
+
+        self.initiative = (
+            character.initiative
+            if character.initiative is not None
+            else self.modifiers["dex"]
+        )
+        self.speed = (
+            character.effective_speed if character.species else character.speed or 30
+        )
+        self.size = character.effective_size
+        self.armor = compute_armor_class(character)
+        self.attacks = compute_attack_profiles(character)
+        self.skills = compute_skill_table(character)
+
+    def as_dict(self):
+        """Return the sheet as JSON-serializable data for APIs."""
+        return {
+            "id": self.character_id,
+            "name": self.name,
+            "level": self.level,
+            "species": self.species,
+            "subspecies": self.subspecies,
+            "class": self.character_class,
+            "proficiency_bonus": self.proficiency_bonus,
+            "abilities": {
+                ability.key: {
+                    "score": ability.score,
+                    "effective_score": ability.effective_score,
+                    "modifier": ability.modifier,
+                    "save_bonus": ability.save_bonus,
+                    "save_proficient": ability.save_proficient,
+                }
+                for ability in self.abilities
+            },
+            "initiative": self.initiative,
+            "speed": self.speed,
+            "size": self.size,
+            "armor_class": self.armor._asdict(),
+            "attacks": [attack._asdict() for attack in self.attacks],
+            "skills": {
+                "modifiers": self.skills.modifiers,
+                "proficient": sorted(self.skills.proficient),
+                "passive_perception": self.skills.passive_perception,
+                "passive_investigation": self.skills.passive_investigation,
+                "passive_insight": self.skills.passive_insight,
+            },
+        }
+
+
+def _sheet_cache():
+    cache = current_app.extensions.get("character_sheets")
+    if cache is None:
+        size = current_app.config.get("SHEET_CACHE_SIZE", DEFAULT_SHEET_CACHE_SIZE)
+        cache = current_app.extensions.setdefault(
+            "character_sheets", LRUCache(maxsize=size)
+        )
+    return cache
+
+
+def character_sheet(character):
+    """Return the CharacterSheet for a character, cached per sheet version.
+
+    sheet_version changes with any column, relationship or inventory
+    change, and the reference version covers species and item data. uid
+    tells a recreated character apart from a deleted one with the same id.
+    """
+    if character.id is None:
+        return CharacterSheet(character)
+    key = (
+        character.id,
+        character.uid,
+        character.sheet_version or 0,
+        reference_version(),
+    )
+    return _sheet_cache().get_or_compute(key, lambda: CharacterSheet(character))
+
+
+# Batch ability statistics
+
+# Proficiency bonus limits, +2 at level 1 rising by one every four levels
+MIN_PROFICIENCY_BONUS = 2
+MAX_PROFICIENCY_BONUS = 6
+
+NO_ABILITY_BONUS = (0,) * len(ABILITIES)
+
+
+def proficiency_bonus_for_level(level):
+    """Proficiency bonus for a character level, as update_proficiency_bonus."""
+    bonus = MIN_PROFICIENCY_BONUS + (level - 1) // 4
+    return max(MIN_PROFICIENCY_BONUS, min(MAX_PROFICIENCY_BONUS, bonus))
+
+
+def _bonus_row(increases):
+    increases = increases or {}
+    return tuple(increases.get(key, 0) for _, key, _ in ABILITIES)
+
+
+@reference_cached
+def ability_bonus_tables():
+    """Return ({species id: bonuses}, {subspecies id: bonuses}) in sheet order."""
+    species = {
+        row.id: _bonus_row(row.ability_score_increases)
+        for row in db.session.query(Species.id, Species.ability_score_increases)
+    }
+    subspecies = {
+        row.id: _bonus_row(row.additional_ability_increases)
+        for row in db.session.query(
+            SubSpecies.id, SubSpecies.additional_ability_increases
+        )
+    }
+    return species, subspecies
+
+
+class CharacterStats:
+    """Ability statistics for a batch of characters, one row per character.
+
+    Every attribute is a numpy array when numpy is installed and a list
+    otherwise. Per-ability values have one column per ability, in the
+    order of ABILITIES.
+    """
+
+    __slots__ = (
+        "ids",
+        "levels",
+        "proficiency_bonus",
+        "scores",
+        "effective_scores",
+        "modifiers",
+        "save_proficient",
+        "saves",
+    )
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values[name])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def records(self):
+        """Return one JSON-serializable dict per character."""
+        keys = [key for _, key, _ in ABILITIES]
+
+        def by_ability(row):
+            return dict(zip(keys, (int(value) for value in row)))
+
+        return [
+            {
+                "id": int(self.ids[i]),
+                "level": int(self.levels[i]),
+                "proficiency_bonus": int(self.proficiency_bonus[i]),
+                "scores": by_ability(self.scores[i]),
+                "effective_scores": by_ability(self.effective_scores[i]),
+                "modifiers": by_ability(self.modifiers[i]),
+                "saves": by_ability(self.saves[i]),
+            }
+            for i in range(len(self))
+        ]
+
+
+def _stat_columns():
+    return (
+        [Character.id, Character.level, Character.species_id, Character.subspecies_id]
+        + [getattr(Character, name) for name, _, _ in ABILITIES]
+        + [getattr(Character, f"{key}_save_proficient") for _, key, _ in ABILITIES]
+    )
+
+
+# Positions of the ability score and save proficiency columns in a stat row
+_SCORE_COLUMNS = slice(4, 4 + len(ABILITIES))
+_SAVE_COLUMNS = slice(4 + len(ABILITIES), None)
+
+
+def load_stat_rows(character_ids=None, user_id=None):
+    """Load the columns the stat engine needs, without building ORM objects."""
+    query = db.session.query(*_stat_columns()).order_by(Character.id)
+    if character_ids is not None:
+        query = query.filter(Character.id.in_(character_ids))
+    if user_id is not None:
+        query = query.filter(Character.user_id == user_id)
+    return query.all()
+
+
+def _vectorized_stats(ids, levels, scores, bonuses, proficient):
+    shape = (len(ids), len(ABILITIES))
+    levels = numpy.array(levels, dtype=numpy.int64)
+    scores = numpy.array(scores, dtype=numpy.int64).reshape(shape)
+    bonuses = numpy.array(bonuses, dtype=numpy.int64).reshape(shape)
+    proficient = numpy.array(proficient, dtype=bool).reshape(shape)
+
+    proficiency_bonus = numpy.clip(
+        MIN_PROFICIENCY_BONUS + (levels - 1) // 4,
+        MIN_PROFICIENCY_BONUS,
+        MAX_PROFICIENCY_BONUS,
+    )
+    effective_scores = scores + bonuses
+    modifiers = (effective_scores - 10) // 2
+    saves = modifiers + proficient * proficiency_bonus[:, numpy.newaxis]
+    return CharacterStats(
+        ids=numpy.array(ids, dtype=numpy.int64),
+        levels=levels,
+        proficiency_bonus=proficiency_bonus,
+        scores=scores,
+        effective_scores=effective_scores,
+        modifiers=modifiers,
+        save_proficient=proficient,
+        saves=saves,
+    )
+
+
+def _python_stats(ids, levels, scores, bonuses, proficient):
+    proficiency_bonus = [proficiency_bonus_for_level(level) for level in levels]
+    effective_scores = [
+        [score + bonus for score, bonus in zip(row, bonus_row)]
+        for row, bonus_row in zip(scores, bonuses)
+    ]
+    modifiers = [[ability_modifier(score) for score in row] for row in effective_scores]
+    saves = [
+        [modifier + (bonus if flag else 0) for modifier, flag in zip(row, flags)]
+        for row, flags, bonus in zip(modifiers, proficient, proficiency_bonus)
+    ]
+    return CharacterStats(
+        ids=ids,
+        levels=levels,
+        proficiency_bonus=proficiency_bonus,
+        scores=scores,
+        effective_scores=effective_scores,
+        modifiers=modifiers,
+        save_proficient=proficient,
+        saves=saves,
+    )
+
+
+def compute_character_stats(rows):
+    """Compute CharacterStats for rows from load_stat_rows.
+
+    Effective scores add species and subspecies bonuses, and saving throws
+    use the effective modifiers, matching CharacterSheet. The proficiency
+    bonus follows the level rather than the stored column.
+    """
+    species_bonuses, subspecies_bonuses = ability_bonus_tables()
+    ids, levels, scores, bonuses, proficient = [], [], [], [], []
+    for row in rows:
+        ids.append(row[0])
+        levels.append(row[1])
+        scores.append(list(row[_SCORE_COLUMNS]))
+        species = species_bonuses.get(row[2], NO_ABILITY_BONUS)
+        subspecies = subspecies_bonuses.get(row[3], NO_ABILITY_BONUS)
+        bonuses.append([a + b for a, b in zip(species, subspecies)])
+        proficient.append([bool(flag) for flag in row[_SAVE_COLUMNS]])
+
+    if numpy is not None:
+        return _vectorized_stats(ids, levels, scores, bonuses, proficient)
+    return _python_stats(ids, levels, scores, bonuses, proficient)
+
+
+def character_stats(character_ids=None, user_id=None):
+    """Return CharacterStats for many characters from a single query.
+
+    Pass character_ids, a user_id, or neither for every character, e.g.
+    for campaign-wide NPC reports.
+    """
+    return compute_character_stats(load_stat_rows(character_ids, user_id))
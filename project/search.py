@@ -0,0 +1,207 @@
+"""Full-text search over spell, feature and item rules text.
+
+SQLite databases use an FTS5 virtual table; PostgreSQL uses a generated
+tsvector column with a GIN index. Both share the search_index table name
+and are kept in sync by mapper events on the indexed models.
+"""
+
+import re
+from collections import namedtuple
+from sqlalchemy import bindparam, event, inspect, text
+from project import db
+from project.models import Feature, Item, Spell
+
+# Models covered by the index, keyed by the "kind" exposed to clients
+SEARCH_MODELS = {"spell": Spell, "feature": Feature, "item": Item}
+
+# (kind, id) pairs are packed into one integer rowid so that updates and
+# deletes address a single index row directly
+SEARCH_KIND_CODES = {"spell": 1, "feature": 2, "item": 3}
+KIND_SLOTS = 4
+
+# Columns making up each kind's body text, in document order. Changes to
+# these or to the name require the indexed document to be rewritten.
+INDEXED_COLUMNS = {
+    "spell": ("school", "description", "higher_level"),
+    "feature": ("source_class", "description"),
+    "item": ("item_type", "damage_type", "description"),
+}
+
+SearchHit = namedtuple("SearchHit", ["kind", "id", "name", "snippet", "rank"])
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "kind UNINDEXED, ref_id UNINDEXED, name, body, "
+    "tokenize='porter unicode61')",
+)
+
+POSTGRES_DDL = (
+    "CREATE TABLE IF NOT EXISTS search_index ("
+    "rowid BIGINT PRIMARY KEY, kind VARCHAR(20) NOT NULL, "
+    "ref_id INTEGER NOT NULL, name TEXT, body TEXT, "
+    "document tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED)",
+    "CREATE INDEX IF NOT EXISTS ix_search_index_document "
+    "ON search_index USING GIN (document)",
+)
+
+
+def _rowid(kind, ref_id):
+    return ref_id * KIND_SLOTS + SEARCH_KIND_CODES[kind]
+
+
+def _document(kind, obj):
+    """Return the (name, body) text indexed for a model instance."""
+    parts = (getattr(obj, column) for column in INDEXED_COLUMNS[kind])
+    return obj.name, "\n".join(part for part in parts if part)
+
+
+@event.listens_for(db.metadata, "after_create")
+def create_search_index(target, connection, **kw):
+    """Create the search_index table alongside the ORM tables."""
+    ddl = POSTGRES_DDL if connection.dialect.name == "postgresql" else SQLITE_DDL
+    for statement in ddl:
+        connection.execute(text(statement))
+
+
+@event.listens_for(db.metadata, "before_drop")
+def drop_search_index(target, connection, **kw):
+    """Drop the search_index table alongside the ORM tables."""
+    connection.execute(text("DROP TABLE IF EXISTS search_index"))
+
+
+def _delete_document(connection, kind, ref_id):
+    connection.execute(
+        text("DELETE FROM search_index WHERE rowid = :rowid"),
+        {"rowid": _rowid(kind, ref_id)},
+    )
+
+
+def _write_document(connection, kind, obj):
+    name, body = _document(kind, obj)
+    params = {
+        "rowid": _rowid(kind, obj.id),
+        "kind": kind,
+        "ref_id": obj.id,
+        "name": name,
+        "body": body,
+    }
+    if connection.dialect.name == "postgresql":
+        connection.execute(
+            text(
+                "INSERT INTO search_index (rowid, kind, ref_id, name, body) "
+                "VALUES (:rowid, :kind, :ref_id, :name, :body) "
+                "ON CONFLICT (rowid) DO UPDATE "
+                "SET name = excluded.name, body = excluded.body"
+            ),
+            params,
+        )
+    else:
+        # FTS5 has no upsert; replace the row addressed by its rowid
+        _delete_document(connection, kind, obj.id)
+        connection.execute(
+            text(
+                "INSERT INTO search_index (rowid, kind, ref_id, name, body) "
+                "VALUES (:rowid, :kind, :ref_id, :name, :body)"
+            ),
+            params,
+        )
+
+
+def _register_sync(kind, model):
+    """Keep search_index in step with inserts, updates and deletes of model."""
+    columns = ("name",) + INDEXED_COLUMNS[kind]
+
+    @event.listens_for(model, "after_insert")
+    def after_insert(mapper, connection, target):
+        _write_document(connection, kind, target)
+
+    @event.listens_for(model, "after_update")
+    def after_update(mapper, connection, target):
+        state = inspect(target)
+        if any(
+            column in state.attrs and state.attrs[column].history.has_changes()
+            for column in columns
+        ):
+            _write_document(connection, kind, target)
+
+    @event.listens_for(model, "after_delete")
+    def after_delete(mapper, connection, target):
+        _delete_document(connection, kind, target.id)
+
+
+for _kind, _model in SEARCH_MODELS.items():
+    _register_sync(_kind, _model)
+
+
+def rebuild_search_index():
+    """Reindex every spell, feature and item, e.g. after a bulk reseed."""
+    connection = db.session.connection()
+    connection.execute(text("DELETE FROM search_index"))
+    for kind, model in SEARCH_MODELS.items():
+        for obj in model.query.all():
+            _write_document(connection, kind, obj)
+    db.session.commit()
+
+
+def _fts_query(query):
+    """Quote each word for FTS5 MATCH, treating the last word as a prefix."""
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    quoted = [f'"{word}"' for word in words]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search(query, kinds=None, page=1, per_page=20):
+    """Return (hits, total) for a ranked, paginated rules-text search."""
+    kinds = [kind for kind in (kinds or SEARCH_MODELS) if kind in SEARCH_MODELS]
+    if not query.strip() or not kinds:
+        return [], 0
+
+    connection = db.session.connection()
+    params = {
+        "kinds": kinds,
+        "limit": per_page,
+        "offset": (page - 1) * per_page,
+    }
+
+    if connection.dialect.name == "postgresql":
+        params["query"] = query
+        where = (
+            "FROM search_index, plainto_tsquery('english', :query) AS q "
+            "WHERE document @@ q AND kind IN :kinds"
+        )
+        select = (
+            "SELECT kind, ref_id, name, "
+            "ts_headline('english', body, q, "
+            "'StartSel=\"\", StopSel=\"\", MaxWords=20') AS snippet, "
+            "ts_rank(document, q) AS rank "
+            f"{where} ORDER BY rank DESC, name LIMIT :limit OFFSET :offset"
+        )
+    else:
+        params["query"] = _fts_query(query)
+        if params["query"] is None:
+            return [], 0
+        where = "FROM search_index WHERE search_index MATCH :query AND kind IN :kinds"
+        # bm25 is lower-is-better; weight name matches above body matches
+        select = (
+            "SELECT kind, ref_id, name, "
+            "snippet(search_index, 3, '', '', '…', 16) AS snippet, "
+            "bm25(search_index, 0.0, 0.0, 10.0, 1.0) AS rank "
+            f"{where} ORDER BY rank, name LIMIT :limit OFFSET :offset"
+        )
+
+    kinds_param = bindparam("kinds", expanding=True)
+    total = connection.execute(
+        text(f"SELECT count(*) {where}").bindparams(kinds_param),
+        {key: params[key] for key in ("query", "kinds")},
+    ).scalar()
+    rows = connection.execute(text(select).bindparams(kinds_param), params)
+    hits = [
+        SearchHit(row.kind, row.ref_id, row.name, row.snippet, row.rank)
+        for row in rows
+    ]
+    return hits, total
@@ -0,0 +1,193 @@
+"""Materialized character_summary rows for list views and dashboards.
+
+Mapper events write the summary in the same transaction as the change:
+character inserts, updates and deletes, and renames of the species and
+classes whose names the summary copies. Bulk Query.update() calls skip
+mapper events; run rebuild_character_summaries() after those.
+"""
+
+from sqlalchemy import delete, event, func, insert, inspect, select, update
+from project import db
+from project.models import Character, CharacterClass, CharacterSummary, Species
+
+# Character columns copied into the summary unchanged. Armor class is
+# left out: the sheet derives it from equipped items, so a copied column
+# would disagree with it.
+SUMMARY_COLUMNS = (
+    "user_id",
+    "name",
+    "player_name",
+    "level",
+    "species_id",
+    "class_id",
+    "current_hp",
+    "max_hp",
+    "gold_pieces",
+    "strength",
+    "dexterity",
+    "constitution",
+    "intelligence",
+    "wisdom",
+    "charisma",
+)
+
+
+# Characters read and summarized per statement by rebuild_character_summaries
+SUMMARY_BATCH_SIZE = 500
+
+
+def hp_percent(current_hp, max_hp):
+    """Current HP as a whole percentage of max HP, or None without max HP."""
+    if not max_hp:
+        return None
+    return round(100 * (current_hp or 0) / max_hp)
+
+
+def _name(connection, model, row_id):
+    if row_id is None:
+        return None
+    return connection.execute(select(model.name).where(model.id == row_id)).scalar()
+
+
+def summary_names(connection):
+    """Return ({species id: name}, {class id: name}) for building many rows."""
+    return (
+        dict(connection.execute(select(Species.id, Species.name)).all()),
+        dict(
+            connection.execute(select(CharacterClass.id, CharacterClass.name)).all()
+        ),
+    )
+
+
+def summary_values(connection, character, names=None):
+    """Return the character_summary column values for a Character or row.
+
+    names, from summary_names(), saves two lookups per character when
+    many rows are built at once.
+    """
+    values = {column: getattr(character, column) for column in SUMMARY_COLUMNS}
+    if names is None:
+        species_name = _name(connection, Species, character.species_id)
+        class_name = _name(connection, CharacterClass, character.class_id)
+    else:
+        species_name = names[0].get(character.species_id)
+        class_name = names[1].get(character.class_id)
+    values.update(
+        character_id=character.id,
+        species_name=species_name,
+        class_name=class_name,
+        hp_percent=hp_percent(character.current_hp, character.max_hp),
+        gold_pieces=character.gold_pieces or 0,
+    )
+    return values
+
+
+@event.listens_for(Character, "after_insert")
+def insert_character_summary(mapper, connection, target):
+    connection.execute(
+        insert(CharacterSummary.__table__).values(
+            **summary_values(connection, target), updated_at=func.current_timestamp()
+        )
+    )
+
+
+@event.listens_for(Character, "after_update")
+def update_character_summary(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[column].history.has_changes() for column in SUMMARY_COLUMNS):
+        return
+    table = CharacterSummary.__table__
+    values = dict(
+        summary_values(connection, target), updated_at=func.current_timestamp()
+    )
+    result = connection.execute(
+        update(table).where(table.c.character_id == target.id).values(**values)
+    )
+    # Characters created before the summary table existed
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(**values))
+
+
+@event.listens_for(Character, "after_delete")
+def delete_character_summary(mapper, connection, target):
+    table = CharacterSummary.__table__
+    connection.execute(delete(table).where(table.c.character_id == target.id))
+
+
+def _rename_listener(id_column, name_column):
+    def rename(mapper, connection, target):
+        if not inspect(target).attrs.name.history.has_changes():
+            return
+        table = CharacterSummary.__table__
+        connection.execute(
+            update(table)
+            .where(table.c[id_column] == target.id)
+            .values({name_column: target.name})
+        )
+
+    return rename
+
+
+def _unlink_listener(id_column, name_column):
+    def unlink(mapper, connection, target):
+        table = CharacterSummary.__table__
+        connection.execute(
+            update(table)
+            .where(table.c[id_column] == target.id)
+            .values({name_column: None})
+        )
+
+    return unlink
+
+
+for _model, _id_column, _name_column in (
+    (Species, "species_id", "species_name"),
+    (CharacterClass, "class_id", "class_name"),
+):
+    event.listen(_model, "after_update", _rename_listener(_id_column, _name_column))
+    event.listen(_model, "after_delete", _unlink_listener(_id_column, _name_column))
+
+
+def _summary_select():
+    columns = [getattr(Character, column) for column in SUMMARY_COLUMNS]
+    return select(Character.id, *columns)
+
+
+def _insert_summaries(connection, rows, names):
+    """Insert summary rows for (id, *SUMMARY_COLUMNS) rows in one statement."""
+    values = [summary_values(connection, row, names) for row in rows]
+    if values:
+        connection.execute(
+            insert(CharacterSummary.__table__).values(
+                updated_at=func.current_timestamp()
+            ),
+            values,
+        )
+
+
+def rebuild_character_summaries(batch_size=SUMMARY_BATCH_SIZE):
+    """Rebuild every summary row from the character table, a batch at a time."""
+    connection = db.session.connection()
+    connection.execute(delete(CharacterSummary.__table__))
+    names = summary_names(connection)
+    result = connection.execute(
+        _summary_select().execution_options(yield_per=batch_size)
+    )
+    for rows in result.partitions():
+        _insert_summaries(connection, rows, names)
+    db.session.commit()
+
+
+def insert_character_summaries(character_ids):
+    """Add summary rows for characters written without mapper events.
+
+    Bulk imports insert characters with core statements, which skip the
+    listeners above, so their summaries are added here in one statement.
+    """
+    if not character_ids:
+        return
+    connection = db.session.connection()
+    rows = connection.execute(
+        _summary_select().where(Character.id.in_(character_ids))
+    ).all()
+    _insert_summaries(connection, rows, summary_names(connection))
@@ -1,4 +1,5 @@
 import os
+import shutil
 import tempfile
 import pytest
 from project import create_app, db
@@ -28,6 +29,7 @@ def app():
     """Create and configure a new app instance for each test."""
     # Create a temporary file to isolate the database for each test
     db_fd, db_path = tempfile.mkstemp()
+    payload_dir = tempfile.mkdtemp()
 
     # Use SQLite for all tests to ensure CI compatibility
     config = {
@@ -36,6 +38,7 @@ def app():
         "SECRET_KEY": "test-secret-key",
         "WTF_CSRF_ENABLED": False,
         "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        "REFERENCE_PAYLOAD_DIR": payload_dir,
     }
 
     # Add CI-specific configuration
@@ -61,6 +64,7 @@ def app():
     # Close and remove the temporary database
     os.close(db_fd)
     os.unlink(db_path)
+    shutil.rmtree(payload_dir, ignore_errors=True)
 
 
 @pytest.fixture
@@ -0,0 +1,322 @@
+import pytest
+from urllib.parse import urlsplit
+from sqlalchemy import event
+from project import db
+from project.models import Character, Language, User
+
+CHARACTER = {
+    "name": "Aria",
+    "strength": 10,
+    "dexterity": 14,
+    "constitution": 12,
+    "intelligence": 16,
+    "wisdom": 13,
+    "charisma": 8,
+    "max_hp": 8,
+    "current_hp": 8,
+}
+
+
+@pytest.mark.functional
+class TestCharacterApi:
+    """Functional tests for the JSON character API."""
+
+    def test_create_read_delete(self, app, client, auth, test_user):
+        """
+        GIVEN: A logged in user
+        WHEN: A character is created, read and deleted through the API
+        THEN: Each call returns the expected status and JSON body
+        """
+        with app.app_context():
+            db.session.add(Language(name="Elvish"))
+            db.session.commit()
+            elvish_id = Language.query.filter_by(name="Elvish").one().id
+        auth.login()
+
+        response = client.post(
+            "/characters/api/characters",
+            json=dict(CHARACTER, level=5, languages=[elvish_id]),
+        )
+        assert response.status_code == 201
+        created = response.get_json()
+        assert created["proficiency_bonus"] == 3
+        assert created["languages"] == [{"id": elvish_id, "name": "Elvish"}]
+        url = response.headers["Location"]
+        assert url.endswith(f"/characters/api/characters/{created['id']}")
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.get_json()["name"] == "Aria"
+        listing = client.get("/characters/api/characters").get_json()
+        assert [character["id"] for character in listing["characters"]] == [
+            created["id"]
+        ]
+
+        assert client.delete(url).status_code == 204
+        response = client.get(url)
+        assert response.status_code == 404
+        assert response.get_json() == {"error": "Character not found."}
+
+    def test_sheet_reads_from_presenter(self, app, client, auth, test_user):
+        """
+        GIVEN: A character created through the API
+        WHEN: Its sheet sub-resource is requested
+        THEN: Derived modifiers, saves and armor class are returned
+        """
+        auth.login()
+        url = client.post(
+            "/characters/api/characters", json=dict(CHARACTER, dex_save_proficient=True)
+        ).headers["Location"]
+
+        response = client.get(f"{url}/sheet")
+        assert response.status_code == 200
+        sheet = response.get_json()
+        assert sheet["name"] == "Aria"
+        assert sheet["abilities"]["dex"]["modifier"] == 2
+        assert sheet["abilities"]["dex"]["save_bonus"] == 4
+        assert sheet["armor_class"]["total"] == 12
+        assert sheet["skills"]["modifiers"]["Arcana"] == 3
+        assert client.get("/characters/api/characters/9999/sheet").status_code == 404
+
+    def test_sheet_not_shared_with_recreated_id(self, app, client, auth, test_user):
+        """
+        GIVEN: A cached sheet for a character that is then deleted
+        WHEN: Another user creates a character that reuses its id
+        THEN: The new character's sheet is computed, not the cached one
+        """
+        with app.app_context():
+            other = User(email="other@example.com", name="Other")
+            other.set_password("otherpass")
+            db.session.add(other)
+            db.session.commit()
+        auth.login()
+        url = client.post("/characters/api/characters", json=CHARACTER).headers[
+            "Location"
+        ]
+        assert client.get(f"{url}/sheet").get_json()["name"] == "Aria"
+        client.delete(url)
+        auth.logout()
+
+        auth.login(email="other@example.com", password="otherpass")
+        response = client.post(
+            "/characters/api/characters", json=dict(CHARACTER, name="Borin")
+        )
+        assert response.headers["Location"] == url
+        sheet = client.get(f"{url}/sheet").get_json()
+        assert sheet["name"] == "Borin"
+
+    def test_patch_updates_only_given_columns(self, app, client, auth, test_user):
+        """
+        GIVEN: An existing character
+        WHEN: Only current_hp is sent in a PATCH
+        THEN: The UPDATE sets current_hp and stamps, leaving other columns alone
+        """
+        auth.login()
+        url = client.post("/characters/api/characters", json=CHARACTER).headers[
+            "Location"
+        ]
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("UPDATE character "):
+                statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = client.patch(url, json={"current_hp": 3})
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        assert response.get_json()["current_hp"] == 3
+        assert len(statements) == 1
+        assigned = statements[0].split(" SET ")[1].split(" WHERE ")[0]
+        assert "current_hp" in assigned
+        for column in ("name", "strength", "max_hp", "backstory"):
+            assert f"{column}=" not in assigned
+
+        with app.app_context():
+            character = db.session.get(Character, response.get_json()["id"])
+            assert (character.current_hp, character.max_hp) == (3, 8)
+            assert character.sheet_version == 1
+
+    def test_invalid_requests_are_rejected(self, app, client, auth, test_user):
+        """
+        GIVEN: A character owned by another user and malformed request bodies
+        WHEN: They are sent to the API
+        THEN: Per-field errors return 400 and other users' characters 404
+        """
+        with app.app_context():
+            other = User(email="other@example.com", name="Other")
+            other.set_password("otherpass")
+            db.session.add(other)
+            db.session.commit()
+            character = Character(user_id=other.id, **CHARACTER)
+            db.session.add(character)
+            db.session.commit()
+            other_id = character.id
+        auth.login()
+
+        response = client.post(
+            "/characters/api/characters",
+            json={"name": "Aria", "level": "5", "id": 3, "hp": 1, "languages": [99]},
+        )
+        assert response.status_code == 400
+        errors = response.get_json()["errors"]
+        assert errors["level"] == "Expected int."
+        assert errors["id"] == "Read-only field."
+        assert errors["hp"] == "Unknown field."
+        assert errors["languages"] == "Unknown ids: [99]."
+        assert errors["strength"] == "Required field."
+
+        response = client.patch("/characters/api/characters/1", data="not json")
+        assert response.status_code == 404
+        response = client.patch(
+            f"/characters/api/characters/{other_id}", json={"current_hp": 1}
+        )
+        assert response.status_code == 404
+
+        url = client.post("/characters/api/characters", json=CHARACTER).headers[
+            "Location"
+        ]
+        response = client.patch(url, json={"name": None, "strength": True})
+        assert response.status_code == 400
+        assert response.get_json()["errors"] == {
+            "name": "May not be null.",
+            "strength": "Expected int.",
+        }
+
+    def test_fields_limit_keys_and_columns(self, app, client, auth, test_user):
+        """
+        GIVEN: A character with a language
+        WHEN: It is requested with fields and include
+        THEN: Only those keys are returned and only those columns are selected
+        """
+        with app.app_context():
+            db.session.add(Language(name="Elvish"))
+            db.session.commit()
+            elvish_id = Language.query.filter_by(name="Elvish").one().id
+        auth.login()
+        url = client.post(
+            "/characters/api/characters",
+            json=dict(CHARACTER, backstory="A long story.", languages=[elvish_id]),
+        ).headers["Location"]
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = client.get(f"{url}?fields=name,current_hp&include=languages")
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        data = response.get_json()
+        assert data == {
+            "id": data["id"],
+            "name": "Aria",
+            "current_hp": 8,
+            "languages": [{"id": elvish_id, "name": "Elvish"}],
+        }
+        [select] = [s for s in statements if "FROM character " in s]
+        assert "character.current_hp" in select
+        assert "character.backstory" not in select
+        # The user, the character and its languages; no other relationships
+        assert len(statements) == 3
+
+        listing = client.get("/characters/api/characters?fields=name&include=")
+        assert listing.get_json()["characters"] == [{"id": data["id"], "name": "Aria"}]
+
+        response = client.get(f"{url}?include=inventory")
+        assert response.status_code == 400
+        assert response.get_json() == {
+            "errors": {"include": "Unknown include: inventory."}
+        }
+
+
+@pytest.mark.functional
+class TestBatchApi:
+    """Functional tests for the multiplexed batch endpoint."""
+
+    def test_subrequests_share_one_user_load(self, app, client, auth, test_user):
+        """
+        GIVEN: A logged in user
+        WHEN: Character and reference requests are sent as one batch
+        THEN: Results come back in order and the user is not reloaded per request
+        """
+        auth.login()
+        url = client.post("/characters/api/characters", json=CHARACTER).headers[
+            "Location"
+        ]
+        path = urlsplit(url).path
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            response = client.post(
+                "/characters/api/batch",
+                json={
+                    "requests": [
+                        {"path": f"{path}?fields=current_hp&include="},
+                        {"method": "PATCH", "path": path, "body": {"current_hp": 2}},
+                        {"path": f"{path}?fields=current_hp&include="},
+                        {"path": "/characters/api/races"},
+                        {"path": "/auth/logout"},
+                        {"method": "PUT", "path": path},
+                        {"path": "/characters/api/characters/9999"},
+                    ]
+                },
+            )
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert response.status_code == 200
+        results = response.get_json()["responses"]
+        assert [result["status"] for result in results] == [
+            200,
+            200,
+            200,
+            200,
+            400,
+            405,
+            404,
+        ]
+        assert results[0]["body"]["current_hp"] == 8
+        assert results[2]["body"]["current_hp"] == 2
+        assert results[3]["body"] == []
+        assert results[3]["headers"]["ETag"]
+        # Loaded once, then refreshed once after the PATCH commit expired it
+        assert len([s for s in statements if "FROM user " in s]) == 2
+
+    def test_malformed_batches_are_rejected(self, app, client, auth, test_user):
+        """
+        GIVEN: A logged in user
+        WHEN: A batch is not a list, or is longer than BATCH_MAX_REQUESTS
+        THEN: The whole batch is rejected with a 400
+        """
+        auth.login()
+        app.config["BATCH_MAX_REQUESTS"] = 1
+
+        response = client.post("/characters/api/batch", json={"requests": {}})
+        assert response.status_code == 400
+        response = client.post(
+            "/characters/api/batch",
+            json={"requests": [{"path": "/characters/api/races"}] * 2},
+        )
+        assert response.status_code == 400
+        assert response.get_json() == {
+            "errors": {"requests": "At most 1 requests per batch."}
+        }
@@ -0,0 +1,247 @@
+import pytest
+from project import db
+from project.fragments import fragment_cache
+from project.models import (
+    Character,
+    CharacterClass,
+    CharacterItem,
+    Item,
+    Language,
+    SpellSlot,
+    User,
+)
+
+
+@pytest.mark.functional
+class TestCharacterSheetConditionalGet:
+    """Functional tests for ETag revalidation of character sheets."""
+
+    def test_unchanged_sheet_returns_304(
+        self, app, client, auth, character_lifecycle_setup
+    ):
+        """
+        GIVEN: A rendered character sheet with an ETag
+        WHEN: It is requested again with If-None-Match
+        THEN: A 304 is returned without a body
+        """
+        with app.app_context():
+            character_id = character_lifecycle_setup.create_character().id
+        auth.login(email="persistent@example.com")
+
+        url = f"/characters/{character_id}"
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers["Last-Modified"]
+        assert response.headers["Cache-Control"] == "no-cache"
+
+        etag = response.headers["ETag"]
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+
+    def test_changes_invalidate_the_etag(
+        self, app, client, auth, character_lifecycle_setup
+    ):
+        """
+        GIVEN: A character sheet ETag
+        WHEN: HP, inventory, languages or spell slots change
+        THEN: Each change produces a new ETag and a full response
+        """
+        with app.app_context():
+            character_id = character_lifecycle_setup.create_character().id
+            rope = Item(name="Rope", item_type="adventuring gear")
+            db.session.add_all([rope, Language(name="Elvish")])
+            db.session.commit()
+            item_id = rope.id
+        auth.login(email="persistent@example.com")
+
+        url = f"/characters/{character_id}"
+
+        def changes(*updates):
+            etags = [client.get(url).headers["ETag"]]
+            for update in updates:
+                with app.app_context():
+                    update(db.session.get(Character, character_id))
+                    db.session.commit()
+                response = client.get(url, headers={"If-None-Match": etags[-1]})
+                assert response.status_code == 200
+                etags.append(response.headers["ETag"])
+            return etags
+
+        etags = changes(
+            lambda character: setattr(character, "current_hp", 5),
+            lambda character: setattr(character, "current_hp", 4),
+            lambda character: character.inventory.append(
+                CharacterItem(item_id=item_id)
+            ),
+            lambda character: character.languages.append(
+                Language.query.filter_by(name="Elvish").one()
+            ),
+            lambda character: character.spell_slots.append(
+                SpellSlot(level=1, total_slots=2)
+            ),
+        )
+        assert len(set(etags)) == len(etags)
+
+        with app.app_context():
+            character = db.session.get(Character, character_id)
+            assert character.relationship_version == 2
+            assert character.inventory_version == 1
+
+    def test_recreated_id_gets_a_new_etag(
+        self, app, client, auth, character_lifecycle_setup
+    ):
+        """
+        GIVEN: A sheet ETag for a character that is then deleted
+        WHEN: A new character reuses its id and is requested with that ETag
+        THEN: The new character's sheet is returned in full
+        """
+        with app.app_context():
+            character_id = character_lifecycle_setup.create_character().id
+        auth.login(email="persistent@example.com")
+        url = f"/characters/{character_id}"
+        etag = client.get(url).headers["ETag"]
+
+        with app.app_context():
+            db.session.delete(db.session.get(Character, character_id))
+            db.session.commit()
+            borin = character_lifecycle_setup.create_character(name="Borin")
+            assert borin.id == character_id
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert b"Borin" in response.data
+
+    def test_other_users_sheet_is_not_found(
+        self, app, client, auth, character_lifecycle_setup
+    ):
+        """
+        GIVEN: A character owned by another user
+        WHEN: The current user requests it
+        THEN: A 404 is returned before any validators are compared
+        """
+        with app.app_context():
+            other = User(email="other@example.com", name="Other")
+            other.set_password("otherpass")
+            db.session.add(other)
+            db.session.commit()
+            character_id = character_lifecycle_setup.create_character().id
+        auth.login(email="other@example.com", password="otherpass")
+
+        assert client.get(f"/characters/{character_id}").status_code == 404
+
+
+@pytest.mark.functional
+class TestCharacterSheetFragments:
+    """Functional tests for fragment caching of character sheet sections."""
+
+    def test_only_changed_sections_render_again(
+        self, app, client, auth, character_lifecycle_setup
+    ):
+        """
+        GIVEN: A rendered character sheet with cached sections
+        WHEN: HP changes and later a language is added
+        THEN: Only sections whose keys changed are rendered and cached again
+        """
+        with app.app_context():
+            character_id = character_lifecycle_setup.create_character(
+                max_hp=8, current_hp=8
+            ).id
+            db.session.add(Language(name="Elvish"))
+            db.session.commit()
+        auth.login(email="persistent@example.com")
+
+        url = f"/characters/{character_id}"
+        client.get(url)
+        with app.app_context():
+            cached = len(fragment_cache())
+        assert cached == 5
+
+        with app.app_context():
+            db.session.get(Character, character_id).current_hp = 3
+            db.session.commit()
+        response = client.get(url)
+        assert b"3/8" in response.data
+        with app.app_context():
+            assert len(fragment_cache()) == cached
+
+        with app.app_context():
+            character = db.session.get(Character, character_id)
+            character.languages.append(Language.query.filter_by(name="Elvish").one())
+            db.session.commit()
+        response = client.get(url)
+        assert b"Elvish" in response.data
+        # Languages do not change any computed value, so only the
+        # relationships section renders again
+        with app.app_context():
+            assert len(fragment_cache()) == cached + 1
+
+    def test_class_change_renders_attacks_again(
+        self, app, client, auth, character_lifecycle_setup
+    ):
+        """
+        GIVEN: A fighter with an equipped longsword and a cached sheet
+        WHEN: The character's class is changed to wizard
+        THEN: The attacks section shows the new, non-proficient to-hit bonus
+        """
+        with app.app_context():
+            fighter = CharacterClass(
+                name="Fighter",
+                hit_die=10,
+                primary_ability="Strength",
+                weapon_proficiencies=["Martial Weapons"],
+            )
+            wizard = CharacterClass(name="Wizard", hit_die=6, primary_ability="Int")
+            longsword = Item(
+                name="Longsword",
+                item_type="weapon",
+                damage_dice="1d8",
+                weapon_range="melee",
+                weapon_properties="martial",
+            )
+            db.session.add_all([fighter, wizard, longsword])
+            db.session.commit()
+            character_id = character_lifecycle_setup.create_character(
+                strength=16, class_id=fighter.id
+            ).id
+            character = db.session.get(Character, character_id)
+            character.inventory.append(
+                CharacterItem(item_id=longsword.id, equipped=True)
+            )
+            db.session.commit()
+            wizard_id = wizard.id
+        auth.login(email="persistent@example.com")
+
+        url = f"/characters/{character_id}"
+        assert b"<td>+5</td>" in client.get(url).data
+
+        with app.app_context():
+            db.session.get(Character, character_id).class_id = wizard_id
+            db.session.commit()
+        response = client.get(url)
+        assert b"<td>+3</td>" in response.data
+        assert b"<td>+5</td>" not in response.data
+
+
+@pytest.mark.functional
+class TestCharacterList:
+    """Functional tests for the summary-backed character list."""
+
+    def test_list_reads_summary_rows(
+        self, app, client, auth, character_lifecycle_setup
+    ):
+        """
+        GIVEN: Characters owned by the current user
+        WHEN: The character list is requested
+        THEN: Each character appears in name order with its HP
+        """
+        with app.app_context():
+            character_lifecycle_setup.create_character(
+                name="Zed", max_hp=8, current_hp=2
+            )
+            character_lifecycle_setup.create_character(name="Aria")
+        auth.login(email="persistent@example.com")
+
+        response = client.get("/characters/")
+        assert response.status_code == 200
+        assert response.data.index(b"Aria") < response.data.index(b"Zed")
+        assert b"2/8" in response.data
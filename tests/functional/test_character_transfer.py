@@ -0,0 +1,257 @@
+import gzip
+import io
+import json
+import pytest
+from sqlalchemy.exc import IntegrityError
+from project import db, imports
+from project.exports import character_records, ndjson_chunks
+from project.models import (
+    Character,
+    CharacterItem,
+    CharacterSummary,
+    Item,
+    Language,
+    Species,
+    User,
+)
+
+
+def add_party():
+    """Seed three characters for the test user, the first with relationships."""
+    user = User.query.filter_by(email="test@example.com").one()
+    elf = Species(name="Elf")
+    rope = Item(name="Rope", item_type="adventuring gear")
+    languages = [Language(name="Elvish"), Language(name="Common")]
+    db.session.add_all([elf, rope] + languages)
+    db.session.commit()
+    for name in ("Aria", "Borin", "Cade"):
+        db.session.add(
+            Character(
+                name=name,
+                user_id=user.id,
+                strength=10,
+                dexterity=14,
+                constitution=12,
+                intelligence=16,
+                wisdom=13,
+                charisma=8,
+            )
+        )
+    db.session.commit()
+    aria = Character.query.filter_by(name="Aria").one()
+    aria.species_id = elf.id
+    aria.languages = languages
+    aria.inventory.append(CharacterItem(item_id=rope.id, quantity=2))
+    db.session.commit()
+    return user.id
+
+
+@pytest.mark.functional
+class TestCharacterExport:
+    """Functional tests for the streaming NDJSON character export."""
+
+    def test_export_streams_ndjson(self, app, client, auth, test_user):
+        """
+        GIVEN: A user with several characters
+        WHEN: The export is downloaded plain and gzip-compressed
+        THEN: Each character is one JSON line naming its reference data
+        """
+        with app.app_context():
+            add_party()
+        auth.login()
+
+        response = client.get("/characters/export")
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == "application/x-ndjson"
+        body = response.get_data()
+        records = [json.loads(line) for line in body.splitlines()]
+        assert [record["name"] for record in records] == ["Aria", "Borin", "Cade"]
+        assert records[0]["species"] == "Elf"
+        assert records[0]["languages"] == ["Common", "Elvish"]
+        assert records[0]["inventory"][0]["item"] == "Rope"
+        assert records[0]["inventory"][0]["quantity"] == 2
+        assert "species_id" not in records[0]
+
+        response = client.get("/characters/export?gzip=1")
+        assert response.mimetype == "application/gzip"
+        assert "characters.ndjson.gz" in response.headers["Content-Disposition"]
+        assert gzip.decompress(response.get_data()) == body
+
+    def test_chunks_and_cli(self, app, runner, test_user, tmp_path):
+        """
+        GIVEN: A user with three characters
+        WHEN: Records are chunked two at a time, and the CLI exports them
+        THEN: Chunks hold whole lines and the CLI writes the same file
+        """
+        with app.app_context():
+            user_id = add_party()
+            chunks = list(ndjson_chunks(character_records(user_id), batch_size=2))
+        assert [chunk.count(b"\n") for chunk in chunks] == [2, 1]
+
+        output = tmp_path / "characters.ndjson.gz"
+        result = runner.invoke(
+            args=["export-characters", "test@example.com", "--gzip", "-o", output]
+        )
+        assert result.exit_code == 0
+        assert gzip.decompress(output.read_bytes()) == b"".join(chunks)
+
+        result = runner.invoke(args=["export-characters", "nobody@example.com"])
+        assert result.exit_code != 0
+        assert "No user with email" in result.output
+
+
+@pytest.mark.functional
+class TestCharacterImport:
+    """Functional tests for bulk character import."""
+
+    def test_export_round_trips_through_import(self, app, client, auth, test_user):
+        """
+        GIVEN: An NDJSON export of a user's characters
+        WHEN: Another user imports it
+        THEN: Characters, relationships, inventory and summaries are recreated
+        """
+        with app.app_context():
+            add_party()
+            other = User(email="other@example.com", name="Other")
+            other.set_password("otherpass")
+            db.session.add(other)
+            db.session.commit()
+            other_id = other.id
+        auth.login()
+        exported = client.get("/characters/export?gzip=1").get_data()
+        auth.logout()
+        auth.login(email="other@example.com", password="otherpass")
+
+        response = client.post(
+            "/characters/import",
+            data={"file": (io.BytesIO(exported), "characters.ndjson.gz")},
+        )
+        assert response.status_code == 200
+        assert response.get_json() == {"imported": 3, "errors": []}
+
+        with app.app_context():
+            aria = Character.query.filter_by(user_id=other_id, name="Aria").one()
+            assert aria.species.name == "Elf"
+            assert aria.all_languages == ["Common", "Elvish"]
+            assert [(entry.item.name, entry.quantity) for entry in aria.inventory] == [
+                ("Rope", 2)
+            ]
+            assert CharacterSummary.query.filter_by(user_id=other_id).count() == 3
+        assert client.get("/characters/export").get_data() == gzip.decompress(exported)
+
+    def test_csv_errors_are_reported_per_record(self, app, runner, test_user, tmp_path):
+        """
+        GIVEN: A CSV file with valid and invalid rows
+        WHEN: It is imported from the command line
+        THEN: Valid rows are imported and each invalid row is reported by line
+        """
+        with app.app_context():
+            db.session.add(Language(name="Elvish"))
+            db.session.commit()
+        path = tmp_path / "roster.csv"
+        path.write_text(
+            "name,level,strength,dexterity,constitution,intelligence,wisdom,"
+            "charisma,str_save_proficient,languages,species\n"
+            "Aria,5,10,14,12,16,13,8,yes,Elvish,\n"
+            "Borin,two,16,10,16,8,12,10,no,,\n"
+            "Cade,1,10,10,10,10,10,10,no,Gnomish,Gnome\n"
+            "Dara,1,10,10,10,10,10,10,no,,,surplus\n"
+        )
+
+        result = runner.invoke(
+            args=["import-characters", "test@example.com", str(path)]
+        )
+
+        assert result.exit_code == 1
+        assert "Imported 1 characters." in result.output
+        assert "Line 3: level: Expected int." in result.output
+        assert "Line 4: species: Unknown species Gnome." in result.output
+        assert "Line 5: extra_columns: More cells than header columns." in result.output
+        with app.app_context():
+            aria = Character.query.filter_by(name="Aria").one()
+            assert (aria.level, aria.proficiency_bonus) == (5, 3)
+            assert aria.str_save_proficient is True
+            assert [language.name for language in aria.languages] == ["Elvish"]
+
+    def test_parallel_validation(self, app, client, auth, test_user):
+        """
+        GIVEN: An NDJSON body above the parallel validation threshold
+        WHEN: It is posted to the import endpoint
+        THEN: Records are validated in worker processes with the same results
+        """
+        app.config.update(
+            IMPORT_PARALLEL_MIN_RECORDS=2, IMPORT_WORKERS=2, IMPORT_CHUNK_SIZE=1
+        )
+        scores = dict(
+            strength=10,
+            dexterity=10,
+            constitution=10,
+            intelligence=10,
+            wisdom=10,
+            charisma=10,
+        )
+        lines = [
+            json.dumps(dict(scores, name="Aria")),
+            "{not json",
+            json.dumps(dict(scores, name="Borin", strength=True)),
+            json.dumps(dict(scores, name="Cade", spell_slots=[{"level": 1}])),
+            json.dumps(dict(scores, name="Dara")),
+        ]
+        auth.login()
+
+        response = client.post(
+            "/characters/import?format=ndjson", data="\n".join(lines).encode()
+        )
+
+        result = response.get_json()
+        assert result["imported"] == 2
+        assert [(error["line"], error["name"]) for error in result["errors"]] == [
+            (2, None),
+            (3, "Borin"),
+            (4, "Cade"),
+        ]
+        assert result["errors"][2]["errors"] == {
+            "spell_slots": "total_slots is required."
+        }
+
+    def test_failed_rows_do_not_reject_their_chunk(self, app, test_user, monkeypatch):
+        """
+        GIVEN: A chunk holding an over-long name and a row the database rejects
+        WHEN: It is imported
+        THEN: The long name fails validation, the chunk is retried row by row
+            and only the rejected row is reported
+        """
+        app.config["IMPORT_CHUNK_SIZE"] = 10
+        insert_characters = imports.insert_characters
+
+        def reject_bad(entries):
+            if any(row["name"] == "Bad" for row, _ in entries):
+                raise IntegrityError("INSERT", {}, Exception("rejected"))
+            return insert_characters(entries)
+
+        monkeypatch.setattr(imports, "insert_characters", reject_bad)
+        scores = dict(
+            strength=10,
+            dexterity=10,
+            constitution=10,
+            intelligence=10,
+            wisdom=10,
+            charisma=10,
+        )
+        data = "\n".join(
+            json.dumps(dict(scores, name=name))
+            for name in ("Aria", "x" * 101, "Bad", "Dara")
+        ).encode()
+
+        with app.app_context():
+            user_id = User.query.filter_by(email="test@example.com").one().id
+            result = imports.import_characters(user_id, data)
+            names = [character.name for character in Character.query.all()]
+
+        assert result["imported"] == 2
+        assert [(error["line"], error["errors"]) for error in result["errors"]] == [
+            (2, {"name": "At most 100 characters."}),
+            (3, {"record": "Could not be saved."}),
+        ]
+        assert sorted(names) == ["Aria", "Dara"]
@@ -0,0 +1,772 @@
+import gzip
+import pytest
+from project import db
+from project.catalog import item_facet_counts, rebuild_item_facets
+from project.models import (
+    CharacterClass,
+    Feature,
+    Item,
+    Language,
+    Proficiency,
+    Species,
+    Spell,
+    SpellClass,
+    SubSpecies,
+)
+from project.payloads import payload_dir, warm_reference_payloads
+from project.reference import (
+    PrefixIndex,
+    TypeaheadEntry,
+    reference_version,
+    typeahead,
+)
+from project.search import search
+
+
+def add_spells():
+    """Seed a handful of spells across class lists and levels."""
+    db.session.add_all(
+        [
+            Spell(
+                name="Fire Bolt",
+                level=0,
+                school="Evocation",
+                description="A mote of fire.",
+                class_lists="sorcerer,wizard",
+            ),
+            Spell(
+                name="Cure Wounds",
+                level=1,
+                school="Evocation",
+                description="A creature you touch regains hit points.",
+                class_lists="bard,cleric,druid,paladin,ranger",
+            ),
+            Spell(
+                name="Magic Missile",
+                level=1,
+                school="Evocation",
+                description="Three glowing darts of magical force.",
+                class_lists="sorcerer,wizard",
+            ),
+            Spell(
+                name="Fireball",
+                level=3,
+                school="Evocation",
+                description="A bright streak flashes to a point you choose.",
+                class_lists="sorcerer,wizard",
+            ),
+        ]
+    )
+    db.session.commit()
+
+
+@pytest.mark.functional
+class TestSpellApi:
+    """Functional tests for the class-filtered spell API."""
+
+    def test_class_lists_populate_spell_class(self, app):
+        """
+        GIVEN: A spell with a comma-separated class list
+        WHEN: The spell is saved and its class list changed
+        THEN: The spell_class rows should follow the class list
+        """
+        with app.app_context():
+            add_spells()
+            fire_bolt = Spell.query.filter_by(name="Fire Bolt").one()
+            assert {entry.class_name for entry in fire_bolt.class_entries} == {
+                "sorcerer",
+                "wizard",
+            }
+
+            fire_bolt.class_lists = "Wizard"
+            db.session.commit()
+            assert SpellClass.query.filter_by(spell_id=fire_bolt.id).count() == 1
+
+    def test_spells_filtered_by_class_and_level(self, app, client, auth, test_user):
+        """
+        GIVEN: Spells on several class lists
+        WHEN: A wizard requests spells up to level 1
+        THEN: Only wizard spells of level 0-1 should be returned
+        """
+        with app.app_context():
+            add_spells()
+        auth.login()
+
+        response = client.get("/characters/api/spells?class=Wizard&max_level=1")
+        assert response.status_code == 200
+        names = [spell["name"] for spell in response.get_json()["spells"]]
+        assert names == ["Fire Bolt", "Magic Missile"]
+
+        response = client.get("/characters/api/spells?class=Fighter")
+        assert response.get_json()["spells"] == []
+
+    def test_list_summaries_and_spell_detail(self, app, client, auth, test_user):
+        """
+        GIVEN: A spell with long rules text
+        WHEN: The spell list and the spell detail endpoint are requested
+        THEN: The list carries a truncated summary and the detail the full text
+        """
+        description = "A beam of crackling energy streaks toward a creature. " * 4
+        with app.app_context():
+            db.session.add(
+                Spell(
+                    name="Witch Bolt",
+                    level=1,
+                    school="Evocation",
+                    description=description,
+                    higher_level="The damage increases by 1d12.",
+                    class_lists="sorcerer,warlock,wizard",
+                    requires_concentration=True,
+                )
+            )
+            db.session.commit()
+        auth.login()
+
+        response = client.get("/characters/api/spells?class=Warlock")
+        [summary] = response.get_json()["spells"]
+        assert summary["description"] == description[:100] + "..."
+        assert "higher_level" not in summary
+
+        response = client.get(f"/characters/api/spells/{summary['id']}")
+        spell = response.get_json()
+        assert spell["description"] == description
+        assert spell["higher_level"] == "The damage increases by 1d12."
+        assert spell["classes"] == ["sorcerer", "warlock", "wizard"]
+
+        response = client.get("/characters/api/spells/9999")
+        assert response.status_code == 404
+
+
+@pytest.mark.functional
+class TestRulesSearch:
+    """Functional tests for full-text search over rules text."""
+
+    def test_search_ranks_and_paginates(self, app, client, auth, test_user):
+        """
+        GIVEN: Spells, features and items with rules text
+        WHEN: The search endpoint is queried
+        THEN: Name matches rank first and results are paginated
+        """
+        with app.app_context():
+            add_spells()
+            db.session.add_all(
+                [
+                    Feature(
+                        name="Fire Resistance",
+                        description="You have resistance to fire damage.",
+                        feature_type="racial",
+                    ),
+                    Item(
+                        name="Torch",
+                        item_type="adventuring gear",
+                        description="Sheds bright light; deals 1 fire damage.",
+                    ),
+                ]
+            )
+            db.session.commit()
+        auth.login()
+
+        response = client.get("/characters/api/search?q=fire&per_page=2")
+        data = response.get_json()
+        assert response.status_code == 200
+        assert data["total"] == 4
+        assert len(data["results"]) == 2
+        assert data["results"][0]["name"] in ("Fire Bolt", "Fire Resistance")
+
+        response = client.get("/characters/api/search?q=fire&types=item")
+        results = response.get_json()["results"]
+        assert [(hit["type"], hit["name"]) for hit in results] == [("item", "Torch")]
+
+    def test_index_follows_updates_and_deletes(self, app):
+        """
+        GIVEN: An indexed spell
+        WHEN: Its description and school are changed and it is later deleted
+        THEN: Search results should reflect each change
+        """
+        with app.app_context():
+            add_spells()
+            assert search("darts")[1] == 1
+
+            missile = Spell.query.filter_by(name="Magic Missile").one()
+            missile.description = "Three shimmering arrows."
+            db.session.commit()
+            assert search("darts")[1] == 0
+            assert search("shimmering")[1] == 1
+
+            missile.school = "Necromancy"
+            db.session.commit()
+            assert search("necromancy")[1] == 1
+
+            db.session.delete(missile)
+            db.session.commit()
+            assert search("shimmering")[1] == 0
+
+
+@pytest.mark.functional
+class TestTypeahead:
+    """Functional tests for the in-process name typeahead."""
+
+    def test_prefix_matches_any_word(self, app, client, auth, test_user):
+        """
+        GIVEN: Spells and languages in the database
+        WHEN: The typeahead is queried with a prefix
+        THEN: Names with any word starting with the prefix are returned
+        """
+        with app.app_context():
+            add_spells()
+            db.session.add(Language(name="Firbolg", language_type="Exotic"))
+            db.session.commit()
+        auth.login()
+
+        response = client.get("/characters/api/typeahead?q=fir")
+        names = [match["name"] for match in response.get_json()["results"]]
+        assert names == ["Firbolg", "Fire Bolt", "Fireball"]
+
+        response = client.get("/characters/api/typeahead?q=miss&types=spell")
+        names = [match["name"] for match in response.get_json()["results"]]
+        assert names == ["Magic Missile"]
+
+    def test_lookup_stops_at_limit(self):
+        """
+        GIVEN: An index where most names share a one-letter prefix
+        WHEN: It is searched with a small limit
+        THEN: Start-of-name matches come first, in name order, up to the limit
+        """
+        names = ["Acid Arrow", "Aid", "Alarm", "Magic Arrow", "Mage Armor", "Shield"]
+        index = PrefixIndex(
+            TypeaheadEntry("spell", id, name) for id, name in enumerate(names)
+        )
+
+        assert [entry.name for entry in index.lookup("a", 2)] == ["Acid Arrow", "Aid"]
+        assert [entry.name for entry in index.lookup("ar", 5)] == [
+            "Acid Arrow",
+            "Mage Armor",
+            "Magic Arrow",
+        ]
+        assert [entry.name for entry in index.lookup("a", 5)] == [
+            "Acid Arrow",
+            "Aid",
+            "Alarm",
+            "Mage Armor",
+            "Magic Arrow",
+        ]
+
+    def test_index_rebuilt_when_reference_data_changes(self, app):
+        """
+        GIVEN: A typeahead index that has already been built
+        WHEN: A new spell is added
+        THEN: The reference version changes and the index includes it
+        """
+        with app.app_context():
+            add_spells()
+            before = reference_version()
+            assert typeahead("light") == []
+
+            db.session.add(
+                Spell(name="Light", level=0, school="Evocation", description="Glow.")
+            )
+            db.session.commit()
+
+            assert reference_version() != before
+            assert [match.name for match in typeahead("light")] == ["Light"]
+
+
+@pytest.mark.functional
+class TestSpellBitmapFilter:
+    """Functional tests for the in-memory spell filter index."""
+
+    def test_filter_combinations(self, app, client, auth, test_user):
+        """
+        GIVEN: Spells with different levels, classes and flags
+        WHEN: Filters are combined across attributes
+        THEN: Ordered ids and per-value counts should be returned
+        """
+        with app.app_context():
+            add_spells()
+            db.session.add(
+                Spell(
+                    name="Detect Magic",
+                    level=1,
+                    school="Divination",
+                    description="You sense the presence of magic.",
+                    class_lists="bard,cleric,wizard",
+                    is_ritual=True,
+                    requires_concentration=True,
+                )
+            )
+            db.session.commit()
+            ids = {spell.name: spell.id for spell in Spell.query.all()}
+        auth.login()
+
+        response = client.get("/characters/api/spells/filter?class=wizard&level=0,1")
+        data = response.get_json()
+        assert data["ids"] == [
+            ids["Fire Bolt"],
+            ids["Detect Magic"],
+            ids["Magic Missile"],
+        ]
+        assert data["count"] == 3
+        assert data["counts"]["school"] == {"divination": 1, "evocation": 2}
+
+        response = client.get("/characters/api/spells/filter?ritual=true&class=cleric")
+        assert response.get_json()["ids"] == [ids["Detect Magic"]]
+
+        response = client.get("/characters/api/spells/filter?school=necromancy")
+        assert response.get_json()["count"] == 0
+
+
+@pytest.mark.functional
+class TestFeatureBundles:
+    """Functional tests for the per-class and per-species feature bundles."""
+
+    def test_features_filtered_by_class_and_species(self, app, client, auth, test_user):
+        """
+        GIVEN: Class, racial and general features with source names
+        WHEN: Features are requested for a race/class pair
+        THEN: Only that class's and species' features plus shared ones return
+        """
+        with app.app_context():
+            db.session.add_all(
+                [
+                    Feature(
+                        name="Second Wind",
+                        description="Regain hit points.",
+                        feature_type="class",
+                        source_class="Fighter",
+                    ),
+                    Feature(
+                        name="Arcane Recovery",
+                        description="Recover spell slots.",
+                        feature_type="class",
+                        source_class=" Wizard ",
+                    ),
+                    Feature(
+                        name="Stonecunning",
+                        description="Know the origin of stonework.",
+                        feature_type="racial",
+                        source_species="Dwarf",
+                    ),
+                    Feature(
+                        name="Fey Ancestry",
+                        description="Advantage against being charmed.",
+                        feature_type="racial",
+                        source_species="Elf",
+                    ),
+                    Feature(
+                        name="Alert",
+                        description="Always on the lookout for danger.",
+                        feature_type="feat",
+                    ),
+                ]
+            )
+            db.session.commit()
+            wizard = Feature.query.filter_by(name="Arcane Recovery").one()
+            assert (wizard.class_key, wizard.species_key) == ("wizard", None)
+        auth.login()
+
+        response = client.get("/characters/api/features?race=Elf&class=wizard")
+        names = [feature["name"] for feature in response.get_json()["features"]]
+        assert names == ["Fey Ancestry", "Arcane Recovery", "Alert"]
+
+        response = client.get("/characters/api/features?race=Dwarf")
+        names = [feature["name"] for feature in response.get_json()["features"]]
+        assert names == ["Stonecunning", "Arcane Recovery", "Second Wind", "Alert"]
+
+
+def add_items():
+    """Seed items spread across several facets."""
+    db.session.add_all(
+        [
+            Item(
+                name="Dagger",
+                item_type="weapon",
+                cost_gp=2,
+                damage_type="piercing",
+            ),
+            Item(
+                name="Longsword",
+                item_type="weapon",
+                cost_gp=15,
+                damage_type="slashing",
+            ),
+            Item(
+                name="Ring of Protection",
+                item_type="ring",
+                cost_gp=3500,
+                rarity="rare",
+                is_magical=True,
+                requires_attunement=True,
+            ),
+            Item(name="Rope", item_type="adventuring gear", cost_gp=1),
+        ]
+    )
+    db.session.commit()
+
+
+@pytest.mark.functional
+class TestItemCatalog:
+    """Functional tests for the faceted item catalog."""
+
+    def test_facet_counts_follow_writes(self, app):
+        """
+        GIVEN: Items inserted into the catalog
+        WHEN: An item is updated and another deleted
+        THEN: The precomputed facet counts should be adjusted incrementally
+        """
+        with app.app_context():
+            add_items()
+            facets = item_facet_counts()
+            assert facets["item_type"] == {
+                "adventuring gear": 1,
+                "ring": 1,
+                "weapon": 2,
+            }
+            assert facets["cost"] == {"1-10": 2, "1000+": 1, "11-100": 1}
+            assert facets["is_magical"] == {"false": 3, "true": 1}
+
+            dagger = Item.query.filter_by(name="Dagger").one()
+            dagger.is_magical = True
+            dagger.cost_gp = 200
+            db.session.delete(Item.query.filter_by(name="Rope").one())
+            db.session.commit()
+
+            facets = item_facet_counts()
+            assert facets["is_magical"] == {"false": 1, "true": 2}
+            assert facets["cost"] == {"101-1000": 1, "1000+": 1, "11-100": 1}
+            assert "adventuring gear" not in facets["item_type"]
+
+            rebuild_item_facets()
+            assert item_facet_counts() == facets
+
+    def test_browse_filters_and_returns_facets(self, app, client, auth, test_user):
+        """
+        GIVEN: Items across several facets
+        WHEN: The catalog is browsed with facet filters
+        THEN: Matching items and the facet counts should come back together
+        """
+        with app.app_context():
+            add_items()
+        auth.login()
+
+        response = client.get("/characters/api/items?item_type=weapon&cost=11-100")
+        data = response.get_json()
+        assert [item["name"] for item in data["items"]] == ["Longsword"]
+        assert data["total"] == 1
+        assert data["facets"]["damage_type"] == {"piercing": 1, "slashing": 1}
+
+        response = client.get("/characters/api/items?is_magical=true")
+        assert [item["name"] for item in response.get_json()["items"]] == [
+            "Ring of Protection"
+        ]
+
+
+def add_races_and_classes():
+    """Seed an Elf species with a subspecies and a Wizard class."""
+    elf = Species(
+        name="Elf",
+        ability_score_increases={"dex": 2},
+        traits=["Darkvision"],
+        languages=["Common", "Elvish"],
+        proficiencies=["Skill: Perception"],
+    )
+    db.session.add_all(
+        [
+            elf,
+            SubSpecies(
+                name="High Elf",
+                species=elf,
+                additional_proficiencies=["Longsword"],
+                additional_languages=["Draconic"],
+            ),
+            CharacterClass(
+                name="Wizard",
+                hit_die=6,
+                primary_ability="Intelligence",
+                skill_proficiencies=["Arcana"],
+            ),
+            Proficiency(name="Perception", proficiency_type="skill"),
+            Proficiency(name="Arcana", proficiency_type="skill"),
+            Proficiency(name="Longsword", proficiency_type="weapon"),
+            Proficiency(name="Stealth", proficiency_type="skill"),
+            Language(name="Common", language_type="Standard"),
+            Language(name="Elvish", language_type="Standard"),
+            Feature(
+                name="Darkvision",
+                description="You can see in dim light.",
+                feature_type="racial",
+            ),
+        ]
+    )
+    db.session.commit()
+
+
+@pytest.mark.functional
+class TestCreationOptions:
+    """Functional tests for the one-shot character creation bootstrap."""
+
+    def test_bootstrap_returns_every_option_set(self, app, client, auth, test_user):
+        """
+        GIVEN: Reference data for proficiencies, languages and spells
+        WHEN: Creation options are requested for a race/class pair
+        THEN: All option sets should be returned in a single response
+        """
+        with app.app_context():
+            add_spells()
+            add_races_and_classes()
+        auth.login()
+
+        response = client.get("/characters/api/creation-options?race=Elf&class=Wizard")
+        data = response.get_json()
+
+        assert response.status_code == 200
+        assert [prof["name"] for prof in data["proficiencies"]] == [
+            "Arcana",
+            "Perception",
+        ]
+        assert data["base_languages"] == ["Common", "Elvish"]
+        assert [lang["name"] for lang in data["languages"]] == ["Common", "Elvish"]
+        assert [trait["name"] for trait in data["traits"]] == ["Darkvision"]
+        assert [feat["name"] for feat in data["features"]] == ["Darkvision"]
+        assert [spell["name"] for spell in data["spells"]] == [
+            "Fire Bolt",
+            "Magic Missile",
+        ]
+
+    def test_druids_speak_druidic(self, app, client, auth, test_user):
+        """
+        GIVEN: A Druid class alongside the seeded races
+        WHEN: Languages are requested for a druid of a known and unknown race
+        THEN: Druidic is added to the species (or default) languages
+        """
+        with app.app_context():
+            add_races_and_classes()
+            db.session.add(
+                CharacterClass(name="Druid", hit_die=8, primary_ability="Wisdom")
+            )
+            db.session.commit()
+        auth.login()
+
+        response = client.get("/characters/api/languages?race=Elf&class=Druid")
+        assert response.get_json()["base_languages"] == ["Common", "Elvish", "Druidic"]
+        response = client.get("/characters/api/languages?race=Gnome&class=Druid")
+        assert response.get_json()["base_languages"] == ["Common", "Druidic"]
+
+    def test_options_follow_reference_tables(self, app, client, auth, test_user):
+        """
+        GIVEN: Species, subspecies and classes in the reference tables
+        WHEN: Races, classes and subrace options are requested
+        THEN: The answers should come from the seeded rows, including reseeds
+        """
+        with app.app_context():
+            add_races_and_classes()
+        auth.login()
+
+        assert client.get("/characters/api/races").get_json() == ["Elf"]
+        assert client.get("/characters/api/classes").get_json() == ["Wizard"]
+
+        response = client.get(
+            "/characters/api/languages?race=Elf&subrace=High+Elf&class=Wizard"
+        )
+        assert response.get_json()["base_languages"] == ["Common", "Elvish", "Draconic"]
+
+        response = client.get("/characters/api/proficiencies?race=elf&subrace=high elf")
+        assert [prof["name"] for prof in response.get_json()["proficiencies"]] == [
+            "Longsword",
+            "Perception",
+        ]
+
+        with app.app_context():
+            db.session.add(
+                Species(name="Dwarf", traits=[], languages=["Common", "Dwarvish"])
+            )
+            db.session.commit()
+
+        assert client.get("/characters/api/races").get_json() == ["Dwarf", "Elf"]
+        response = client.get("/characters/api/languages?race=Dwarf")
+        assert response.get_json()["base_languages"] == ["Common", "Dwarvish"]
+
+
+@pytest.mark.functional
+class TestReferenceHttpCaching:
+    """Functional tests for ETag validation on reference endpoints."""
+
+    def test_etag_revalidation_and_reseed(self, app, client, auth, test_user):
+        """
+        GIVEN: A reference endpoint response with an ETag
+        WHEN: It is requested again with If-None-Match
+        THEN: A 304 is returned until the reference data changes
+        """
+        with app.app_context():
+            add_spells()
+        auth.login()
+
+        url = "/characters/api/spells?class=Wizard"
+        response = client.get(url)
+        etag = response.headers["ETag"]
+        assert response.status_code == 200
+        assert "max-age" in response.headers["Cache-Control"]
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+
+        other = client.get(url + "&max_level=0")
+        assert other.headers["ETag"] != etag
+
+        with app.app_context():
+            db.session.add(
+                Spell(
+                    name="Shield",
+                    level=1,
+                    school="Abjuration",
+                    description="An invisible barrier of magical force.",
+                    class_lists="sorcerer,wizard",
+                )
+            )
+            db.session.commit()
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert "Shield" in [spell["name"] for spell in response.get_json()["spells"]]
+
+    def test_precompressed_payload_negotiation(self, app, client, auth, test_user):
+        """
+        GIVEN: A pregenerated reference URL that has been requested once
+        WHEN: It is requested again with different Accept-Encoding headers
+        THEN: The stored gzip or identity variant is served with its own ETag
+        """
+        with app.app_context():
+            add_spells()
+            add_races_and_classes()
+        auth.login()
+
+        url = "/characters/api/spells?class=Wizard"
+        plain = client.get(url)
+        assert "Content-Encoding" not in plain.headers
+        assert "Accept-Encoding" in plain.headers["Vary"]
+
+        compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(compressed.data) == plain.data
+        assert compressed.headers["ETag"] != plain.headers["ETag"]
+
+        response = client.get(
+            url,
+            headers={
+                "Accept-Encoding": "gzip",
+                "If-None-Match": compressed.headers["ETag"],
+            },
+        )
+        assert response.status_code == 304
+
+        with app.app_context():
+            stored = {path.name for path in payload_dir().iterdir()}
+        assert f"{plain.get_etag()[0]}.json.gz" in stored
+
+    def test_brotli_preferred_when_accepted(self, app, client, auth, test_user):
+        """
+        GIVEN: A pregenerated reference URL and the brotli package
+        WHEN: It is requested accepting both br and gzip
+        THEN: The stored brotli variant is served with its own ETag
+        """
+        brotli = pytest.importorskip("brotli")
+        with app.app_context():
+            add_spells()
+            add_races_and_classes()
+        auth.login()
+
+        url = "/characters/api/spells?class=Wizard"
+        plain = client.get(url)
+        response = client.get(url, headers={"Accept-Encoding": "gzip, br"})
+        assert response.headers["Content-Encoding"] == "br"
+        assert brotli.decompress(response.data) == plain.data
+        assert response.headers["ETag"] == f'"{plain.get_etag()[0]}-br"'
+
+    def test_free_text_queries_are_not_stored(self, app, client, auth, test_user):
+        """
+        GIVEN: Reference endpoints taking free-text or filter parameters
+        WHEN: They are requested with many different query strings
+        THEN: Each gets validators but nothing is written to the payload store
+        """
+        with app.app_context():
+            add_spells()
+            add_races_and_classes()
+        auth.login()
+
+        for prefix in ("f", "fi", "fir", "fire", "fireb", "firebo"):
+            response = client.get(f"/characters/api/typeahead?q={prefix}")
+            assert response.status_code == 200
+        response = client.get(
+            "/characters/api/search?q=fire",
+            headers={"Accept-Encoding": "gzip"},
+        )
+        assert "Content-Encoding" not in response.headers
+        etag = response.headers["ETag"]
+        response = client.get(
+            "/characters/api/search?q=fire", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        client.get("/characters/api/spells?class=Wizard&max_level=0")
+
+        with app.app_context():
+            directory = payload_dir()
+        assert not directory.exists() or not any(directory.iterdir())
+
+    def test_warm_generates_common_payloads(self, app):
+        """
+        GIVEN: Seeded reference data
+        WHEN: Reference payloads are warmed at seed time
+        THEN: Payloads for every race/class combination are stored on disk
+        """
+        with app.app_context():
+            add_spells()
+            add_races_and_classes()
+            count = warm_reference_payloads(app)
+            stored = list(payload_dir().glob("*.json"))
+
+        # races, classes, 2 per class and 3 per race/class pair
+        assert count == 2 + 2 + 3
+        assert len(stored) == count
+        assert not app.config.get("LOGIN_DISABLED")
+
+
+@pytest.mark.functional
+class TestReferenceFieldsets:
+    """Functional tests for ?fields= and ?include= on reference endpoints."""
+
+    def test_fields_limit_keys(self, app, client, auth, test_user):
+        """
+        GIVEN: Seeded spells and items
+        WHEN: Reference endpoints are requested with fields and include
+        THEN: Only the requested keys are returned, always with the id
+        """
+        with app.app_context():
+            add_spells()
+            add_items()
+        auth.login()
+
+        response = client.get("/characters/api/spells?class=Wizard&fields=name")
+        spells = response.get_json()["spells"]
+        assert spells[0] == {"id": spells[0]["id"], "name": "Fire Bolt"}
+
+        response = client.get("/characters/api/items?fields=name,cost_gp")
+        assert response.get_json()["items"][0] == {
+            "id": response.get_json()["items"][0]["id"],
+            "name": "Dagger",
+            "cost_gp": 2,
+        }
+
+        spell_id = spells[0]["id"]
+        url = f"/characters/api/spells/{spell_id}?fields=range,name&include="
+        assert client.get(url).get_json() == {
+            "id": spell_id,
+            "name": "Fire Bolt",
+            "range": None,
+        }
+        url = f"/characters/api/spells/{spell_id}?fields=name&include=classes"
+        assert client.get(url).get_json()["classes"] == ["sorcerer", "wizard"]
+
+        response = client.get("/characters/api/items?fields=name,price")
+        assert response.status_code == 400
+        assert response.get_json() == {"errors": {"fields": "Unknown fields: price."}}
@@ -1,5 +1,15 @@
 import pytest
-from project.models import User
+from project.models import (
+    Character,
+    CharacterClass,
+    CharacterSummary,
+    Language,
+    Proficiency,
+    Species,
+    SubSpecies,
+    User,
+)
+from project.summaries import rebuild_character_summaries
 from project import db
 
 
@@ -84,3 +94,170 @@ class TestUserModel:
             db.session.add(user2)
             with pytest.raises(Exception):  # Should raise integrity error
                 db.session.commit()
+
+
+@pytest.mark.unit
+class TestCharacterSummary:
+    """Test cases for the materialized character_summary rows."""
+
+    def test_summary_follows_writes(self, app, persistent_test_user):
+        """
+        GIVEN: A character with a species and class
+        WHEN: The character, its species and its class change or are deleted
+        THEN: The summary row should be updated in the same transaction
+        """
+        elf = Species(name="Elf")
+        wizard = CharacterClass(name="Wizard", hit_die=6, primary_ability="Int")
+        db.session.add_all([elf, wizard])
+        db.session.commit()
+        character = Character(
+            name="Aria",
+            user_id=persistent_test_user.id,
+            species_id=elf.id,
+            class_id=wizard.id,
+            strength=10,
+            dexterity=14,
+            constitution=12,
+            intelligence=16,
+            wisdom=13,
+            charisma=8,
+            current_hp=8,
+            max_hp=8,
+        )
+        db.session.add(character)
+        db.session.commit()
+
+        summary = db.session.get(CharacterSummary, character.id)
+        assert (summary.species_name, summary.class_name) == ("Elf", "Wizard")
+        assert summary.hp_percent == 100
+
+        character.current_hp = 2
+        elf.name = "High Elf"
+        db.session.commit()
+        db.session.refresh(summary)
+        assert summary.hp_percent == 25
+        assert summary.species_name == "High Elf"
+
+        character_id = character.id
+        db.session.delete(character)
+        db.session.commit()
+        assert db.session.get(CharacterSummary, character_id) is None
+
+    def test_rebuild_matches_incremental_rows(self, app, persistent_test_user):
+        """
+        GIVEN: Summary rows maintained incrementally
+        WHEN: The summaries are rebuilt from scratch a row at a time
+        THEN: The rebuilt rows should match, species names included
+        """
+        dwarf = Species(name="Dwarf")
+        db.session.add(dwarf)
+        db.session.commit()
+        for name, species_id in (("Borin", dwarf.id), ("Cade", None)):
+            db.session.add(
+                Character(
+                    name=name,
+                    user_id=persistent_test_user.id,
+                    species_id=species_id,
+                    strength=16,
+                    dexterity=10,
+                    constitution=16,
+                    intelligence=8,
+                    wisdom=12,
+                    charisma=10,
+                    level=3,
+                )
+            )
+        db.session.commit()
+
+        def rows():
+            return [
+                (row.name, row.level, row.species_name, row.hp_percent)
+                for row in CharacterSummary.query.order_by(CharacterSummary.name)
+            ]
+
+        before = rows()
+        rebuild_character_summaries(batch_size=1)
+
+        assert rows() == before == [
+            ("Borin", 3, "Dwarf", None),
+            ("Cade", 3, None, None),
+        ]
+
+
+@pytest.mark.unit
+class TestCharacterDerivedProperties:
+    """Test cases for the memoized derived properties on Character."""
+
+    def test_values_are_memoized_until_inputs_change(
+        self, app, character_lifecycle_setup
+    ):
+        """
+        GIVEN: A character with a species, subspecies and proficiencies
+        WHEN: Derived properties are read, then scores or relationships change
+        THEN: Values are reused between reads and recomputed after each change
+        """
+        elf = Species(
+            name="Elf",
+            ability_score_increases={"dex": 2},
+            traits=["Darkvision", "Keen Senses"],
+            languages=["Elvish", "Common"],
+            proficiencies=["Perception"],
+        )
+        high_elf = SubSpecies(
+            name="High Elf",
+            species=elf,
+            additional_ability_increases={"int": 1},
+            additional_traits=["Cantrip", "Darkvision"],
+        )
+        arcana = Proficiency(name="Arcana", proficiency_type="skill")
+        db.session.add_all([elf, high_elf, arcana])
+        db.session.commit()
+        character = character_lifecycle_setup.create_character(
+            intelligence=16, species_id=elf.id
+        )
+
+        scores = character.effective_ability_scores
+        assert scores["dex"] == 16
+        scores["dex"] = 0
+        assert character.effective_ability_scores["dex"] == 16
+        assert "effective_ability_scores" in character.__dict__["_derived_values"]
+
+        character.dexterity = 10
+        assert character.effective_ability_scores["dex"] == 12
+
+        assert character.all_proficiencies == ["Perception"]
+        character.proficiencies.append(arcana)
+        assert character.all_proficiencies == ["Arcana", "Perception"]
+
+        assert character.all_languages == ["Common", "Elvish"]
+        assert character.all_traits == ["Darkvision", "Keen Senses"]
+        character.subspecies = high_elf
+        assert character.effective_ability_scores["int"] == 17
+        assert character.all_traits == ["Darkvision", "Keen Senses", "Cantrip"]
+
+        character.species = None
+        character.subspecies = None
+        assert character.effective_ability_scores["dex"] == 10
+        assert character.all_traits == []
+
+    def test_commit_and_refresh_forget_values(self, app, character_lifecycle_setup):
+        """
+        GIVEN: A character with memoized derived properties
+        WHEN: Another session changes its languages and this one commits
+        THEN: The expired instance recomputes from the fresh rows
+        """
+        db.session.add(Language(name="Dwarvish"))
+        db.session.commit()
+        character = character_lifecycle_setup.create_character(name="Borin")
+        assert character.all_languages == []
+
+        db.session.execute(
+            db.text(
+                "INSERT INTO character_languages (character_id, language_id) "
+                "SELECT :id, id FROM language WHERE name = 'Dwarvish'"
+            ),
+            {"id": character.id},
+        )
+        assert character.all_languages == []
+        db.session.commit()
+        assert character.all_languages == ["Dwarvish"]
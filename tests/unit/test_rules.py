@@ -0,0 +1,474 @@
+"""
+Test cases for the rules engines that derive values from character data.
+"""
+
+import pytest
+from project import db
+from project import rules
+from project.models import (
+    CharacterItem,
+    Item,
+    Proficiency,
+    Species,
+    SubSpecies,
+)
+from project.rules import (
+    character_sheet,
+    character_stats,
+    compute_armor_class,
+    compute_attack_profiles,
+    compute_skill_table,
+    compute_skill_tables,
+)
+
+
+def equip(character, item, slot=None):
+    """Add an equipped item to a character's inventory."""
+    db.session.add(
+        CharacterItem(
+            character_id=character.id,
+            item_id=item.id,
+            equipped=True,
+            equipment_slot=slot,
+        )
+    )
+    db.session.commit()
+
+
+@pytest.mark.unit
+class TestArmorClassEngine:
+    """Unit tests for armor class derived from equipped items."""
+
+    def test_unarmored_uses_dexterity(self, app, character_lifecycle_setup):
+        """
+        GIVEN: A character with Dexterity 16 and no equipment
+        WHEN: Armor class is computed
+        THEN: It should be 10 + Dexterity modifier
+        """
+        character = character_lifecycle_setup.create_character(dexterity=16)
+        armor = compute_armor_class(character)
+        assert armor.total == 13
+        assert armor.armor is None
+        assert armor.shield is None
+
+    def test_medium_armor_caps_dexterity_and_adds_shield(
+        self, app, character_lifecycle_setup
+    ):
+        """
+        GIVEN: A character wearing medium armor and carrying a shield
+        WHEN: Armor class is computed
+        THEN: The Dexterity bonus is capped and the shield bonus is added
+        """
+        character = character_lifecycle_setup.create_character(dexterity=18)
+        breastplate = Item(
+            name="Breastplate", item_type="armor", armor_class=14, max_dex_bonus=2
+        )
+        shield = Item(name="Shield", item_type="shield", armor_class=2)
+        db.session.add_all([breastplate, shield])
+        db.session.commit()
+
+        equip(character, breastplate, "armor")
+        equip(character, shield, "off_hand")
+
+        armor = compute_armor_class(character)
+        assert armor.total == 18
+        assert armor.dex_bonus == 2
+        assert armor.shield_bonus == 2
+        assert armor.armor == "Breastplate"
+        assert armor.shield == "Shield"
+
+    def test_heavy_armor_strength_and_stealth(self, app, character_lifecycle_setup):
+        """
+        GIVEN: A weak character wearing heavy armor
+        WHEN: Armor class is computed
+        THEN: Dexterity is ignored and the drawbacks are reported
+        """
+        character = character_lifecycle_setup.create_character(strength=10)
+        plate = Item(
+            name="Plate",
+            item_type="armor",
+            armor_class=18,
+            max_dex_bonus=0,
+            min_strength=15,
+            stealth_disadvantage=True,
+        )
+        db.session.add(plate)
+        db.session.commit()
+        equip(character, plate, "armor")
+
+        armor = compute_armor_class(character)
+        assert armor.total == 18
+        assert armor.stealth_disadvantage is True
+        assert armor.meets_strength_requirement is False
+
+    def test_heavy_armor_ignores_dexterity_penalty(
+        self, app, character_lifecycle_setup
+    ):
+        """
+        GIVEN: A character with Dexterity 8 wearing plate
+        WHEN: Armor class is computed
+        THEN: The negative Dexterity modifier is not applied
+        """
+        character = character_lifecycle_setup.create_character(dexterity=8)
+        plate = Item(name="Plate", item_type="armor", armor_class=18, max_dex_bonus=0)
+        db.session.add(plate)
+        db.session.commit()
+        equip(character, plate, "armor")
+
+        armor = compute_armor_class(character)
+        assert armor.total == 18
+        assert armor.dex_bonus == 0
+
+    def test_recomputes_when_item_data_changes(self, app, character_lifecycle_setup):
+        """
+        GIVEN: A character whose armor class has already been computed
+        WHEN: The armor's reference data is changed
+        THEN: The new reference version gives a fresh value
+        """
+        character = character_lifecycle_setup.create_character()
+        plate = Item(name="Plate", item_type="armor", armor_class=18, max_dex_bonus=0)
+        db.session.add(plate)
+        db.session.commit()
+        equip(character, plate, "armor")
+        assert compute_armor_class(character).total == 18
+
+        plate.armor_class = 15
+        db.session.commit()
+        assert compute_armor_class(character).total == 15
+        assert character_sheet(character).armor.total == 15
+
+    def test_not_shared_with_recreated_id(self, app, character_lifecycle_setup):
+        """
+        GIVEN: A cached armor class for plate armor on a deleted character
+        WHEN: A new character reuses its id and only carries rope
+        THEN: The new character is unarmored
+        """
+        character = character_lifecycle_setup.create_character(dexterity=16)
+        plate = Item(name="Plate", item_type="armor", armor_class=18, max_dex_bonus=0)
+        rope = Item(name="Rope", item_type="adventuring gear")
+        db.session.add_all([plate, rope])
+        db.session.commit()
+        equip(character, plate, "armor")
+        assert compute_armor_class(character).total == 18
+        character_id = character.id
+        db.session.delete(character)
+        db.session.commit()
+
+        character = character_lifecycle_setup.create_character(dexterity=16)
+        assert character.id == character_id
+        equip(character, rope)
+        assert character.inventory_version == 1
+        assert compute_armor_class(character).total == 13
+
+    def test_recomputes_when_equipment_changes(self, app, character_lifecycle_setup):
+        """
+        GIVEN: A character whose armor class has already been computed
+        WHEN: Armor is equipped and later unequipped
+        THEN: The inventory version changes and a fresh value is returned
+        """
+        character = character_lifecycle_setup.create_character(dexterity=16)
+        assert compute_armor_class(character).total == 13
+        version = character.inventory_version
+
+        leather = Item(name="Leather", item_type="armor", armor_class=11)
+        db.session.add(leather)
+        db.session.commit()
+        equip(character, leather, "armor")
+
+        assert character.inventory_version > version
+        assert compute_armor_class(character).total == 14
+
+        character.inventory[0].equipped = False
+        db.session.commit()
+        assert compute_armor_class(character).total == 13
+
+
+@pytest.mark.unit
+class TestAttackProfiles:
+    """Unit tests for attack profiles derived from equipped weapons."""
+
+    def test_weapon_properties_parsed_into_flags(self, app):
+        """
+        GIVEN: A weapon with free-text properties
+        WHEN: The properties are assigned
+        THEN: They should be parsed once into weapon_flags
+        """
+        rapier = Item(name="Rapier", item_type="weapon")
+        rapier.weapon_properties = "Martial, Finesse, Thrown (range 20/60)"
+        assert rapier.has_weapon_property("martial")
+        assert rapier.has_weapon_property("finesse")
+        assert rapier.has_weapon_property("thrown")
+        assert not rapier.has_weapon_property("heavy")
+
+    def test_finesse_versatile_and_ranged_profiles(
+        self, app, character_lifecycle_setup
+    ):
+        """
+        GIVEN: A dexterous character with martial weapon proficiency
+        WHEN: A rapier, longsword and longbow are equipped
+        THEN: Each attack uses the right ability and includes proficiency
+        """
+        character = character_lifecycle_setup.create_character(
+            strength=12, dexterity=16
+        )
+        martial = Proficiency(name="Martial Weapons", proficiency_type="weapon")
+        character.proficiencies.append(martial)
+        rapier = Item(
+            name="Rapier",
+            item_type="weapon",
+            damage_dice="1d8",
+            damage_type="piercing",
+            weapon_range="melee",
+            weapon_properties="martial, finesse",
+        )
+        longsword = Item(
+            name="Longsword",
+            item_type="weapon",
+            damage_dice="1d8",
+            damage_type="slashing",
+            weapon_range="melee",
+            weapon_properties="martial, versatile",
+            versatile_damage="1d10",
+        )
+        club = Item(
+            name="Club",
+            item_type="weapon",
+            damage_dice="1d4",
+            damage_type="bludgeoning",
+            weapon_range="melee",
+            weapon_properties="simple, light",
+        )
+        db.session.add_all([rapier, longsword, club])
+        db.session.commit()
+        for weapon in (rapier, longsword, club):
+            equip(character, weapon, "main_hand")
+
+        attacks = {
+            attack.name: attack for attack in compute_attack_profiles(character)
+        }
+
+        assert attacks["Rapier"].ability == "dex"
+        assert attacks["Rapier"].to_hit == 5
+        assert attacks["Rapier"].damage == "1d8+3"
+        assert attacks["Longsword"].ability == "str"
+        assert attacks["Longsword"].to_hit == 3
+        assert attacks["Longsword"].versatile_damage == "1d10+1"
+        assert attacks["Club"].proficient is False
+        assert attacks["Club"].to_hit == 1
+
+    def test_not_shared_with_recreated_id(self, app, character_lifecycle_setup):
+        """
+        GIVEN: Cached attack profiles for a deleted character
+        WHEN: A new character reuses its id and equips a different weapon
+        THEN: Only the new character's weapon is listed
+        """
+        character = character_lifecycle_setup.create_character()
+        club = Item(name="Club", item_type="weapon", damage_dice="1d4")
+        dagger = Item(name="Dagger", item_type="weapon", damage_dice="1d4")
+        db.session.add_all([club, dagger])
+        db.session.commit()
+        equip(character, club, "main_hand")
+        assert [attack.name for attack in compute_attack_profiles(character)] == [
+            "Club"
+        ]
+        character_id = character.id
+        db.session.delete(character)
+        db.session.commit()
+
+        character = character_lifecycle_setup.create_character()
+        assert character.id == character_id
+        equip(character, dagger, "main_hand")
+        assert [attack.name for attack in compute_attack_profiles(character)] == [
+            "Dagger"
+        ]
+
+    def test_recomputes_when_weapon_data_changes(self, app, character_lifecycle_setup):
+        """
+        GIVEN: A character whose attack profiles have already been computed
+        WHEN: The weapon's damage dice are changed in the reference data
+        THEN: The new reference version gives a fresh profile
+        """
+        character = character_lifecycle_setup.create_character(strength=12)
+        club = Item(
+            name="Club", item_type="weapon", damage_dice="1d4", weapon_range="melee"
+        )
+        db.session.add(club)
+        db.session.commit()
+        equip(character, club, "main_hand")
+        assert compute_attack_profiles(character)[0].damage == "1d4+1"
+
+        club.damage_dice = "1d6"
+        db.session.commit()
+        assert compute_attack_profiles(character)[0].damage == "1d6+1"
+
+
+@pytest.mark.unit
+class TestSkillEngine:
+    """Unit tests for skill modifiers and passive scores."""
+
+    def test_all_skills_and_passives(self, app, character_lifecycle_setup):
+        """
+        GIVEN: A character proficient in Perception
+        WHEN: The skill table is computed
+        THEN: All 18 skills and the passive scores should be derived
+        """
+        character = character_lifecycle_setup.create_character(dexterity=16, wisdom=14)
+        perception = Proficiency(
+            name="Perception", proficiency_type="skill", associated_ability="wis"
+        )
+        character.proficiencies.append(perception)
+        db.session.commit()
+
+        skills = compute_skill_table(character)
+
+        assert len(skills.modifiers) == 18
+        assert skills.modifiers["Perception"] == 4
+        assert skills.modifiers["Insight"] == 2
+        assert skills.modifiers["Stealth"] == 3
+        assert skills.passive_perception == 14
+        assert skills.passive_insight == 12
+        assert skills.passive_investigation == 11
+        assert skills.proficient == {"Perception"}
+
+    def test_batch_covers_every_character(self, app, character_lifecycle_setup):
+        """
+        GIVEN: Several characters with different scores
+        WHEN: Skill tables are computed as a batch
+        THEN: Each character should get its own table keyed by id
+        """
+        first = character_lifecycle_setup.create_character(name="First", strength=18)
+        second = character_lifecycle_setup.create_character(name="Second", strength=8)
+
+        tables = compute_skill_tables([first, second])
+
+        assert tables[first.id].modifiers["Athletics"] == 4
+        assert tables[second.id].modifiers["Athletics"] == -1
+
+
+@pytest.mark.unit
+class TestCharacterSheet:
+    """Unit tests for the precomputed character sheet presenter."""
+
+    def test_sheet_holds_derived_values(self, app, character_lifecycle_setup):
+        """
+        GIVEN: An Elf character proficient in Dexterity saves
+        WHEN: Its CharacterSheet is built
+        THEN: Modifiers, saves, effective scores, speed and size are precomputed
+        """
+        elf = Species(
+            name="Elf", ability_score_increases={"dex": 2}, speed=35, size="Medium"
+        )
+        db.session.add(elf)
+        db.session.commit()
+        character = character_lifecycle_setup.create_character(
+            dexterity=16, species_id=elf.id, dex_save_proficient=True
+        )
+
+        sheet = character_sheet(character)
+
+        assert sheet.effective_scores["dex"] == 18
+        assert sheet.modifiers == {
+            "str": 2,
+            "dex": 4,
+            "con": 1,
+            "int": 1,
+            "wis": 0,
+            "cha": -1,
+        }
+        assert sheet.saves["dex"] == 6
+        assert sheet.saves["str"] == 2
+        assert (sheet.speed, sheet.size, sheet.species) == (35, "Medium", "Elf")
+        assert sheet.initiative == 4
+        assert sheet.as_dict()["abilities"]["dex"]["save_proficient"] is True
+        with pytest.raises(AttributeError):
+            sheet.extra = True
+
+    def test_sheet_cached_per_version(self, app, character_lifecycle_setup):
+        """
+        GIVEN: A character whose sheet has been built
+        WHEN: The sheet is requested again, then after a change
+        THEN: The same sheet is reused until the character changes
+        """
+        character = character_lifecycle_setup.create_character()
+        sheet = character_sheet(character)
+        assert character_sheet(character) is sheet
+
+        character.strength = 18
+        db.session.commit()
+
+        updated = character_sheet(character)
+        assert updated is not sheet
+        assert updated.modifiers["str"] == 4
+
+
+@pytest.mark.unit
+class TestCharacterStats:
+    """Unit tests for the batch ability statistics engine."""
+
+    def make_party(self, lifecycle):
+        elf = Species(name="Elf", ability_score_increases={"dex": 2})
+        high_elf = SubSpecies(
+            name="High Elf", species=elf, additional_ability_increases={"int": 1}
+        )
+        db.session.add_all([elf, high_elf])
+        db.session.commit()
+        return [
+            lifecycle.create_character(
+                name="Aria",
+                level=5,
+                proficiency_bonus=3,
+                species_id=elf.id,
+                subspecies_id=high_elf.id,
+                int_save_proficient=True,
+                wis_save_proficient=True,
+            ),
+            lifecycle.create_character(
+                name="Borin",
+                level=17,
+                proficiency_bonus=6,
+                str_save_proficient=True,
+            ),
+            lifecycle.create_character(name="Cade", dexterity=9),
+        ]
+
+    @pytest.mark.parametrize("engine", ["numpy", "python"])
+    def test_batch_matches_character_sheets(
+        self, app, character_lifecycle_setup, monkeypatch, engine
+    ):
+        """
+        GIVEN: Characters with different species, levels and save proficiencies
+        WHEN: Their stats are computed as one batch, with and without numpy
+        THEN: Each record matches the values on that character's sheet
+        """
+        if engine == "numpy":
+            monkeypatch.setattr(rules, "numpy", pytest.importorskip("numpy"))
+        else:
+            monkeypatch.setattr(rules, "numpy", None)
+        party = self.make_party(character_lifecycle_setup)
+
+        stats = character_stats(user_id=character_lifecycle_setup.user.id)
+        assert isinstance(stats.saves, list) == (engine == "python")
+
+        assert len(stats) == 3
+        records = stats.records()
+        assert [record["proficiency_bonus"] for record in records] == [3, 6, 2]
+        for character, record in zip(party, records):
+            sheet = character_sheet(character)
+            assert record["id"] == character.id
+            assert record["effective_scores"] == sheet.effective_scores
+            assert record["modifiers"] == sheet.modifiers
+            assert record["saves"] == sheet.saves
+        assert records[0]["effective_scores"]["int"] == 13
+        assert records[2]["modifiers"]["dex"] == -1
+
+    def test_filters_by_id(self, app, character_lifecycle_setup):
+        """
+        GIVEN: A batch of characters
+        WHEN: The batch is filtered by id
+        THEN: The same records are produced, and only for the requested ids
+        """
+        party = self.make_party(character_lifecycle_setup)
+        expected = character_stats().records()
+
+        assert character_stats(character_ids=[party[1].id]).records() == expected[1:2]
+        assert len(character_stats(character_ids=[])) == 0